@@ -1,5 +1,12 @@
 from .nui_main_window import *
 from .nui_menu_bar import *
-from .nui_serial import *
 from .nui_main_widget import *
 from .nui_burd_status_main_widget import *
+
+
+def __getattr__(name):
+    # nui_serial pulls in Scapy, so it's only loaded when first asked for.
+    if name == "NuiSerialWidget":
+        from .nui_serial import NuiSerialWidget
+        return NuiSerialWidget
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,6 +3,7 @@ from PySide6.QtCore import Qt, Signal
 
 from .StatusWidgets import *
 from NestUi.Utils import nest_db
+from NestUi.Utils.nest_buoy_cache import buoy_cache
 
 class NestBurdStatusDockWidget(QScrollArea):
     marker_released = Signal(int)  # Signal to notify marker removal
@@ -59,8 +60,8 @@ class NestBurdStatusDockWidget(QScrollArea):
         if self.isVisible():
             self.buoy_id = int(buoy_id)
             self.id_label.setText(f"ID: {self.buoy_id}")
-            # Query the database for this buoy
-            buoy = nest_db.get_buoy_by_id(self.buoy_id)
+            # Look the buoy up, from memory unless it changed since last time
+            buoy = buoy_cache().get_buoy_by_id(self.buoy_id)
             if buoy:
                 # Only battery is available in schema
                 self.located_checkbox.setChecked(False)
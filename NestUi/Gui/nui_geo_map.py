@@ -3,18 +3,28 @@ from PySide6.QtWidgets import (
     QWidget, QFrame, QHBoxLayout, QGridLayout, QLabel, QSizePolicy, QVBoxLayout
 )
 from PySide6.QtWebEngineCore import QWebEngineSettings
-from PySide6.QtCore import Qt, Signal, Slot
+from PySide6.QtCore import Qt, Signal, Slot, QTimer
 from pyqtlet2 import L, MapWidget
 from ..Utils.nest_map import get_buoys_from_db
 
 # --------------------------------------------------------------------
 # Main Map Widget
 # --------------------------------------------------------------------
+# How often to check whether the view has moved past the loaded markers
+BOUNDS_POLL_MS = 1000
+# Markers are loaded for the view plus this fraction of it on every side
+BOUNDS_MARGIN = 0.5
+
+BOUNDS_JS = "(function() { var b = map.getBounds(); return [b.getSouth(), b.getWest(), b.getNorth(), b.getEast()]; })()"
+
 class NestGeoMapWidget(MapWidget):
     marker_clicked = Signal(str)  # Signal to emit when a marker is clicked
 
     def __init__(self, parent=None):
         super().__init__(parent)
+        # Markers on the map by buoy_id, and the area they were loaded for
+        self.markers = {}
+        self.loaded_bounds = None
         self.settings().setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessRemoteUrls, True)
         self.init_ui()
         self.show()
@@ -30,8 +40,36 @@ class NestGeoMapWidget(MapWidget):
         # Create marker icons in JavaScript
         self.create_marker_icons()
         
-        # Add buoy markers
-        self.add_buoy_markers()
+        # Add markers for the buoys in view, and more as the view moves
+        self.bounds_timer = QTimer(self)
+        self.bounds_timer.setInterval(BOUNDS_POLL_MS)
+        self.bounds_timer.timeout.connect(self.load_visible_markers)
+        self.bounds_timer.start()
+        self.load_visible_markers()
+
+    def load_visible_markers(self):
+        self.page().runJavaScript(BOUNDS_JS, self.on_view_bounds)
+
+    def on_view_bounds(self, bounds):
+        if not bounds or len(bounds) != 4:
+            return  # Map not ready yet
+        south, west, north, east = bounds
+        if self.loaded_bounds:
+            l_south, l_west, l_north, l_east = self.loaded_bounds
+            if l_south <= south and north <= l_north and l_west <= west and east <= l_east:
+                return
+        lat_margin = (north - south) * BOUNDS_MARGIN
+        lon_margin = (east - west) * BOUNDS_MARGIN
+        self.loaded_bounds = (max(south - lat_margin, -90.0), west - lon_margin,
+                              min(north + lat_margin, 90.0), east + lon_margin)
+        l_south, l_west, l_north, l_east = self.loaded_bounds
+        if l_east - l_west >= 360.0:
+            l_west, l_east = -180.0, 180.0
+        else:
+            # Leaflet longitudes run past +-180 when panned around the globe
+            l_west = (l_west + 180.0) % 360.0 - 180.0
+            l_east = (l_east + 180.0) % 360.0 - 180.0
+        self.add_buoy_markers((l_south, l_west, l_north, l_east))
 
     def add_vector_grid_layer(self):
         vector_grid_js = """
@@ -90,9 +128,13 @@ class NestGeoMapWidget(MapWidget):
         """
         self.map.runJavaScript(icon_js, 0)
 
-    def add_buoy_markers(self):
-        markers = get_buoys_from_db()
+    def add_buoy_markers(self, bounds=None):
+        markers = get_buoys_from_db(bounds)
         for marker in markers:
+            buoy_id = marker.options.get('buoy_id')
+            if buoy_id in self.markers:
+                continue
+            self.markers[buoy_id] = marker
             marker.addTo(self.map)
             # Set the appropriate icon based on the marker's color
             if hasattr(marker, 'options') and 'color' in marker.options:
@@ -107,7 +149,7 @@ class NestGeoMapWidget(MapWidget):
             # Connect the click signal
             if hasattr(marker, 'options') and 'buoy_id' in marker.options:
                 buoy_id = marker.options['buoy_id']
-                marker.click.connect(lambda event=marker.click, bid=buoy_id: self.marker_clicked.emit(buoy_id))
+                marker.click.connect(lambda event=marker.click, bid=buoy_id: self.marker_clicked.emit(bid))
 
 # --------------------------------------------------------------------
 # Custom Legend Widget as a QFrame
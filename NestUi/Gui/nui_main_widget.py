@@ -1,31 +1,34 @@
+import threading
 from PySide6.QtWidgets import (
-    QWidget, QHBoxLayout, QPushButton, QSpacerItem, QSizePolicy, QInputDialog, QMessageBox
+    QWidget, QHBoxLayout, QPushButton, QSpacerItem, QSizePolicy, QInputDialog, QMessageBox, QFileDialog,
+    QProgressDialog
 )
-from PySide6.QtCore import Qt
-from ..Utils.nest_serialno_init import add_buoy_serial_protocol
-from .nui_geo_map import NestGeoMapLegendOverlayWidget
+from PySide6.QtCore import Qt, QTimer, Signal
+from ..Utils.nest_serialno_init import add_buoy_serial_protocol, provision_manifest, read_manifest, device_address
+from ..Utils.nest_gateway import session_link
 from .nui_burd_status_main_widget import NestBurdStatusDockWidget
 from NestUi.Utils import nest_db
+from NestUi.Utils.nest_buoy_cache import buoy_cache
 from datetime import datetime
-import geocoder
 
 class NestMainWidget(QWidget):
+    # Bulk provisioning runs on a worker thread; these bring its progress back.
+    provision_progress = Signal(int, int, str)
+    provision_finished = Signal(object)
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
-        # Main map overlay (fills parent)
-        self.burd_map_overlay = NestGeoMapLegendOverlayWidget(self)
-        self.burd_map_overlay.setGeometry(0, 0, self.width(), self.height())
+        # Main map overlay (fills parent). QtWebEngine and pyqtlet2 are slow to
+        # load, so the map is built by load_map() once the window is showing.
+        self.burd_map_overlay = None
+        QTimer.singleShot(0, self.load_map)
 
         self.burd_status = NestBurdStatusDockWidget(self)
         self.burd_status.move(self.width() - self.burd_status.width(), 0)
         self.burd_status.resize(self.burd_status.width(), self.height())
         self.burd_status.hide()
 
-        # Connect the marker_clicked signal from the map view
-        self.burd_map_overlay.map_view.marker_clicked.connect(self.burd_status.toggle_visible)
-        self.burd_map_overlay.map_view.marker_clicked.connect(self.burd_status.update_status)
-
         # --- Floating bottom center button bar ---
         self.button_bar_widget = QWidget(self)
         self.button_bar_widget.setAttribute(Qt.WA_TranslucentBackground)
@@ -58,24 +61,45 @@ class NestMainWidget(QWidget):
         # Remove LEGEND button
         self.add_burd_button = QPushButton("ADD BuRD")
         self.add_burd_button.setStyleSheet(button_style)
+        self.bulk_add_button = QPushButton("Bulk ADD")
+        self.bulk_add_button.setStyleSheet(button_style)
         self.remove_burd_button = QPushButton("Remove BuRD")
         self.remove_burd_button.setStyleSheet(button_style)
         self.update_map_button = QPushButton("Update Map")
         self.update_map_button.setStyleSheet(button_style)
 
         button_bar.addWidget(self.add_burd_button)
+        button_bar.addWidget(self.bulk_add_button)
         button_bar.addWidget(self.remove_burd_button)
         button_bar.addWidget(self.update_map_button)
         button_bar.addSpacerItem(QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum))
 
         # Connect buttons to actions
         self.add_burd_button.clicked.connect(self.add_burd_to_db)
+        self.bulk_add_button.clicked.connect(self.bulk_add_burds)
         self.remove_burd_button.clicked.connect(self.remove_burd_from_db)
         self.update_map_button.clicked.connect(self.refresh_map)
+        self.provision_progress.connect(self.on_provision_progress)
+        self.provision_finished.connect(self.on_provision_finished)
+        self.provision_dialog = None
+
+    def load_map(self):
+        from .nui_geo_map import NestGeoMapLegendOverlayWidget
+        self.burd_map_overlay = NestGeoMapLegendOverlayWidget(self)
+        self.burd_map_overlay.setGeometry(0, 0, self.width(), self.height())
+
+        # Connect the marker_clicked signal from the map view
+        self.burd_map_overlay.map_view.marker_clicked.connect(self.burd_status.toggle_visible)
+        self.burd_map_overlay.map_view.marker_clicked.connect(self.burd_status.update_status)
+
+        # Keep the map under the button bar and status panel
+        self.burd_map_overlay.show()
+        self.burd_map_overlay.lower()
 
     def resizeEvent(self, event):
         # Resize map overlay to fill parent
-        self.burd_map_overlay.setGeometry(0, 0, self.width(), self.height())
+        if self.burd_map_overlay:
+            self.burd_map_overlay.setGeometry(0, 0, self.width(), self.height())
         # Position the button bar at the bottom right
         bar_width = 800
         bar_height = 80
@@ -119,37 +143,119 @@ class NestMainWidget(QWidget):
         if not ok or not nid:
             return
 
-        # Default serial port and baud rate
-        serial_port = '/dev/ttys015'  # or COMx on Windows
-        baud_rate = 9600
+        hub = self.provisioning_link()
+        if hub is None:
+            return
 
         try:
-            if add_buoy_serial_protocol(serial_port, baud_rate, serial_number, did, nid):
-                # Try to get geolocation first
-                g = geocoder.ip('me')
-                if g.ok and g.latlng:
-                    lat, lon = g.latlng
-                    self._add_burd_with_coords(lat, lon)
-                else:
-                    # Fallback: get map center from JS
-                    def handle_center(center):
-                        if not center:
-                            QMessageBox.critical(self, "Error", "Could not get map center or geolocation.")
-                            return
-                        lat = center['lat']
-                        lon = center['lng']
-                        self._add_burd_with_coords(lat, lon)
-                    js = "map.getCenter();"
-                    self.burd_map_overlay.map_view.page().runJavaScript(js, handle_center)
+            if add_buoy_serial_protocol(hub.port, hub.baud_rate, serial_number, did, nid, hub=hub):
+                self.with_location(lambda lat, lon: self._add_burd_with_coords(lat, lon, did))
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to add BuRD: {e}")
 
-    def _add_burd_with_coords(self, lat, lon):
+    def with_location(self, callback):
+        """Call callback(lat, lon) with where we are, or the map center."""
+        # Try to get geolocation first
+        import geocoder
+        g = geocoder.ip('me')
+        if g.ok and g.latlng:
+            lat, lon = g.latlng
+            callback(lat, lon)
+            return
+
+        # Fallback: get map center from JS
+        if not self.burd_map_overlay:
+            QMessageBox.critical(self, "Error", "Could not get map center or geolocation.")
+            return
+
+        def handle_center(center):
+            if not center:
+                QMessageBox.critical(self, "Error", "Could not get map center or geolocation.")
+                return
+            lat = center['lat']
+            lon = center['lng']
+            callback(lat, lon)
+        js = "map.getCenter();"
+        self.burd_map_overlay.map_view.page().runJavaScript(js, handle_center)
+
+    def bulk_add_burds(self):
+        # Provision every BuRD in a manifest, then add them all at once.
+        path, _ = QFileDialog.getOpenFileName(self, "Bulk Add BuRDs", "", "Manifests (*.csv)")
+        if not path:
+            return
+        try:
+            entries = read_manifest(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Error", f"Failed to read manifest: {e}")
+            return
+        if not entries:
+            QMessageBox.information(self, "Bulk Add BuRDs", "The manifest is empty.")
+            return
+        self.with_location(lambda lat, lon: self._start_bulk_provisioning(entries, lat, lon))
+
+    def provisioning_link(self):
+        """
+        The link provisioning talks to the modem over: the gateway if one is
+        running (it owns the port), else the port opened in the serial tools.
+        None, after telling the user, if neither is available.
+        """
+        hub = session_link()
+        if not hub.is_open:
+            QMessageBox.critical(self, "Error", "The modem isn't connected. Open its serial port from the "
+                                                "serial tools (or start the gateway) first.")
+            return None
+        return hub
+
+    def _start_bulk_provisioning(self, entries, lat, lon):
+        hub = self.provisioning_link()
+        if hub is None:
+            return
+
+        self.bulk_add_button.setEnabled(False)
+        self.provision_dialog = QProgressDialog(f"Provisioning {len(entries)} BuRDs...", None, 0, len(entries), self)
+        self.provision_dialog.setWindowTitle("Bulk Add BuRDs")
+        self.provision_dialog.setMinimumDuration(0)
+        self.provision_dialog.setValue(0)
+
+        def progress(result, done, total):
+            status = "ok" if result.ok else result.error
+            self.provision_progress.emit(done, total, f"{result.entry.serial_number}: {status}")
+
+        def run():
+            try:
+                report = provision_manifest(hub.port, hub.baud_rate, entries, lat, lon,
+                                            on_progress=progress, hub=hub)
+            except Exception as e:
+                report = e
+            self.provision_finished.emit(report)
+        threading.Thread(target=run, name="bulk-provisioning", daemon=True).start()
+
+    def on_provision_progress(self, done, total, status):
+        if self.provision_dialog:
+            self.provision_dialog.setLabelText(f"[{done}/{total}] {status}")
+            self.provision_dialog.setValue(done)
+
+    def on_provision_finished(self, report):
+        if self.provision_dialog:
+            self.provision_dialog.close()
+            self.provision_dialog = None
+        self.bulk_add_button.setEnabled(True)
+        if isinstance(report, Exception):
+            QMessageBox.critical(self, "Error", f"Bulk add failed: {report}")
+            return
+        if report.failed or report.store_error:
+            QMessageBox.warning(self, "Bulk Add BuRDs", report.summary())
+        else:
+            QMessageBox.information(self, "Bulk Add BuRDs", report.summary())
+        if report.stored:
+            self.refresh_map()
+
+    def _add_burd_with_coords(self, lat, lon, did=None):
         battery, ok = QInputDialog.getInt(self, "Add BuRD", "Battery %:", 100, 0, 100)
         if not ok:
             return
         try:
-            nest_db.create_buoy(lat, lon, battery, datetime.now())
+            nest_db.create_buoy(lat, lon, battery, datetime.now(), device_address(did))
             QMessageBox.information(self, "Success", "BuRD added to database!")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to add BuRD: {e}")
@@ -166,14 +272,12 @@ class NestMainWidget(QWidget):
             QMessageBox.critical(self, "Error", f"Failed to remove BuRD: {e}")
 
     def refresh_map(self):
+        # Writes made in this process already reached the buoy cache; other
+        # processes' (the region selector, another NestUi) only show up here.
+        buoy_cache().invalidate()
         # Remove and recreate the entire map widget
-        self.burd_map_overlay.setParent(None)
-        self.burd_map_overlay.deleteLater()
-        self.burd_map_overlay = NestGeoMapLegendOverlayWidget(self)
-        self.burd_map_overlay.setGeometry(0, 0, self.width(), self.height())
-        self.burd_map_overlay.map_view.web_page.marker_clicked.connect(self.burd_status.toggle_visible)
-        self.burd_map_overlay.map_view.web_page.marker_clicked.connect(self.burd_status.update_status)
-        self.burd_map_overlay.raise_()
-        self.button_bar_widget.raise_()
-        self.burd_status.raise_()
+        if self.burd_map_overlay:
+            self.burd_map_overlay.setParent(None)
+            self.burd_map_overlay.deleteLater()
+        self.load_map()
     
\ No newline at end of file
@@ -1,6 +1,6 @@
 from PySide6.QtWidgets import QMainWindow
+from PySide6.QtGui import QAction
 from PySide6.QtCore import Qt
-from .nui_serial import *
 from .nui_menu_bar import *
 from .nui_main_widget import *
 
@@ -1,15 +1,23 @@
-from PySide6.QtWidgets import QMenuBar, QMenu
+from PySide6.QtWidgets import QMenuBar, QMenu, QWidget
 from PySide6.QtGui import QAction
 from PySide6.QtCore import QObject
-from .nui_serial import *
 
 class NuiMenuOption():
-    def __init__(self, widget:QWidget, trigger_func:object, shortcut:str=None, parent:QObject=None):
+    def __init__(self, widget:QWidget, trigger_func:object, shortcut:str=None, parent:QObject=None,
+                 widget_factory:object=None):
         self.widget: QWidget = widget
         self.trigger_func: object = trigger_func
         self.action: QAction = None
         self.shortcut: str = shortcut
         self.parent: QObject = parent
+        # Builds the widget the first time the option is used, for widgets
+        # that are slow to create (or import) at startup.
+        self.widget_factory: object = widget_factory
+
+    def get_widget(self) -> QWidget:
+        if self.widget is None and self.widget_factory:
+            self.widget = self.widget_factory()
+        return self.widget
 
 class NestMenuBar(QMenuBar):
 
@@ -18,7 +26,8 @@ class NestMenuBar(QMenuBar):
         
         self.setNativeMenuBar(False)
         
-        self.serial_widget = NuiSerialWidget()
+        # Built on first use from the File menu, see create_serial_widget().
+        self.serial_widget = None
 
         '''
         Top Level dictionary contains the menu bar menu title and it's submenu 
@@ -32,8 +41,9 @@ class NestMenuBar(QMenuBar):
             {
                 'Send Serial': 
                     NuiMenuOption(
-                        self.serial_widget, 
-                        None),
+                        None, 
+                        None,
+                        widget_factory=self.create_serial_widget),
                 'Open': 
                     NuiMenuOption(
                         None,
@@ -127,13 +137,19 @@ class NestMenuBar(QMenuBar):
 
         curr_menu_opt:NuiMenuOption = self.menu_widgets[parent_text][text]
 
-        if curr_menu_opt.widget:
-            curr_menu_opt.widget.show()
+        widget = curr_menu_opt.get_widget()
+        if widget:
+            widget.show()
             triggered = True
 
         if not triggered and not curr_menu_opt.trigger_func:
             print(f'Action {text} hasn\'t been initialized yet!')
     
+    def create_serial_widget(self):
+        from .nui_serial import NuiSerialWidget
+        self.serial_widget = NuiSerialWidget()
+        return self.serial_widget
+
     def toggle_fullscreen(self):
         if self.parent().isFullScreen():
             self.parent().showNormal()
@@ -1,29 +1,56 @@
 from PySide6.QtWidgets import (
     QWidget, QLabel, QComboBox, QLineEdit, QPushButton, QGridLayout,
-    QGroupBox, QVBoxLayout, QHBoxLayout, QTextEdit, QMessageBox
+    QGroupBox, QVBoxLayout, QHBoxLayout, QTextEdit, QMessageBox, QFileDialog
 )
-from PySide6.QtCore import Qt, QTimer
-from PySide6.QtGui import QFont, QColor, QTextCursor
+from PySide6.QtCore import Qt, Signal
+from PySide6.QtGui import QFont
 import serial.tools.list_ports
-import serial
 from ..Utils.nest_serial import send_packet
+from ..Utils.nest_gateway import session_link
 from ..Utils.networking import build_floc_packet, build_serial_floc_packet
 from ..Utils.floc_pkts import SerialFlocPacket
+from ..Utils.floc_deframer import frame_serial_floc_packet
+from ..Utils.floc_capture import CaptureWriter, CAPTURE_RX, CAPTURE_TX
+from ..Utils.nest_monitor_buffer import ROLE_SENT, ROLE_RECEIVED, ROLE_INFO
+from ..Utils.nest_link_metrics import write_metrics_file
+from .nui_serial_monitor import NuiSerialMonitor
 
 class NuiSerialWidget(QWidget):
+    # The serial hub calls back on its own thread; these carry its events to
+    # the GUI thread.
+    frame_received = Signal(bytes)
+    text_received = Signal(bytes)
+    frame_sent = Signal(bytes)
+    port_state_changed = Signal(bool, str)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         font = QFont()
         font.setPointSize(9)
         self.setFont(font)
         
-        # Persistent serial connection and timer for monitoring
-        self.serial_conn = None
-        self.monitor_timer = QTimer(self)
-        self.monitor_timer.setInterval(200)  # 200 ms for checking incoming data
-        self.monitor_timer.timeout.connect(self.read_serial_data)
+        # The session's serial port, shared with provisioning and anything
+        # else talking to the modem. It reassembles '$'-framed packets and
+        # paces sends; anything outside a frame (modem text) is shown a line
+        # at a time. If a nest_gateway is running it owns the port, and the
+        # widget is one of its clients instead.
+        self.hub = session_link()
+        self.unframed_text = bytearray()
+        # Records sent and received packets to a .floccap file while set.
+        self.capture_writer = None
         
         self.init_ui()
+
+        self.frame_received.connect(self.on_frame_received)
+        self.text_received.connect(self.on_unframed_data)
+        self.frame_sent.connect(self.on_packet_sent)
+        self.port_state_changed.connect(self.on_port_state_changed)
+        self.hub.subscribe(self.frame_received.emit)
+        self.hub.subscribe_text(self.text_received.emit)
+        self.hub.subscribe_state(self.port_state_changed.emit)
+        if self.hub.is_open:
+            self.serial_toggle_button.setText("Close Serial Port")
+
         # Initialize field visibilities based on current selections
         self.update_floc_type_fields()
         self.update_serial_type_fields()
@@ -168,6 +195,14 @@ class NuiSerialWidget(QWidget):
         serial_layout.addWidget(self.dest_addr_label, 3, 0)
         serial_layout.addWidget(self.dest_addr_edit, 3, 1)
 
+        # Link budget for the transmit queue, 0 for no limit
+        serial_layout.addWidget(QLabel("Link Bytes/s:"), 4, 0)
+        self.link_bytes_edit = QLineEdit("0")
+        serial_layout.addWidget(self.link_bytes_edit, 4, 1)
+        serial_layout.addWidget(QLabel("Link Frames/s:"), 5, 0)
+        self.link_frames_edit = QLineEdit("1")
+        serial_layout.addWidget(self.link_frames_edit, 5, 1)
+
         serial_group.setLayout(serial_layout)
         left_layout.addWidget(serial_group)
 
@@ -189,9 +224,18 @@ class NuiSerialWidget(QWidget):
         self.serial_toggle_button = QPushButton("Open Serial Port")
         self.serial_toggle_button.clicked.connect(self.toggle_serial_connection)
         monitor_layout.addWidget(self.serial_toggle_button)
-        self.monitor_text = QTextEdit()
-        self.monitor_text.setReadOnly(True)
-        monitor_layout.addWidget(self.monitor_text)
+        self.capture_toggle_button = QPushButton("Start Capture")
+        self.capture_toggle_button.clicked.connect(self.toggle_capture)
+        monitor_layout.addWidget(self.capture_toggle_button)
+        self.tx_queue_label = QLabel("Transmit queue: -")
+        monitor_layout.addWidget(self.tx_queue_label)
+        self.link_metrics_label = QLabel("Link: -")
+        monitor_layout.addWidget(self.link_metrics_label)
+        self.export_metrics_button = QPushButton("Export Link Metrics")
+        self.export_metrics_button.clicked.connect(self.export_link_metrics)
+        monitor_layout.addWidget(self.export_metrics_button)
+        self.monitor = NuiSerialMonitor()
+        monitor_layout.addWidget(self.monitor)
         main_layout.addWidget(monitor_group)
 
     def refresh_serial_ports(self):
@@ -294,19 +338,26 @@ class NuiSerialWidget(QWidget):
         dissection = pkt.show(dump=True)
         self.packetdata_edit.setPlainText(dissection)
 
-    def read_serial_data(self):
-        if self.serial_conn and self.serial_conn.in_waiting:
-            try:
-                data = self.serial_conn.read(self.serial_conn.in_waiting)
-                if data:
-                    # If all bytes are ASCII, decode as ASCII; otherwise use Latin-1.
-                    if all(b < 128 for b in data):
-                        decoded = data.decode('ascii')
-                    else:
-                        decoded = data.decode('latin1')
-                    self.append_monitor_text(decoded, role="received")
-            except Exception as e:
-                self.append_monitor_text("Error reading serial data: " + str(e), role="info")
+    def on_frame_received(self, frame):
+        if self.capture_writer:
+            self.capture_writer.write(frame, CAPTURE_RX)
+        self.monitor.add_packet(frame, ROLE_RECEIVED)
+
+    def on_unframed_data(self, data):
+        self.unframed_text += data
+        *lines, rest = self.unframed_text.split(b"\n")
+        for line in lines:
+            line = line.rstrip(b"\r")
+            if line:
+                self.monitor.add_text(self.bytes_to_text(line), ROLE_RECEIVED)
+        self.unframed_text = bytearray(rest)
+
+    @staticmethod
+    def bytes_to_text(data):
+        # If all bytes are ASCII, decode as ASCII; otherwise use Latin-1.
+        if all(b < 128 for b in data):
+            return data.decode('ascii')
+        return data.decode('latin1')
 
     def on_send_packet(self):
         try:
@@ -329,7 +380,7 @@ class NuiSerialWidget(QWidget):
             self.packetdata_edit.setPlainText("Error: " + str(e))
             return
 
-        full_packet = b"$" + nest_packet + b"\r\n"
+        full_packet = frame_serial_floc_packet(nest_packet)
         serial_port = self.port_combo.currentText()
         try:
             baud_rate = int(self.baud_combo.currentText())
@@ -337,14 +388,10 @@ class NuiSerialWidget(QWidget):
             self.packetdata_edit.setPlainText("Invalid baud rate!")
             return
 
-        # Determine decoding method for displaying the sent packet:
-        if all(b < 128 for b in full_packet):
-            sent_text = full_packet.decode('ascii')
-        else:
-            sent_text = full_packet.decode('latin1')
-
-        if send_packet(serial_port, baud_rate, full_packet, ser=self.serial_conn, parent=self):
-            self.append_monitor_text(sent_text, role="sent")
+        # Queued on the session's port, opening it if nothing has yet
+        send_packet(serial_port, baud_rate, full_packet, parent=self,
+                    on_sent=lambda item: self.frame_sent.emit(item.frame), hub=self.hub)
+        self.update_tx_queue_label()
 
         try:
             current_pid = int(self.pid_edit.text())
@@ -354,8 +401,48 @@ class NuiSerialWidget(QWidget):
         self.pid_edit.setText(str(new_pid))
         self.update_packet_display()
 
+    def on_packet_sent(self, full_packet):
+        self.monitor.add_packet(full_packet[1:-2], ROLE_SENT)
+        if self.capture_writer:
+            self.capture_writer.write(full_packet[1:-2], CAPTURE_TX)
+
+    def update_tx_queue_label(self):
+        self.update_link_metrics_label()
+        metrics = self.hub.tx_metrics() if self.hub.is_open else {}
+        if not metrics:
+            self.tx_queue_label.setText("Transmit queue: -")
+            return
+        self.tx_queue_label.setText(
+            f"Transmit queue: {metrics['depth']} pending, {metrics['sent']} sent, "
+            f"{metrics['coalesced']} coalesced, oldest {metrics['oldest_wait_s']:.1f} s")
+
+    def update_link_metrics_label(self):
+        metrics = self.hub.link_metrics()
+        if not metrics:
+            self.link_metrics_label.setText("Link: -")
+            return
+        rtt = metrics["ack_rtt_s"]
+        self.link_metrics_label.setText(
+            f"Link: {metrics['frames_in']} in / {metrics['frames_out']} out, "
+            f"{metrics['bytes_in']} / {metrics['bytes_out']} bytes, "
+            f"{metrics['decode_errors']} decode errors, {metrics['resyncs']} resyncs, "
+            f"ACK RTT p50 {rtt['p50'] * 1000:.0f} ms p95 {rtt['p95'] * 1000:.0f} ms, "
+            f"{metrics['retransmissions']} retransmissions")
+
+    def export_link_metrics(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Link Metrics", "",
+                                              "JSON (*.json);;Prometheus text (*.prom)")
+        if not path:
+            return
+        try:
+            write_metrics_file(path, self.hub.link_metrics())
+        except OSError as e:
+            self.append_monitor_text("Error exporting link metrics: " + str(e))
+            return
+        self.append_monitor_text("Link metrics written to: " + path)
+
     def toggle_serial_connection(self):
-        if self.serial_conn is None:
+        if not self.hub.is_open:
             serial_port = self.port_combo.currentText()
             try:
                 baud_rate = int(self.baud_combo.currentText())
@@ -363,27 +450,49 @@ class NuiSerialWidget(QWidget):
                 self.append_monitor_text("Invalid baud rate!")
                 return
             try:
-                self.serial_conn = serial.Serial(serial_port, baud_rate, timeout=0.2)
-                self.append_monitor_text("Opened serial port: " + serial_port)
-                self.serial_toggle_button.setText("Close Serial Port")
-                self.monitor_timer.start()
+                bytes_per_s = float(self.link_bytes_edit.text() or 0)
+                frames_per_s = float(self.link_frames_edit.text() or 0)
+            except ValueError:
+                bytes_per_s = frames_per_s = 0
+                self.append_monitor_text("Invalid link budget, sending unpaced")
+            try:
+                self.hub.open(serial_port, baud_rate, bytes_per_s, frames_per_s)
             except Exception as e:
                 self.append_monitor_text("Error opening serial port: " + str(e))
         else:
-            self.monitor_timer.stop()
-            self.serial_conn.close()
-            self.serial_conn = None
+            self.hub.close()
+
+    def on_port_state_changed(self, is_open, error):
+        # The port is shared, so this also follows opens / closes made elsewhere.
+        if is_open:
+            self.append_monitor_text("Opened serial port: " + str(self.hub.port))
+            self.serial_toggle_button.setText("Close Serial Port")
+        else:
+            if error:
+                self.append_monitor_text("Error reading serial data: " + error)
             self.append_monitor_text("Closed serial port")
             self.serial_toggle_button.setText("Open Serial Port")
+        self.update_tx_queue_label()
     
-    def append_monitor_text(self, text, role="info"):
-        # Set text color based on message role.
-        if role == "sent":
-            color = QColor("blue")
-        elif role == "received":
-            color = QColor("green")
+    def toggle_capture(self):
+        if self.capture_writer is None:
+            path, _ = QFileDialog.getSaveFileName(self, "Capture Serial Traffic", "", "FLOC Captures (*.floccap)")
+            if not path:
+                return
+            if not path.endswith(".floccap"):
+                path += ".floccap"
+            try:
+                self.capture_writer = CaptureWriter(path)
+            except (OSError, ValueError) as e:
+                self.append_monitor_text("Error opening capture: " + str(e))
+                return
+            self.append_monitor_text("Capturing to: " + path)
+            self.capture_toggle_button.setText("Stop Capture")
         else:
-            color = QColor("black")
-        self.monitor_text.setTextColor(color)
-        self.monitor_text.insertPlainText(text)
-        self.monitor_text.moveCursor(QTextCursor.End)
+            self.capture_writer.close()
+            self.append_monitor_text(f"Capture closed ({self.capture_writer.count} packets)")
+            self.capture_writer = None
+            self.capture_toggle_button.setText("Start Capture")
+
+    def append_monitor_text(self, text, role=ROLE_INFO):
+        self.monitor.add_text(text, role)
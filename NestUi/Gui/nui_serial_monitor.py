@@ -0,0 +1,202 @@
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QTableView, QHeaderView, QLineEdit, QComboBox, QPushButton, QLabel
+)
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
+from PySide6.QtGui import QColor, QFont
+from ..Utils.nest_monitor_buffer import MonitorBuffer, COLUMNS, ROLE_SENT, ROLE_RECEIVED, ROLE_INFO
+from ..Utils.floc_defs import FLOC_PACKET_TYPE_VALS, get_floc_packet_type
+
+# Repaint at most this often, however fast packets arrive
+REFRESH_INTERVAL_MS = 33
+
+ROLE_COLORS = {
+    ROLE_SENT: QColor("blue"),
+    ROLE_RECEIVED: QColor("green"),
+    ROLE_INFO: QColor("black"),
+}
+
+
+class SerialMonitorModel(QAbstractTableModel):
+    """
+    The rows of a MonitorBuffer a view shows: those passing the filter, up to
+    the last sync(). Rows only change in sync(), in one insert / remove each.
+    """
+
+    def __init__(self, buffer: MonitorBuffer, parent=None):
+        super().__init__(parent)
+        self.buffer = buffer
+        self.rows = []
+        # Column values of rows already painted, by sequence number
+        self._columns = {}
+        # Buffer sequence number the next sync() starts from
+        self.next_seq = 0
+        self.filter_text = ""
+        self.filter_type = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            # Only visible rows are asked for, so they're formatted on demand.
+            columns = self._columns.get(entry.seq)
+            if columns is None:
+                columns = self._columns[entry.seq] = entry.columns()
+            return columns[index.column()]
+        if role == Qt.ForegroundRole:
+            return ROLE_COLORS.get(entry.role, ROLE_COLORS[ROLE_INFO])
+        return None
+
+    def accepts(self, entry) -> bool:
+        if self.filter_type is not None:
+            if entry.record is None or entry.record.floc_packet.type != self.filter_type:
+                return False
+        return not self.filter_text or entry.matches(self.filter_text)
+
+    def set_filter(self, text: str, floc_type=None):
+        self.filter_text = text.strip()
+        self.filter_type = floc_type
+        self.beginResetModel()
+        self.rows = [entry for entry in self.buffer.since(0) if self.accepts(entry)]
+        self._columns.clear()
+        self.next_seq = self.buffer.next_seq
+        self.endResetModel()
+
+    def sync(self) -> bool:
+        """Catch up with the buffer. Returns True if any rows changed."""
+        buffer = self.buffer
+        if buffer.next_seq == self.next_seq:
+            return False
+
+        # Rows the ring buffer has overwritten since the last sync
+        first_seq = buffer.first_seq
+        dropped = 0
+        while dropped < len(self.rows) and self.rows[dropped].seq < first_seq:
+            dropped += 1
+        if dropped:
+            self.beginRemoveRows(QModelIndex(), 0, dropped - 1)
+            for entry in self.rows[:dropped]:
+                self._columns.pop(entry.seq, None)
+            del self.rows[:dropped]
+            self.endRemoveRows()
+
+        added = [entry for entry in buffer.since(self.next_seq) if self.accepts(entry)]
+        self.next_seq = buffer.next_seq
+        if added:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(added) - 1)
+            self.rows.extend(added)
+            self.endInsertRows()
+        return bool(dropped or added)
+
+
+class NuiSerialMonitor(QWidget):
+    """
+    Serial monitor: decoded packets and modem text, one row each, newest at
+    the bottom. add_packet() / add_text() only store into the ring buffer; the
+    table catches up on a timer. Pausing freezes the table, not the capture.
+    """
+
+    def __init__(self, capacity: int = 10000, parent=None):
+        super().__init__(parent)
+        self.buffer = MonitorBuffer(capacity)
+        self.model = SerialMonitorModel(self.buffer, self)
+        self.paused = False
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        controls = QHBoxLayout()
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filter")
+        self.filter_edit.textChanged.connect(self.apply_filter)
+        controls.addWidget(self.filter_edit)
+        self.type_filter_combo = QComboBox()
+        self.type_filter_combo.addItem("All types", None)
+        for type_val in FLOC_PACKET_TYPE_VALS:
+            self.type_filter_combo.addItem(f"{type_val}: {get_floc_packet_type(type_val)}", type_val)
+        self.type_filter_combo.currentIndexChanged.connect(self.apply_filter)
+        controls.addWidget(self.type_filter_combo)
+        self.pause_button = QPushButton("Pause")
+        self.pause_button.setCheckable(True)
+        self.pause_button.toggled.connect(self.set_paused)
+        controls.addWidget(self.pause_button)
+        self.clear_button = QPushButton("Clear")
+        self.clear_button.clicked.connect(self.clear)
+        controls.addWidget(self.clear_button)
+        layout.addLayout(controls)
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setFont(QFont("Monospace", 9))
+        self.table.setSelectionBehavior(QTableView.SelectRows)
+        self.table.setWordWrap(False)
+        self.table.verticalHeader().hide()
+        # Fixed row heights and column widths keep painting proportional to
+        # the visible rows instead of the whole buffer.
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(self.table.fontMetrics().height() + 4)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(REFRESH_INTERVAL_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start()
+
+    def add_packet(self, serial_packet: bytes, role: str = ROLE_RECEIVED):
+        self.buffer.add_packet(serial_packet, role)
+
+    def add_text(self, text: str, role: str = ROLE_INFO):
+        self.buffer.add_text(text, role)
+
+    def refresh(self):
+        if self.paused:
+            # Still count what's arriving
+            self.update_status()
+            return
+        scrollbar = self.table.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        if self.model.sync():
+            if at_bottom:
+                self.table.scrollToBottom()
+            self.update_status()
+
+    def update_status(self):
+        shown = self.model.rowCount()
+        held = len(self.buffer)
+        text = f"{shown} of {held} held" if shown != held else f"{held} held"
+        if self.paused:
+            text += f", paused ({self.buffer.next_seq - self.model.next_seq} new)"
+        self.status_label.setText(text)
+
+    def set_paused(self, paused: bool):
+        self.paused = paused
+        self.pause_button.setText("Resume" if paused else "Pause")
+        self.update_status()
+        if not paused:
+            self.refresh()
+
+    def apply_filter(self, *_):
+        self.model.set_filter(self.filter_edit.text(), self.type_filter_combo.currentData())
+        self.table.scrollToBottom()
+        self.update_status()
+
+    def clear(self):
+        self.buffer.clear()
+        self.model.set_filter(self.filter_edit.text(), self.type_filter_combo.currentData())
+        self.update_status()
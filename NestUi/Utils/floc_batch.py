@@ -0,0 +1,248 @@
+# floc_batch.py
+# Vectorized decode of many FLOC / Serial FLOC frames at once into NumPy
+# structured arrays. Frames live in one contiguous buffer and are addressed by
+# offsets; payloads are reported as offset/length into that same buffer so
+# nothing is copied per frame.
+import numpy as np
+
+from .floc_codec import (
+    FLOC_DATA_TYPE_VAL,
+    FLOC_COMMAND_TYPE_VAL,
+    FLOC_ACK_TYPE_VAL,
+    FLOC_RESPONSE_TYPE_VAL,
+    FLOC_HEADER_SIZE,
+    SERIAL_FLOC_HEADER_SIZE,
+    SERIAL_BROADCAST_TYPE_VAL,
+    SERIAL_UNICAST_TYPE_VAL,
+)
+
+# Per-type fields that don't apply to a frame are -1.
+FLOC_BATCH_DTYPE = np.dtype([
+    ('ttl', np.uint8),
+    ('type', np.uint8),
+    ('nid', np.uint16),
+    ('res', np.uint8),
+    ('pid', np.uint8),
+    ('dest_addr', np.uint16),
+    ('src_addr', np.uint16),
+    ('command_type', np.int16),
+    ('ack_pid', np.int16),
+    ('request_pid', np.int16),
+    ('size', np.int16),
+    ('payload_offset', np.int64),
+    ('payload_length', np.int64),
+    ('valid', np.bool_),
+])
+
+SERIAL_FLOC_BATCH_DTYPE = np.dtype(FLOC_BATCH_DTYPE.descr + [
+    ('serial_type', np.uint8),
+    ('serial_dest_addr', np.int32),
+])
+
+
+def frames_to_buffer(frames):
+    """
+    Concatenate a list of frames into one buffer.
+    Returns (buffer, offsets, ends).
+    """
+    lengths = np.fromiter((len(f) for f in frames), dtype=np.int64, count=len(frames))
+    ends = np.cumsum(lengths)
+    offsets = ends - lengths
+    return b"".join(frames), offsets, ends
+
+
+def _as_offsets(buf_len, offsets, ends):
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if ends is None:
+        # Frames are assumed to be back to back, in order.
+        ends = np.empty_like(offsets)
+        ends[:-1] = offsets[1:]
+        if len(offsets):
+            ends[-1] = buf_len
+    else:
+        ends = np.asarray(ends, dtype=np.int64)
+    return offsets, ends
+
+
+def _gather(b, idx, ok):
+    # Read b[idx] where ok, as 0 elsewhere and past either end of b.
+    ok = ok & (idx >= 0) & (idx < len(b))
+    if not len(b):
+        return np.zeros(len(idx), dtype=b.dtype)
+    return np.where(ok, b[np.where(ok, idx, 0)], 0)
+
+
+def _decode_floc_into(out, b, offsets, ends):
+    n_bytes = len(b)
+    ok = (offsets >= 0) & (ends <= n_bytes) & (ends - offsets >= FLOC_HEADER_SIZE + 1)
+
+    # The second type-header byte only exists in longer frames (not an ACK),
+    # so it's only read where there is one.
+    ok_t1 = ok & (ends - offsets >= FLOC_HEADER_SIZE + 2)
+    h = [_gather(b, offsets + i, ok).astype(np.uint16) for i in range(FLOC_HEADER_SIZE + 1)]
+    h.append(_gather(b, offsets + FLOC_HEADER_SIZE + 1, ok_t1).astype(np.uint16))
+
+    type_val = h[0] & 0xF
+    out['ttl'] = h[0] >> 4
+    out['type'] = type_val
+    out['nid'] = (h[1] << 8) | h[2]
+    out['res'] = h[3] >> 6
+    out['pid'] = h[3] & 0x3F
+    out['dest_addr'] = (h[4] << 8) | h[5]
+    out['src_addr'] = (h[6] << 8) | h[7]
+
+    t0 = h[FLOC_HEADER_SIZE].astype(np.int16)
+    t1 = h[FLOC_HEADER_SIZE + 1].astype(np.int16)
+    is_data = type_val == FLOC_DATA_TYPE_VAL
+    is_command = type_val == FLOC_COMMAND_TYPE_VAL
+    is_ack = type_val == FLOC_ACK_TYPE_VAL
+    is_response = type_val == FLOC_RESPONSE_TYPE_VAL
+    two_byte_header = is_command | is_response
+
+    out['command_type'] = np.where(is_command, t0, -1)
+    out['ack_pid'] = np.where(is_ack, t0, -1)
+    out['request_pid'] = np.where(is_response, t0, -1)
+
+    size = np.select([is_data, two_byte_header, is_ack], [t0, t1, 0], -1)
+    out['size'] = size
+
+    payload_offset = offsets + FLOC_HEADER_SIZE + np.where(two_byte_header, 2, 1)
+    payload_length = np.maximum(size, 0)
+    out['payload_offset'] = payload_offset
+    out['payload_length'] = payload_length
+
+    ok &= (type_val <= FLOC_RESPONSE_TYPE_VAL)
+    ok &= ~two_byte_header | ok_t1
+    ok &= payload_offset + payload_length <= ends
+    out['valid'] = ok
+
+
+def decode_floc_batch(buf, offsets, ends=None) -> np.ndarray:
+    """
+    Decode the FLOC packets at buf[offsets[i]:ends[i]] into a FLOC_BATCH_DTYPE
+    array. If ends is None the frames are taken to be back to back.
+    Malformed frames come back with valid == False instead of raising.
+    """
+    b = np.frombuffer(buf, dtype=np.uint8)
+    offsets, ends = _as_offsets(len(b), offsets, ends)
+    out = np.empty(len(offsets), dtype=FLOC_BATCH_DTYPE)
+    _decode_floc_into(out, b, offsets, ends)
+    return out
+
+
+def decode_serial_floc_batch(buf, offsets, ends=None) -> np.ndarray:
+    """
+    Decode the Serial FLOC packets at buf[offsets[i]:ends[i]] (without the
+    '$' and CRLF framing) into a SERIAL_FLOC_BATCH_DTYPE array.
+    serial_dest_addr is -1 for broadcasts.
+    """
+    b = np.frombuffer(buf, dtype=np.uint8)
+    offsets, ends = _as_offsets(len(b), offsets, ends)
+    out = np.empty(len(offsets), dtype=SERIAL_FLOC_BATCH_DTYPE)
+
+    ok = (offsets >= 0) & (ends <= len(b)) & (ends - offsets >= SERIAL_FLOC_HEADER_SIZE)
+    serial_type = _gather(b, offsets, ok)
+    floc_size = _gather(b, offsets + 1, ok).astype(np.int64)
+    is_unicast = serial_type == SERIAL_UNICAST_TYPE_VAL
+    ok &= is_unicast | (serial_type == SERIAL_BROADCAST_TYPE_VAL)
+
+    ok_dest = ok & is_unicast & (ends - offsets >= SERIAL_FLOC_HEADER_SIZE + 2)
+    dest_hi = _gather(b, offsets + 2, ok_dest).astype(np.int32)
+    dest_lo = _gather(b, offsets + 3, ok_dest).astype(np.int32)
+    out['serial_type'] = serial_type
+    out['serial_dest_addr'] = np.where(is_unicast, (dest_hi << 8) | dest_lo, -1)
+
+    floc_offsets = offsets + SERIAL_FLOC_HEADER_SIZE + np.where(is_unicast, 2, 0)
+    floc_ends = floc_offsets + floc_size
+    ok &= floc_ends <= ends
+    _decode_floc_into(out, b, floc_offsets, np.where(ok, floc_ends, floc_offsets))
+    out['valid'] &= ok
+    return out
+
+
+def decode_floc_frames(frames):
+    """
+    Decode a list of FLOC packets. Returns (buffer, records); payload offsets
+    in records point into buffer.
+    """
+    buf, offsets, ends = frames_to_buffer(frames)
+    return buf, decode_floc_batch(buf, offsets, ends)
+
+
+def decode_serial_floc_frames(frames):
+    """
+    Decode a list of Serial FLOC packets. Returns (buffer, records).
+    """
+    buf, offsets, ends = frames_to_buffer(frames)
+    return buf, decode_serial_floc_batch(buf, offsets, ends)
+
+
+def batch_payload(buf, record) -> memoryview:
+    """
+    Zero-copy view of one record's payload.
+    """
+    start = int(record['payload_offset'])
+    return memoryview(buf)[start:start + int(record['payload_length'])]
+
+
+# --- Test Cases ---
+if __name__ == "__main__":
+    import random
+    import time
+    from .floc_codec import (
+        encode_floc_packet, encode_serial_floc_packet, decode_floc_packet
+    )
+
+    rng = random.Random(1)
+    frames = []
+    serial_frames = []
+    for i in range(20000):
+        type_val = i % 4
+        floc = encode_floc_packet(
+            ttl=rng.randrange(16), type_val=type_val, nid=rng.randrange(0x10000),
+            pid=rng.randrange(64), dst=rng.randrange(0x10000), src=rng.randrange(0x10000),
+            data=b'' if type_val == 2 else bytes(rng.randrange(256) for _ in range(rng.randrange(40))),
+            cmd_type_val=1, ack_pid_val=rng.randrange(256), rsp_pid_val=rng.randrange(256))
+        frames.append(floc)
+        serial_frames.append(encode_serial_floc_packet(floc, "BU"[i % 2], rng.randrange(0x10000)))
+
+    start = time.perf_counter()
+    buf, records = decode_floc_frames(frames)
+    elapsed = time.perf_counter() - start
+    print(f"Decoded {len(records)} FLOC packets in {elapsed * 1000:.1f} ms")
+
+    for frame, record in zip(frames, records):
+        expected = decode_floc_packet(frame)
+        assert record['valid']
+        assert (record['ttl'], record['type'], record['nid'], record['pid'], record['dest_addr'], record['src_addr']) == \
+            (expected.ttl, expected.type, expected.nid, expected.pid, expected.dest_addr, expected.src_addr)
+        assert bytes(batch_payload(buf, record)) == expected.data
+
+    buf, records = decode_serial_floc_frames(serial_frames)
+    assert records['valid'].all()
+    assert ((records['serial_dest_addr'] == -1) == (records['serial_type'] == ord('B'))).all()
+    for frame, record in zip(frames, records):
+        assert bytes(batch_payload(buf, record)) == decode_floc_packet(frame).data
+    print(f"Decoded {len(records)} Serial FLOC packets")
+
+    # Truncated and bad-type frames are flagged rather than raising.
+    bad = [frames[0][:5], b'\x0f' + frames[0][1:], frames[0][:-1] if frames[0][8] else frames[4][:-1]]
+    _, records = decode_floc_frames(bad)
+    assert not records['valid'].any()
+    print("Malformed frames flagged invalid")
+
+    # A 9-byte ACK ending the buffer, and nothing at all, decode without reading past it.
+    ack = encode_floc_packet(ttl=3, type_val=2, nid=1, pid=2, dst=3, src=4, data=b'', ack_pid_val=7)
+    assert len(ack) == FLOC_HEADER_SIZE + 1
+    _, records = decode_floc_frames(frames[:3] + [ack])
+    assert records['valid'].all() and records[-1]['ack_pid'] == 7
+    _, records = decode_floc_frames([ack])
+    assert records['valid'].all()
+    _, records = decode_serial_floc_frames([encode_serial_floc_packet(ack, "U", 9)])
+    assert records['valid'].all() and records[0]['serial_dest_addr'] == 9
+    _, records = decode_serial_floc_frames([encode_serial_floc_packet(ack, "B", 0)])
+    assert records['valid'].all()
+    assert not decode_floc_batch(b'', [0])['valid'].any()
+    assert not decode_serial_floc_batch(b'', [0])['valid'].any()
+    assert len(decode_floc_batch(b'', [])) == 0
+    print("Trailing ACK and empty buffer handled")
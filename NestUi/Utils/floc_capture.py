@@ -0,0 +1,334 @@
+# floc_capture.py
+# Append-only capture files of modem traffic.
+#
+# <name>.floccap holds each Serial FLOC packet (without the '$' / CRLF framing)
+# with a monotonic timestamp and direction. <name>.floccap.idx is a sidecar of
+# fixed-size entries (timestamp, offset, length, direction), so a reader can
+# memory-map it and seek by packet number or time without touching the data
+# file, and hand whole ranges to the batch decoder.
+#
+# Both files start with a small header; the data file header also records the
+# wall clock time the capture was opened at, so monotonic timestamps can be
+# turned back into real times.
+import mmap
+import os
+import struct
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+CAPTURE_RX = 0
+CAPTURE_TX = 1
+
+CAPTURE_MAGIC = b"FLOCCAP1"
+INDEX_MAGIC = b"FLOCIDX1"
+INDEX_SUFFIX = ".idx"
+
+# magic, start wall clock ns, start monotonic ns
+_FILE_HEADER = struct.Struct("<8sqq")
+# timestamp ns, length, direction
+_RECORD_HEADER = struct.Struct("<qHB")
+# magic
+_INDEX_HEADER = struct.Struct("<8s")
+# timestamp ns, offset of the packet bytes in the data file, length, direction
+_INDEX_ENTRY = struct.Struct("<qQHB5x")
+
+
+class CaptureRecord(NamedTuple):
+    timestamp_ns: int
+    direction: int
+    frame: memoryview
+
+
+def index_path(path: str) -> str:
+    return path + INDEX_SUFFIX
+
+
+class CaptureWriter:
+    """
+    Appends frames to a capture. Opening an existing capture continues it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new and not _index_is_complete(path):
+            rebuild_index(path)
+
+        self._data = open(path, "ab")
+        self._index = open(index_path(path), "ab")
+        if new:
+            self.start_wall_ns = time.time_ns()
+            self.start_monotonic_ns = time.monotonic_ns()
+            self._data.write(_FILE_HEADER.pack(CAPTURE_MAGIC, self.start_wall_ns, self.start_monotonic_ns))
+            self._index.truncate(0)
+            self._index.write(_INDEX_HEADER.pack(INDEX_MAGIC))
+        else:
+            self.start_wall_ns, self.start_monotonic_ns = _read_file_header(path)
+        # Continuing a capture from an earlier session (or boot): shift this
+        # session's monotonic clock onto the capture's timeline via wall time.
+        self._monotonic_shift_ns = ((time.time_ns() - self.start_wall_ns)
+                                    - (time.monotonic_ns() - self.start_monotonic_ns))
+        self._offset = self._data.tell()
+        self.count = (os.path.getsize(index_path(path)) - _INDEX_HEADER.size) // _INDEX_ENTRY.size
+
+    def write(self, frame: bytes, direction: int = CAPTURE_RX, timestamp_ns: int = -1):
+        """
+        Append one Serial FLOC packet. timestamp_ns defaults to now, on the
+        capture's monotonic timeline.
+        """
+        if timestamp_ns < 0:
+            timestamp_ns = time.monotonic_ns() + self._monotonic_shift_ns
+        length = len(frame)
+        self._data.write(_RECORD_HEADER.pack(timestamp_ns, length, direction))
+        self._data.write(frame)
+        frame_offset = self._offset + _RECORD_HEADER.size
+        self._index.write(_INDEX_ENTRY.pack(timestamp_ns, frame_offset, length, direction))
+        self._offset = frame_offset + length
+        self.count += 1
+
+    def flush(self):
+        # Data first, so the index never points past what's on disk.
+        self._data.flush()
+        self._index.flush()
+
+    def close(self):
+        if self._data.closed:
+            return
+        self.flush()
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_file_header(path: str):
+    with open(path, "rb") as f:
+        header = f.read(_FILE_HEADER.size)
+    if len(header) < _FILE_HEADER.size:
+        raise ValueError(f"{path} is not a FLOC capture (short header)")
+    magic, start_wall_ns, start_monotonic_ns = _FILE_HEADER.unpack(header)
+    if magic != CAPTURE_MAGIC:
+        raise ValueError(f"{path} is not a FLOC capture")
+    return start_wall_ns, start_monotonic_ns
+
+
+def _index_is_complete(path: str) -> bool:
+    idx = index_path(path)
+    if not os.path.exists(idx):
+        return False
+    size = os.path.getsize(idx)
+    if size < _INDEX_HEADER.size or (size - _INDEX_HEADER.size) % _INDEX_ENTRY.size:
+        return False
+    count = (size - _INDEX_HEADER.size) // _INDEX_ENTRY.size
+    if count == 0:
+        return os.path.getsize(path) == _FILE_HEADER.size
+    with open(idx, "rb") as f:
+        f.seek(-_INDEX_ENTRY.size, os.SEEK_END)
+        _, offset, length, _ = _INDEX_ENTRY.unpack(f.read(_INDEX_ENTRY.size))
+    return offset + length == os.path.getsize(path)
+
+
+def _scan_index(path: str):
+    """
+    Index entries for the complete records in the data file, found by
+    scanning it; read only. Returns (index bytes with header, end of the last
+    complete record).
+    """
+    _read_file_header(path)
+    size = os.path.getsize(path)
+    entries = [_INDEX_HEADER.pack(INDEX_MAGIC)]
+    with open(path, "rb") as data:
+        pos = _FILE_HEADER.size
+        data.seek(pos)
+        while pos + _RECORD_HEADER.size <= size:
+            timestamp_ns, length, direction = _RECORD_HEADER.unpack(data.read(_RECORD_HEADER.size))
+            frame_offset = pos + _RECORD_HEADER.size
+            if frame_offset + length > size:
+                break
+            entries.append(_INDEX_ENTRY.pack(timestamp_ns, frame_offset, length, direction))
+            data.seek(length, os.SEEK_CUR)
+            pos = frame_offset + length
+    return b"".join(entries), pos
+
+
+def rebuild_index(path: str) -> int:
+    """
+    Repair a capture after a crash: rewrite the sidecar index by scanning the
+    data file and cut off a partly written final record. Only for captures
+    nothing is writing to (CaptureWriter does it when reopening one); readers
+    index in memory instead. Returns the number of records.
+    """
+    entries, end = _scan_index(path)
+    with open(index_path(path), "wb") as idx:
+        idx.write(entries)
+    if end != os.path.getsize(path):
+        with open(path, "r+b") as data:
+            data.truncate(end)
+    return (len(entries) - _INDEX_HEADER.size) // _INDEX_ENTRY.size
+
+
+class CaptureReader:
+    """
+    Memory-mapped, random access reader. Opening is O(1) in the capture size:
+    nothing is parsed until a record is asked for.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.start_wall_ns, self.start_monotonic_ns = _read_file_header(path)
+
+        self._data_file = open(path, "rb")
+        self.data = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index_file = None
+        self._index_map = None
+        if not _index_is_complete(path):
+            # Crashed, or still being written and not flushed yet: index the
+            # complete records in memory and leave both files alone.
+            entries, _ = _scan_index(path)
+        elif os.path.getsize(index_path(path)) > _INDEX_HEADER.size:
+            self._index_file = open(index_path(path), "rb")
+            self._index_map = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            entries = self._index_map
+        else:
+            entries = b"\0" * _INDEX_HEADER.size
+
+        index_dtype = np.dtype({
+            'names': ['timestamp_ns', 'offset', 'length', 'direction'],
+            'formats': ['<i8', '<u8', '<u2', 'u1'],
+            'offsets': [0, 8, 16, 18],
+            'itemsize': _INDEX_ENTRY.size,
+        })
+        self.index = np.frombuffer(entries, dtype=index_dtype, offset=_INDEX_HEADER.size)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i: int) -> CaptureRecord:
+        entry = self.index[i]
+        offset = int(entry['offset'])
+        return CaptureRecord(int(entry['timestamp_ns']), int(entry['direction']),
+                             memoryview(self.data)[offset:offset + int(entry['length'])])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def wall_time_ns(self, timestamp_ns: int) -> int:
+        """Convert a record's monotonic timestamp to wall clock ns since the epoch."""
+        return self.start_wall_ns + (timestamp_ns - self.start_monotonic_ns)
+
+    def index_at(self, timestamp_ns: int) -> int:
+        """Number of the first record at or after monotonic timestamp_ns."""
+        return int(np.searchsorted(self.index['timestamp_ns'], timestamp_ns, side='left'))
+
+    def index_at_wall_time(self, wall_ns: int) -> int:
+        """Number of the first record at or after wall clock time wall_ns."""
+        return self.index_at(wall_ns - self.start_wall_ns + self.start_monotonic_ns)
+
+    def range_between(self, start_ns: int, end_ns: int) -> range:
+        """Record numbers with start_ns <= timestamp_ns < end_ns (monotonic)."""
+        return range(self.index_at(start_ns), self.index_at(end_ns))
+
+    def batch(self, start: int = 0, stop: int = -1):
+        """
+        (buffer, offsets, ends) for records start..stop, ready for
+        floc_batch.decode_serial_floc_batch. buffer is the mapped data file, so
+        payload offsets in the decoded records point straight into it.
+        """
+        if stop < 0:
+            stop = len(self)
+        entries = self.index[start:stop]
+        offsets = entries['offset'].astype('i8')
+        return self.data, offsets, offsets + entries['length']
+
+    def decode(self, start: int = 0, stop: int = -1):
+        """Batch decode records start..stop into a SERIAL_FLOC_BATCH_DTYPE array."""
+        from .floc_batch import decode_serial_floc_batch
+        return decode_serial_floc_batch(*self.batch(start, stop))
+
+    def close(self):
+        # Drop the NumPy view before closing the mmap it points into.
+        self.index = None
+        if self._index_map is not None:
+            self._index_map.close()
+        self.data.close()
+        self._data_file.close()
+        if self._index_file is not None:
+            self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- Test Cases ---
+if __name__ == "__main__":
+    import random
+    import tempfile
+    from .floc_codec import encode_floc_packet, encode_serial_floc_packet, decode_serial_floc_packet
+
+    rng = random.Random(8)
+    frames = []
+    for i in range(50000):
+        type_val = i % 4
+        floc = encode_floc_packet(3, type_val, 1, i % 64, rng.randrange(0x10000), 7,
+                                  b'' if type_val == 2 else bytes(rng.randrange(256) for _ in range(rng.randrange(30))),
+                                  cmd_type_val=1, ack_pid_val=1, rsp_pid_val=2)
+        frames.append(encode_serial_floc_packet(floc, "BU"[i % 2], 42))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "test.floccap")
+        with CaptureWriter(path) as writer:
+            for i, frame in enumerate(frames[:30000]):
+                writer.write(frame, i % 2, timestamp_ns=1_000_000 * i)
+        # Reopening continues the same capture.
+        with CaptureWriter(path) as writer:
+            for i, frame in enumerate(frames[30000:], start=30000):
+                writer.write(frame, i % 2, timestamp_ns=1_000_000 * i)
+
+        start = time.perf_counter()
+        reader = CaptureReader(path)
+        opened = time.perf_counter() - start
+        assert len(reader) == len(frames)
+        assert bytes(reader[12345].frame) == frames[12345]
+        assert reader.index_at(1_000_000 * 40000) == 40000
+        assert reader.range_between(1_000_000 * 10, 1_000_000 * 20) == range(10, 20)
+
+        records = reader.decode(100, 200)
+        assert records['valid'].all()
+        expected = decode_serial_floc_packet(frames[150])
+        assert records[50]['src_addr'] == expected.floc_packet.src_addr
+        print(f"Opened {len(reader)} record capture in {opened * 1000:.2f} ms")
+        reader.close()
+
+        # A crash mid-record (or a writer between flushes): readers skip the
+        # torn record without touching either file...
+        with open(path, "ab") as f:
+            f.write(_RECORD_HEADER.pack(0, 40, CAPTURE_RX) + b"partial")
+        torn_size = os.path.getsize(path)
+        with CaptureReader(path) as reader:
+            assert len(reader) == len(frames)
+        assert os.path.getsize(path) == torn_size
+        # ...and reopening for writing repairs it.
+        CaptureWriter(path).close()
+        assert os.path.getsize(path) < torn_size
+        print("Recovered from a torn final record")
+
+        # A capture ending in an ACK decodes (the shortest frame, last in the map).
+        ack_path = os.path.join(tmp, "ack.floccap")
+        ack = encode_serial_floc_packet(encode_floc_packet(3, 2, 1, 1, 5, 7, b'', ack_pid_val=1), "U", 5)
+        with CaptureWriter(ack_path) as writer:
+            writer.write(frames[0])
+            writer.write(ack)
+        with CaptureReader(ack_path) as reader:
+            records = reader.decode()
+            assert records['valid'].all() and records[-1]['type'] == 2
+        print("Decoded a capture ending in an ACK")
@@ -0,0 +1,163 @@
+# floc_codec.py (VARIABLE LENGTH DATA)
+# Precompiled struct based encoder/decoder for FLOC and Serial FLOC frames.
+# Field semantics match the Scapy classes in floc_pkts.py byte for byte, but
+# no Packet objects are allocated, so this is the path to use for ingest,
+# routing and anything else that touches every frame. Scapy stays the tool
+# for show() dissection.
+# The FLOC layer itself (encode_floc_packet, decode_floc_packet, FlocRecord,
+# enums, limits and struct formats) is generated into floc_defs.py from
+# floc_spec.py; this module adds the Serial FLOC layer on top.
+import struct
+from typing import NamedTuple, Optional
+
+from .floc_defs import *  # Import the generated file
+
+# type, size, dest_addr
+_SERIAL_UNICAST_PREFIX = struct.Struct(SERIAL_FLOC_HEADER.format + SERIAL_UNICAST_HEADER.format[1:])
+
+
+class SerialFlocRecord(NamedTuple):
+    """Decoded Serial FLOC packet. dest_addr is None for broadcasts."""
+    type: int
+    size: int
+    dest_addr: Optional[int]
+    floc_packet: FlocRecord
+
+
+def encode_serial_floc_packet(floc_pkt_bytes: bytes, serial_type_val: str = "B", dest_addr: int = -1) -> bytes:
+    """
+    Encode a Serial FLOC packet. Same arguments and output as build_serial_floc_packet.
+    """
+    serial_type = serial_type_val.upper()
+    size = len(floc_pkt_bytes)
+    if size > 0xFF:
+        raise ValueError(f"FLOC packet too large for Serial FLOC framing: {size}")
+
+    if serial_type == "B":
+        return SERIAL_FLOC_HEADER.pack(SERIAL_BROADCAST_TYPE_VAL, size) + floc_pkt_bytes
+    if serial_type == "U":
+        if not 0 <= dest_addr <= 0xFFFF:
+            raise ValueError(f"Invalid destination address: {dest_addr}")
+        return _SERIAL_UNICAST_PREFIX.pack(SERIAL_UNICAST_TYPE_VAL, size, dest_addr) + floc_pkt_bytes
+    raise ValueError(f"Invalid Serial FLOC packet type: {serial_type_val}")
+
+
+def serial_floc_frame_size(buf, offset: int = 0) -> int:
+    """
+    Total length of the Serial FLOC packet starting at buf[offset], worked out
+    from its header alone. Needs the first SERIAL_FLOC_HEADER_SIZE bytes.
+    """
+    serial_type, size = SERIAL_FLOC_HEADER.unpack_from(buf, offset)
+    extra = SERIAL_TYPE_LAYOUTS.get(serial_type)
+    if extra is not None:
+        return SERIAL_FLOC_HEADER_SIZE + extra + size
+    raise ValueError(f"Invalid Serial FLOC packet type: {serial_type}")
+
+
+def decode_serial_floc_packet(buf, offset: int = 0) -> SerialFlocRecord:
+    """
+    Decode the Serial FLOC packet starting at buf[offset].
+    """
+    if len(buf) - offset < SERIAL_FLOC_HEADER_SIZE:
+        raise ValueError("Truncated Serial FLOC header")
+
+    serial_type, size = SERIAL_FLOC_HEADER.unpack_from(buf, offset)
+    pos = offset + SERIAL_FLOC_HEADER_SIZE
+
+    if serial_type == SERIAL_BROADCAST_TYPE_VAL:
+        dest_addr = None
+    elif serial_type == SERIAL_UNICAST_TYPE_VAL:
+        if len(buf) - pos < 2:
+            raise ValueError("Truncated Serial Unicast header")
+        dest_addr = (buf[pos] << 8) | buf[pos + 1]
+        pos += 2
+    else:
+        raise ValueError(f"Invalid Serial FLOC packet type: {serial_type}")
+
+    if pos + size > len(buf):
+        raise ValueError(f"Truncated Serial FLOC payload ({len(buf) - pos} of {size} bytes)")
+
+    return SerialFlocRecord(serial_type, size, dest_addr, decode_floc_packet(buf, pos, pos + size))
+
+
+# --- Differential Test Cases ---
+if __name__ == "__main__":
+    import random
+    from .networking import build_floc_packet, build_serial_floc_packet
+    from .floc_pkts import FlocPacket, SerialFlocPacket
+
+    rng = random.Random(0)
+
+    def random_args(type_val):
+        max_size = FLOC_TYPE_LAYOUTS[type_val][3]
+        return dict(
+            ttl=rng.randrange(16),
+            type_val=type_val,
+            nid=rng.randrange(0x10000),
+            pid=rng.randrange(64),
+            dst=rng.randrange(0x10000),
+            src=rng.randrange(0x10000),
+            data=bytes(rng.randrange(256) for _ in range(rng.randrange(max_size + 1))),
+            cmd_type_val=rng.choice(COMMAND_TYPE_VALS),
+            ack_pid_val=rng.randrange(256),
+            rsp_pid_val=rng.randrange(256),
+        )
+
+    def check_against_scapy(record, pkt):
+        header = pkt.header
+        assert (record.ttl, record.type, record.nid, record.res, record.pid, record.dest_addr, record.src_addr) == \
+            (header.ttl, header.type, header.nid, header.res, header.pid, header.dest_addr, header.src_addr)
+        if record.type == FLOC_DATA_TYPE_VAL:
+            sub = pkt.getfieldval('data')
+            assert (record.size, record.data) == (sub.header.size, sub.data)
+        elif record.type == FLOC_COMMAND_TYPE_VAL:
+            sub = pkt.getfieldval('command')
+            assert (record.command_type, record.size, record.data) == \
+                (sub.header.command_type, sub.header.size, sub.data)
+        elif record.type == FLOC_ACK_TYPE_VAL:
+            assert record.ack_pid == pkt.getfieldval('ack').header.ack_pid
+        elif record.type == FLOC_RESPONSE_TYPE_VAL:
+            sub = pkt.getfieldval('response')
+            assert (record.request_pid, record.size, record.data) == \
+                (sub.header.request_pid, sub.header.size, sub.data)
+
+    count = 0
+    for _ in range(500):
+        for type_val in range(4):
+            args = random_args(type_val)
+            if type_val == FLOC_ACK_TYPE_VAL:
+                args['data'] = b''
+
+            scapy_floc = build_floc_packet(**args)
+            fast_floc = encode_floc_packet(**args)
+            assert scapy_floc == fast_floc, (args, scapy_floc, fast_floc)
+
+            record = decode_floc_packet(fast_floc)
+            check_against_scapy(record, FlocPacket(scapy_floc))
+
+            dest_addr = rng.randrange(0x10000)
+            for serial_type in ("B", "U"):
+                scapy_serial = build_serial_floc_packet(scapy_floc, serial_type, dest_addr)
+                fast_serial = encode_serial_floc_packet(fast_floc, serial_type, dest_addr)
+                assert scapy_serial == fast_serial, (serial_type, scapy_serial, fast_serial)
+                assert serial_floc_frame_size(fast_serial) == len(fast_serial)
+
+                serial_record = decode_serial_floc_packet(fast_serial)
+                serial_pkt = SerialFlocPacket(scapy_serial)
+                assert (serial_record.type, serial_record.size) == (serial_pkt.header.type, serial_pkt.header.size)
+                if serial_type == "U":
+                    assert serial_record.dest_addr == serial_pkt.unicast.header.dest_addr
+                    check_against_scapy(serial_record.floc_packet, serial_pkt.unicast.floc_packet)
+                else:
+                    check_against_scapy(serial_record.floc_packet, serial_pkt.broadcast.floc_packet)
+            count += 1
+
+    print(f"{count} FLOC packets and {count * 2} Serial FLOC packets matched Scapy byte for byte")
+
+    for bad in (dict(type_val=99), dict(type_val=0, data=b'Y' * (MAX_DATA_SIZE + 1)), dict(type_val=1, cmd_type_val=7)):
+        args = dict(ttl=5, nid=2, pid=3, dst=4, src=5, data=b'')
+        args.update(bad)
+        try:
+            encode_floc_packet(**args)
+        except ValueError as e:
+            print(f"Caught expected error: {e}")
@@ -0,0 +1,174 @@
+# floc_deframer.py
+# Incremental deframer for the b"$" + serial_floc_packet + b"\r\n" framing used
+# on the modem link. Frames are delimited by the SerialFlocHeader size byte,
+# not by scanning for CRLF, since binary payloads can contain CRLF.
+from .floc_codec import (
+    SERIAL_FLOC_HEADER_SIZE,
+    SERIAL_BROADCAST_TYPE_VAL,
+    SERIAL_UNICAST_TYPE_VAL,
+    MIN_FLOC_PACKET_SIZE,
+    MAX_FLOC_PACKET_SIZE,
+)
+
+FRAME_START = b"$"
+FRAME_END = b"\r\n"
+
+_START = FRAME_START[0]
+# Largest framed packet: '$', serial header, unicast dest_addr, FLOC packet, CRLF.
+MAX_FRAMED_SIZE = 1 + SERIAL_FLOC_HEADER_SIZE + 2 + MAX_FLOC_PACKET_SIZE + len(FRAME_END)
+
+
+def frame_serial_floc_packet(serial_floc_pkt: bytes) -> bytes:
+    """
+    Wrap a Serial FLOC packet in the '$' ... CRLF framing.
+    """
+    return FRAME_START + serial_floc_pkt + FRAME_END
+
+
+class SerialFlocDeframer:
+    """
+    Feed arbitrary chunks of bytes from the serial port in, get complete Serial
+    FLOC packets (without the '$' and CRLF) out.
+
+    Bytes that can't be part of a frame (modem text, line noise, a corrupted
+    frame) are dropped and handed to on_discard if given, and the deframer
+    resynchronizes on the next '$'.
+    """
+
+    def __init__(self, on_discard=None):
+        self.on_discard = on_discard
+        self._buf = bytearray()
+        self._pos = 0
+
+        self.frames = 0
+        self.resyncs = 0
+        self.discarded_bytes = 0
+
+    def reset(self):
+        self._buf.clear()
+        self._pos = 0
+
+    def buffered(self) -> int:
+        """Number of bytes held waiting for the rest of a frame."""
+        return len(self._buf) - self._pos
+
+    def _discard(self, start, end):
+        if end <= start:
+            return
+        self.discarded_bytes += end - start
+        if self.on_discard:
+            self.on_discard(bytes(self._buf[start:end]))
+
+    def feed(self, chunk) -> list:
+        """
+        Add a chunk of received bytes. Returns the list of complete Serial FLOC
+        packets it finished, in order.
+        """
+        buf = self._buf
+        buf += chunk
+        pos = self._pos
+        end = len(buf)
+        frames = []
+
+        while pos < end:
+            start = buf.find(FRAME_START, pos)
+            if start < 0:
+                self._discard(pos, end)
+                pos = end
+                break
+            if start > pos:
+                self._discard(pos, start)
+                pos = start
+
+            if end - start < 1 + SERIAL_FLOC_HEADER_SIZE:
+                break
+
+            serial_type = buf[start + 1]
+            size = buf[start + 2]
+            if serial_type == SERIAL_BROADCAST_TYPE_VAL:
+                header_size = SERIAL_FLOC_HEADER_SIZE
+            elif serial_type == SERIAL_UNICAST_TYPE_VAL:
+                header_size = SERIAL_FLOC_HEADER_SIZE + 2
+            else:
+                header_size = 0
+
+            if not header_size or not MIN_FLOC_PACKET_SIZE <= size <= MAX_FLOC_PACKET_SIZE:
+                self.resyncs += 1
+                self._discard(start, start + 1)
+                pos = start + 1
+                continue
+
+            packet_end = start + 1 + header_size + size
+            frame_end = packet_end + len(FRAME_END)
+            if frame_end > end:
+                break
+
+            if buf[packet_end:frame_end] != FRAME_END:
+                self.resyncs += 1
+                self._discard(start, start + 1)
+                pos = start + 1
+                continue
+
+            frames.append(bytes(buf[start + 1:packet_end]))
+            pos = frame_end
+
+        self.frames += len(frames)
+
+        # Compact only once the consumed prefix outweighs what is left, so each
+        # byte is moved a bounded number of times.
+        if pos == end:
+            buf.clear()
+            pos = 0
+        elif pos > len(buf) - pos:
+            del buf[:pos]
+            pos = 0
+        self._pos = pos
+        return frames
+
+
+# --- Test Cases ---
+if __name__ == "__main__":
+    import random
+    import time
+    from .floc_codec import encode_floc_packet, encode_serial_floc_packet, decode_serial_floc_packet
+
+    rng = random.Random(2)
+    packets = []
+    for i in range(5000):
+        type_val = i % 4
+        floc = encode_floc_packet(
+            ttl=3, type_val=type_val, nid=1, pid=i % 64, dst=rng.randrange(0x10000), src=7,
+            data=b'' if type_val == 2 else bytes(rng.choice(b'$\r\nab') for _ in range(rng.randrange(50))),
+            cmd_type_val=1, ack_pid_val=5, rsp_pid_val=6)
+        packets.append(encode_serial_floc_packet(floc, "BU"[i % 2], rng.randrange(0x10000)))
+
+    stream = bytearray()
+    for pkt in packets:
+        if rng.random() < 0.05:
+            stream += b"?Q1\r\n"
+        stream += frame_serial_floc_packet(pkt)
+
+    discarded = bytearray()
+    deframer = SerialFlocDeframer(on_discard=discarded.extend)
+    out = []
+    start = time.perf_counter()
+    i = 0
+    while i < len(stream):
+        n = rng.randrange(1, 200)
+        out.extend(deframer.feed(stream[i:i + n]))
+        i += n
+    elapsed = time.perf_counter() - start
+    assert out == packets, "frames lost or altered"
+    assert deframer.buffered() == 0
+    for pkt in out:
+        decode_serial_floc_packet(pkt)
+    print(f"Deframed {len(out)} packets ({len(stream)} bytes) in {elapsed * 1000:.1f} ms, "
+          f"discarded {deframer.discarded_bytes} bytes of modem text")
+
+    # Corrupt a frame's trailer; the deframer should drop it and recover.
+    corrupted = bytearray(frame_serial_floc_packet(packets[0]))
+    corrupted[-1] = 0
+    deframer = SerialFlocDeframer()
+    got = deframer.feed(bytes(corrupted) + frame_serial_floc_packet(packets[1]) + frame_serial_floc_packet(packets[2]))
+    assert got == packets[1:3], got
+    print(f"Recovered after corruption with {deframer.resyncs} resyncs")
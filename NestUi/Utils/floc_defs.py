@@ -0,0 +1,235 @@
+# floc_defs.py
+# GENERATED by floc_gen.py from floc_spec.py - edit the spec, not this file.
+# Enums, size limits, struct formats and the fast FLOC encode/decode core
+# shared by floc_codec.py and friends. The Scapy classes in floc_pkts.py are
+# generated from the same spec.
+import struct
+from typing import NamedTuple, Optional
+
+FLOC_DATA_TYPE = 'FLOC_DATA_TYPE'
+FLOC_DATA_TYPE_VAL = 0
+FLOC_COMMAND_TYPE = 'FLOC_COMMAND_TYPE'
+FLOC_COMMAND_TYPE_VAL = 1
+FLOC_ACK_TYPE = 'FLOC_ACK_TYPE'
+FLOC_ACK_TYPE_VAL = 2
+FLOC_RESPONSE_TYPE = 'FLOC_RESPONSE_TYPE'
+FLOC_RESPONSE_TYPE_VAL = 3
+FLOC_PACKET_TYPE_VALS = (0, 1, 2, 3)
+
+def get_floc_packet_type(value: int) -> str:
+    """Converts an integer value to the floc_packet_type enum's string representation."""
+    _mapping = {
+        0: FLOC_DATA_TYPE,
+        1: FLOC_COMMAND_TYPE,
+        2: FLOC_ACK_TYPE,
+        3: FLOC_RESPONSE_TYPE,
+    }
+    return _mapping.get(value, '')
+
+
+COMMAND_TYPE_1 = 'COMMAND_TYPE_1'
+COMMAND_TYPE_1_VAL = 1
+COMMAND_TYPE_2 = 'COMMAND_TYPE_2'
+COMMAND_TYPE_2_VAL = 2
+COMMAND_TYPE_VALS = (1, 2)
+
+def get_command_type(value: int) -> str:
+    """Converts an integer value to the command_type enum's string representation."""
+    _mapping = {
+        1: COMMAND_TYPE_1,
+        2: COMMAND_TYPE_2,
+    }
+    return _mapping.get(value, '')
+
+
+SERIAL_BROADCAST_TYPE = 'SERIAL_BROADCAST_TYPE'
+SERIAL_BROADCAST_TYPE_VAL = 66
+SERIAL_UNICAST_TYPE = 'SERIAL_UNICAST_TYPE'
+SERIAL_UNICAST_TYPE_VAL = 85
+SERIAL_FLOC_PACKET_TYPE_VALS = (66, 85)
+
+def get_serial_floc_packet_type(value: int) -> str:
+    """Converts an integer value to the serial_floc_packet_type enum's string representation."""
+    _mapping = {
+        66: SERIAL_BROADCAST_TYPE,
+        85: SERIAL_UNICAST_TYPE,
+    }
+    return _mapping.get(value, '')
+
+
+MAX_DATA_SIZE = 55
+MAX_COMMAND_SIZE = 51
+MAX_RESPONSE_SIZE = 54
+
+FLOC_HEADER = struct.Struct(">BHBHH")
+FLOC_HEADER_SIZE = 8
+DATA_HEADER = struct.Struct(">B")
+DATA_HEADER_SIZE = 1
+COMMAND_HEADER = struct.Struct(">BB")
+COMMAND_HEADER_SIZE = 2
+ACK_HEADER = struct.Struct(">B")
+ACK_HEADER_SIZE = 1
+RESPONSE_HEADER = struct.Struct(">BB")
+RESPONSE_HEADER_SIZE = 2
+SERIAL_FLOC_HEADER = struct.Struct(">BB")
+SERIAL_FLOC_HEADER_SIZE = 2
+SERIAL_BROADCAST_HEADER = struct.Struct(">")
+SERIAL_BROADCAST_HEADER_SIZE = 0
+SERIAL_UNICAST_HEADER = struct.Struct(">H")
+SERIAL_UNICAST_HEADER_SIZE = 2
+
+# FlocHeader plus each type's header, packed in one call.
+_DATA_PREFIX = struct.Struct(">BHBHHB")
+_COMMAND_PREFIX = struct.Struct(">BHBHHBB")
+_ACK_PREFIX = struct.Struct(">BHBHHB")
+_RESPONSE_PREFIX = struct.Struct(">BHBHHBB")
+
+MIN_FLOC_PACKET_SIZE = 9
+MAX_FLOC_PACKET_SIZE = 64
+
+# FLOC type -> (name, header size, offset of the size byte in the header
+# or None, maximum data size).
+FLOC_TYPE_LAYOUTS = {
+    FLOC_DATA_TYPE_VAL: ('Data', 1, 0, 55),
+    FLOC_COMMAND_TYPE_VAL: ('Command', 2, 1, 51),
+    FLOC_ACK_TYPE_VAL: ('Ack', 1, None, 0),
+    FLOC_RESPONSE_TYPE_VAL: ('Response', 2, 1, 54),
+}
+
+# Serial FLOC type -> bytes of header between SerialFlocHeader and the FLOC packet.
+SERIAL_TYPE_LAYOUTS = {
+    SERIAL_BROADCAST_TYPE_VAL: 0,
+    SERIAL_UNICAST_TYPE_VAL: 2,
+}
+
+
+class FlocRecord(NamedTuple):
+    """Decoded FLOC packet. Per-type fields that don't apply are None."""
+    ttl: int
+    type: int
+    nid: int
+    res: int
+    pid: int
+    dest_addr: int
+    src_addr: int
+    command_type: Optional[int] = None
+    ack_pid: Optional[int] = None
+    request_pid: Optional[int] = None
+    size: Optional[int] = None
+    data: bytes = b''
+
+
+def encode_floc_packet(ttl: int,
+                       type_val: int,
+                       nid: int,
+                       pid: int,
+                       dst: int,
+                       src: int,
+                       data: bytes,
+                       cmd_type_val: int = -1,
+                       ack_pid_val: int = -1,
+                       rsp_pid_val: int = -1) -> bytes:
+    """
+    Encode a FLOC packet. Same arguments and output as build_floc_packet.
+    """
+    if type_val not in FLOC_PACKET_TYPE_VALS:
+        raise ValueError(f"Invalid FLOC packet type: {type_val}")
+    if not 0 <= ttl <= 0xF:
+        raise ValueError(f"Invalid TTL: {ttl}")
+    if not 0 <= nid <= 0xFFFF:
+        raise ValueError(f"Invalid network ID: {nid}")
+    if not 0 <= pid <= 0x3F:
+        raise ValueError(f"Invalid pid: {pid}")
+    if not 0 <= dst <= 0xFFFF:
+        raise ValueError(f"Invalid destination address: {dst}")
+    if not 0 <= src <= 0xFFFF:
+        raise ValueError(f"Invalid source address: {src}")
+
+    data_size = len(data)
+
+    if type_val == FLOC_DATA_TYPE_VAL:
+        if data_size > MAX_DATA_SIZE:
+            raise ValueError(f"Data data size exceeds maximum ({MAX_DATA_SIZE} bytes)")
+        return _DATA_PREFIX.pack(ttl << 4, nid, pid, dst, src, data_size) + data
+
+    if type_val == FLOC_COMMAND_TYPE_VAL:
+        if data_size > MAX_COMMAND_SIZE:
+            raise ValueError(f"Command data size exceeds maximum ({MAX_COMMAND_SIZE} bytes)")
+        if cmd_type_val not in COMMAND_TYPE_VALS:
+            raise ValueError(f"Invalid command type: {cmd_type_val}")
+        return _COMMAND_PREFIX.pack((ttl << 4) | 1, nid, pid, dst, src, cmd_type_val, data_size) + data
+
+    if type_val == FLOC_ACK_TYPE_VAL:
+        if data_size:
+            raise ValueError("Ack data size exceeds maximum (0 bytes)")
+        if not 0 <= ack_pid_val <= 0xFF:
+            raise ValueError(f"Invalid ack pid value: {ack_pid_val}")
+        return _ACK_PREFIX.pack((ttl << 4) | 2, nid, pid, dst, src, ack_pid_val)
+
+    if type_val == FLOC_RESPONSE_TYPE_VAL:
+        if data_size > MAX_RESPONSE_SIZE:
+            raise ValueError(f"Response data size exceeds maximum ({MAX_RESPONSE_SIZE} bytes)")
+        if not 0 <= rsp_pid_val <= 0xFF:
+            raise ValueError(f"Invalid response pid value: {rsp_pid_val}")
+        return _RESPONSE_PREFIX.pack((ttl << 4) | 3, nid, pid, dst, src, rsp_pid_val, data_size) + data
+
+    raise ValueError(f"Invalid FLOC packet type: {type_val}")
+
+
+def decode_floc_packet(buf, offset: int = 0, end: int = -1) -> FlocRecord:
+    """
+    Decode the FLOC packet in buf[offset:end] (end defaults to len(buf)).
+    buf can be bytes, bytearray or memoryview.
+    """
+    if end < 0:
+        end = len(buf)
+    if end - offset < MIN_FLOC_PACKET_SIZE:
+        raise ValueError(f"Truncated FLOC packet ({end - offset} bytes)")
+
+    ttl_type_val, nid, res_pid, dest_addr, src_addr = FLOC_HEADER.unpack_from(buf, offset)
+    ttl = ttl_type_val >> 4
+    type_val = ttl_type_val & 0xF
+    res = res_pid >> 6
+    pid = res_pid & 0x3F
+    pos = offset + FLOC_HEADER_SIZE
+
+    if type_val == FLOC_DATA_TYPE_VAL:
+        if end - pos < 1:
+            raise ValueError("Truncated Data header")
+        size = buf[pos]
+        pos += 1
+        if pos + size > end:
+            raise ValueError(f"Truncated Data payload ({end - pos} of {size} bytes)")
+        return FlocRecord(ttl, type_val, nid, res, pid, dest_addr, src_addr,
+                          size=size, data=bytes(buf[pos:pos + size]))
+
+    if type_val == FLOC_COMMAND_TYPE_VAL:
+        if end - pos < 2:
+            raise ValueError("Truncated Command header")
+        command_type = buf[pos]
+        size = buf[pos + 1]
+        pos += 2
+        if pos + size > end:
+            raise ValueError(f"Truncated Command payload ({end - pos} of {size} bytes)")
+        return FlocRecord(ttl, type_val, nid, res, pid, dest_addr, src_addr,
+                          command_type=command_type, size=size, data=bytes(buf[pos:pos + size]))
+
+    if type_val == FLOC_ACK_TYPE_VAL:
+        if end - pos < 1:
+            raise ValueError("Truncated Ack header")
+        ack_pid = buf[pos]
+        return FlocRecord(ttl, type_val, nid, res, pid, dest_addr, src_addr,
+                          ack_pid=ack_pid)
+
+    if type_val == FLOC_RESPONSE_TYPE_VAL:
+        if end - pos < 2:
+            raise ValueError("Truncated Response header")
+        request_pid = buf[pos]
+        size = buf[pos + 1]
+        pos += 2
+        if pos + size > end:
+            raise ValueError(f"Truncated Response payload ({end - pos} of {size} bytes)")
+        return FlocRecord(ttl, type_val, nid, res, pid, dest_addr, src_addr,
+                          request_pid=request_pid, size=size, data=bytes(buf[pos:pos + size]))
+
+    raise ValueError(f"Invalid FLOC packet type: {type_val}")
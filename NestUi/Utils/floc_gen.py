@@ -0,0 +1,512 @@
+# floc_gen.py
+# Generates floc_pkts.py (Scapy classes) and floc_defs.py (enums, size limits,
+# struct formats and the fast encode/decode core) from floc_spec.py, so the two
+# codecs can't drift apart.
+#
+#   python -m NestUi.Utils.floc_gen           rewrite both files
+#   python -m NestUi.Utils.floc_gen --check   exit 1 if they are out of date
+import os
+import sys
+
+from . import floc_spec
+from .floc_spec import ENUMS, HEADERS, FLOC_PAYLOADS, SERIAL_PAYLOADS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GENERATED_NOTE = "# GENERATED by floc_gen.py from floc_spec.py - edit the spec, not this file."
+
+_STRUCT_CODES = {8: 'B', 16: 'H', 32: 'I'}
+
+
+# ---------------------------------------------------------------------------
+# Spec helpers
+# ---------------------------------------------------------------------------
+
+def enum_value(member: str) -> int:
+    for members in ENUMS.values():
+        if member in members:
+            return members[member]
+    raise KeyError(member)
+
+
+def var_name(field) -> str:
+    # Don't shadow builtins in the generated code.
+    return 'type_val' if field.name == 'type' else field.name
+
+
+def snake(class_name: str) -> str:
+    out = ''
+    for i, c in enumerate(class_name):
+        if c.isupper() and i:
+            out += '_'
+        out += c.upper()
+    return out
+
+
+def slots(fields):
+    """
+    Group header fields into struct slots. Returns a list of
+    (struct code, byte offset, [(field, shift, mask)]) in wire order.
+    """
+    out = []
+    offset = 0
+    pending = []
+    pending_bits = 0
+    for field in fields:
+        if field.bits % 8 == 0 and not pending:
+            if field.bits not in _STRUCT_CODES:
+                raise ValueError(f"Unsupported field width {field.bits} for {field.name}")
+            out.append((_STRUCT_CODES[field.bits], offset, [(field, 0, (1 << field.bits) - 1)]))
+            offset += field.bits // 8
+            continue
+        pending.append(field)
+        pending_bits += field.bits
+        if pending_bits > 8:
+            raise ValueError(f"Bit fields ending at {field.name} don't pack into one byte")
+        if pending_bits == 8:
+            parts = []
+            shift = 8
+            for f in pending:
+                shift -= f.bits
+                parts.append((f, shift, (1 << f.bits) - 1))
+            out.append(('B', offset, parts))
+            offset += 1
+            pending = []
+            pending_bits = 0
+    if pending:
+        raise ValueError(f"Bit fields {[f.name for f in pending]} don't fill a byte")
+    return out
+
+
+def header_size(fields) -> int:
+    return sum(f.bits for f in fields) // 8
+
+
+def struct_format(fields) -> str:
+    return '>' + ''.join(code for code, _, _ in slots(fields))
+
+
+def extract_expr(src: str, index_expr, part, width: int) -> str:
+    """Expression reading one field from byte-indexable src."""
+    field, shift, mask = part
+    def at(k):
+        return f"{src}[{index_expr(k)}]"
+    if width == 16:
+        return f"({at(0)} << 8) | {at(1)}"
+    expr = at(0)
+    if shift:
+        expr = f"{expr} >> {shift}"
+        if shift + field.bits != 8:
+            expr = f"({expr}) & 0x{mask:X}"
+    elif field.bits != 8:
+        expr = f"{expr} & 0x{mask:X}"
+    return expr
+
+
+def split_expr(slot_var: str, part) -> str:
+    field, shift, mask = part
+    if shift == 0:
+        return f"{slot_var} & 0x{mask:X}"
+    if shift + field.bits == 8:
+        return f"{slot_var} >> {shift}"
+    return f"({slot_var} >> {shift}) & 0x{mask:X}"
+
+
+def slot_var(parts) -> str:
+    return '_'.join(var_name(f) for f, _, _ in parts)
+
+
+def pack_expr(parts, values) -> str:
+    """Expression combining the fields of one slot, values maps name -> expr."""
+    terms = []
+    for field, shift, _ in parts:
+        value = values[field.name]
+        if isinstance(value, int):
+            if value:
+                terms.append(str(value << shift))
+            continue
+        terms.append(f"({value} << {shift})" if shift else value)
+    if len(terms) == 1 and terms[0].startswith('('):
+        return terms[0][1:-1]
+    return ' | '.join(terms) if terms else '0'
+
+
+# ---------------------------------------------------------------------------
+# floc_defs.py
+# ---------------------------------------------------------------------------
+
+def gen_enums(lines):
+    for enum_name, members in ENUMS.items():
+        for member, value in members.items():
+            lines.append(f"{member} = '{member}'")
+            lines.append(f"{member}_VAL = {value}")
+        values = ', '.join(str(v) for v in members.values())
+        if len(members) == 1:
+            values += ','
+        lines.append(f"{enum_name.upper()}_VALS = ({values})")
+        lines.append("")
+        lines.append(f"def get_{enum_name}(value: int) -> str:")
+        lines.append(f'    """Converts an integer value to the {enum_name} enum\'s string representation."""')
+        lines.append("    _mapping = {")
+        for member, value in members.items():
+            lines.append(f"        {value}: {member},")
+        lines.append("    }")
+        lines.append("    return _mapping.get(value, '')")
+        lines.append("")
+        lines.append("")
+
+
+def record_fields():
+    type_fields = []
+    has_size = False
+    for payload in FLOC_PAYLOADS:
+        for field in HEADERS[payload.header]:
+            if field.length_of:
+                has_size = True
+            elif field.name not in type_fields:
+                type_fields.append(field.name)
+    if has_size:
+        type_fields.append('size')
+    return type_fields
+
+
+def gen_defs() -> str:
+    floc_fields = HEADERS['FlocHeader']
+    discriminator = next(f for f in floc_fields if f.enum == 'floc_packet_type')
+    floc_slots = slots(floc_fields)
+
+    lines = [
+        "# floc_defs.py",
+        GENERATED_NOTE,
+        "# Enums, size limits, struct formats and the fast FLOC encode/decode core",
+        "# shared by floc_codec.py and friends. The Scapy classes in floc_pkts.py are",
+        "# generated from the same spec.",
+        "import struct",
+        "from typing import NamedTuple, Optional",
+        "",
+    ]
+    gen_enums(lines)
+
+    for payload in FLOC_PAYLOADS:
+        if payload.max_size is not None:
+            lines.append(f"MAX_{payload.name.upper()}_SIZE = {payload.max_size}")
+    lines.append("")
+
+    for name, fields in HEADERS.items():
+        lines.append(f"{snake(name)} = struct.Struct(\"{struct_format(fields)}\")")
+        lines.append(f"{snake(name)}_SIZE = {header_size(fields)}")
+    lines.append("")
+
+    lines.append("# FlocHeader plus each type's header, packed in one call.")
+    for payload in FLOC_PAYLOADS:
+        fmt = struct_format(floc_fields) + struct_format(HEADERS[payload.header])[1:]
+        lines.append(f"_{payload.name.upper()}_PREFIX = struct.Struct(\"{fmt}\")")
+    lines.append("")
+
+    floc_size = header_size(floc_fields)
+    min_size = floc_size + min(header_size(HEADERS[p.header]) for p in FLOC_PAYLOADS)
+    max_size = floc_size + max(header_size(HEADERS[p.header]) + (p.max_size or 0) for p in FLOC_PAYLOADS)
+    lines.append(f"MIN_FLOC_PACKET_SIZE = {min_size}")
+    lines.append(f"MAX_FLOC_PACKET_SIZE = {max_size}")
+    lines.append("")
+
+    lines.append("# FLOC type -> (name, header size, offset of the size byte in the header")
+    lines.append("# or None, maximum data size).")
+    lines.append("FLOC_TYPE_LAYOUTS = {")
+    for payload in FLOC_PAYLOADS:
+        fields = HEADERS[payload.header]
+        size_offset = None
+        for code, offset, parts in slots(fields):
+            if parts[0][0].length_of:
+                size_offset = offset
+        lines.append(f"    {payload.type}_VAL: ('{payload.name}', {header_size(fields)}, {size_offset}, "
+                     f"{payload.max_size or 0}),")
+    lines.append("}")
+    lines.append("")
+    lines.append("# Serial FLOC type -> bytes of header between SerialFlocHeader and the FLOC packet.")
+    lines.append("SERIAL_TYPE_LAYOUTS = {")
+    for payload in SERIAL_PAYLOADS:
+        lines.append(f"    {payload.type}_VAL: {header_size(HEADERS[payload.header])},")
+    lines.append("}")
+    lines.append("")
+    lines.append("")
+
+    # FlocRecord
+    lines.append("class FlocRecord(NamedTuple):")
+    lines.append('    """Decoded FLOC packet. Per-type fields that don\'t apply are None."""')
+    for field in floc_fields:
+        lines.append(f"    {field.name}: int")
+    for name in record_fields():
+        lines.append(f"    {name}: Optional[int] = None")
+    lines.append("    data: bytes = b''")
+    lines.append("")
+    lines.append("")
+
+    # encode_floc_packet
+    header_args = []
+    for field in floc_fields:
+        if field is discriminator:
+            header_args.append('type_val')
+        elif field.arg:
+            header_args.append(field.arg)
+    payload_args = []
+    for payload in FLOC_PAYLOADS:
+        for field in HEADERS[payload.header]:
+            if field.arg and field.arg not in payload_args:
+                payload_args.append(field.arg)
+
+    sig = [f"{a}: int" for a in header_args] + ["data: bytes"] + [f"{a}: int = -1" for a in payload_args]
+    lines.append("def encode_floc_packet(" + (",\n                       ".join(sig)) + ") -> bytes:")
+    lines.append('    """')
+    lines.append("    Encode a FLOC packet. Same arguments and output as build_floc_packet.")
+    lines.append('    """')
+    lines.append(f"    if type_val not in {discriminator.enum.upper()}_VALS:")
+    lines.append('        raise ValueError(f"Invalid FLOC packet type: {type_val}")')
+    for field in floc_fields:
+        if field.arg:
+            lines.append(f"    if not 0 <= {field.arg} <= 0x{(1 << field.bits) - 1:X}:")
+            lines.append(f'        raise ValueError(f"Invalid {field.label}: {{{field.arg}}}")')
+    lines.append("")
+    lines.append("    data_size = len(data)")
+    for payload in FLOC_PAYLOADS:
+        fields = HEADERS[payload.header]
+        lines.append("")
+        lines.append(f"    if type_val == {payload.type}_VAL:")
+        if payload.max_size is not None:
+            max_name = f"MAX_{payload.name.upper()}_SIZE"
+            lines.append(f"        if data_size > {max_name}:")
+            lines.append(f'            raise ValueError(f"{payload.name} data size exceeds maximum ({{{max_name}}} bytes)")')
+        else:
+            lines.append("        if data_size:")
+            lines.append(f'            raise ValueError("{payload.name} data size exceeds maximum (0 bytes)")')
+        for field in fields:
+            if not field.arg:
+                continue
+            if field.enum:
+                lines.append(f"        if {field.arg} not in {field.enum.upper()}_VALS:")
+            else:
+                lines.append(f"        if not 0 <= {field.arg} <= 0x{(1 << field.bits) - 1:X}:")
+            lines.append(f'            raise ValueError(f"Invalid {field.label}: {{{field.arg}}}")')
+
+        values = {}
+        for field in floc_fields:
+            if field is discriminator:
+                values[field.name] = enum_value(payload.type)
+            elif field.arg:
+                values[field.name] = field.arg
+            else:
+                values[field.name] = field.fixed or 0
+        for field in fields:
+            if field.length_of:
+                values[field.name] = 'data_size'
+            elif field.arg:
+                values[field.name] = field.arg
+            else:
+                values[field.name] = field.fixed or 0
+        pack_args = [pack_expr(parts, values) for _, _, parts in floc_slots + slots(fields)]
+        tail = " + data" if payload.max_size is not None else ""
+        lines.append(f"        return _{payload.name.upper()}_PREFIX.pack({', '.join(pack_args)}){tail}")
+    lines.append("")
+    lines.append('    raise ValueError(f"Invalid FLOC packet type: {type_val}")')
+    lines.append("")
+    lines.append("")
+
+    # decode_floc_packet
+    lines.append("def decode_floc_packet(buf, offset: int = 0, end: int = -1) -> FlocRecord:")
+    lines.append('    """')
+    lines.append("    Decode the FLOC packet in buf[offset:end] (end defaults to len(buf)).")
+    lines.append("    buf can be bytes, bytearray or memoryview.")
+    lines.append('    """')
+    lines.append("    if end < 0:")
+    lines.append("        end = len(buf)")
+    lines.append("    if end - offset < MIN_FLOC_PACKET_SIZE:")
+    lines.append('        raise ValueError(f"Truncated FLOC packet ({end - offset} bytes)")')
+    lines.append("")
+    lines.append(f"    {', '.join(slot_var(p) for _, _, p in floc_slots)} = FLOC_HEADER.unpack_from(buf, offset)")
+    for _, _, parts in floc_slots:
+        if len(parts) > 1:
+            for part in parts:
+                lines.append(f"    {var_name(part[0])} = {split_expr(slot_var(parts), part)}")
+    lines.append("    pos = offset + FLOC_HEADER_SIZE")
+    header_vars = ', '.join(var_name(f) for f in floc_fields)
+    for payload in FLOC_PAYLOADS:
+        fields = HEADERS[payload.header]
+        size = header_size(fields)
+        lines.append("")
+        lines.append(f"    if type_val == {payload.type}_VAL:")
+        lines.append(f"        if end - pos < {size}:")
+        lines.append(f'            raise ValueError("Truncated {payload.name} header")')
+        kwargs = []
+        for code, offset, parts in slots(fields):
+            width = 16 if code == 'H' else 8
+            for part in parts:
+                index = (lambda k, o=offset: f"pos + {o + k}" if o + k else "pos")
+                lines.append(f"        {var_name(part[0])} = {extract_expr('buf', index, part, width)}")
+                kwargs.append(f"{part[0].name}={var_name(part[0])}")
+        if payload.max_size is not None:
+            lines.append(f"        pos += {size}")
+            lines.append("        if pos + size > end:")
+            lines.append(f'            raise ValueError(f"Truncated {payload.name} payload ({{end - pos}} of {{size}} bytes)")')
+            kwargs.append("data=bytes(buf[pos:pos + size])")
+        lines.append(f"        return FlocRecord({header_vars},")
+        lines.append(f"                          {', '.join(kwargs)})")
+    lines.append("")
+    lines.append('    raise ValueError(f"Invalid FLOC packet type: {type_val}")')
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# floc_pkts.py
+# ---------------------------------------------------------------------------
+
+def scapy_field(field) -> str:
+    if field.enum:
+        mapping = ', '.join(f"{v}: '{k}'" for k, v in ENUMS[field.enum].items())
+        return f"BitEnumField('{field.name}', 0, {field.bits}, {{{mapping}}})"
+    if field.bits == 8:
+        return f"ByteField('{field.name}', 0)"
+    if field.bits == 16:
+        return f"ShortField('{field.name}', 0)"
+    return f"BitField('{field.name}', 0, {field.bits})"
+
+
+def gen_scapy_header(lines, name, fields):
+    lines.append(f"class {name}(Packet):")
+    lines.append(f'    name = "{name}"')
+    if fields:
+        lines.append("    fields_desc = [")
+        lines.append(",\n".join(f"        {scapy_field(f)}" for f in fields))
+        lines.append("    ]")
+    else:
+        lines.append("    fields_desc = []")
+    lines.append("")
+    lines.append("    def do_dissect(self, s):")
+    for code, offset, parts in slots(fields):
+        width = 16 if code == 'H' else 8
+        for part in parts:
+            if width == 16:
+                expr = f"int.from_bytes(s[{offset}:{offset + 2}], \"big\")"
+            else:
+                expr = extract_expr('s', lambda k, o=offset: str(o + k), part, width)
+            lines.append(f"        self.{part[0].name} = {expr}")
+    size = header_size(fields)
+    lines.append("        # Return the remaining bytes so they're available to the next layer")
+    lines.append(f"        return s[{size}:]" if size else "        return s")
+    lines.append("")
+    lines.append("    def extract_padding(self, s):")
+    lines.append("        # Return an empty payload for this header and pass all remaining bytes to the next layer.")
+    lines.append('        return b"", s')
+    lines.append("")
+
+
+def gen_pkts() -> str:
+    enum_names = []
+    for enum_name, members in ENUMS.items():
+        enum_names.extend(members)
+        enum_names.append(f"get_{enum_name}")
+
+    lines = [
+        "# floc_pkts.py (VARIABLE LENGTH DATA)",
+        GENERATED_NOTE,
+        "from scapy.packet import Packet, bind_layers",
+        "from scapy.fields import (",
+        "    BitField,",
+        "    BitEnumField,",
+        "    ShortField,",
+        "    ByteField,",
+        "    PacketField,",
+        "    StrLenField,",
+        "    ConditionalField",
+        ")",
+        "from scapy.compat import raw",
+        "",
+        "from .floc_defs import (",
+    ]
+    lines.extend(f"    {n}," for n in enum_names)
+    lines.append(")")
+    lines.append("")
+    lines.append("")
+
+    for name, fields in HEADERS.items():
+        gen_scapy_header(lines, name, fields)
+
+    for payload in FLOC_PAYLOADS:
+        lines.append(f"class {payload.name}Packet(Packet):")
+        lines.append(f'    name = "{payload.name}Packet"')
+        lines.append("    fields_desc = [")
+        entries = [f"        PacketField('header', {payload.header}(), {payload.header})"]
+        if payload.max_size is not None:
+            size_field = next(f for f in HEADERS[payload.header] if f.length_of)
+            entries.append(f"        StrLenField('{size_field.length_of}', b'', "
+                           f"length_from=lambda pkt: pkt.header.{size_field.name})")
+        lines.append(",\n".join(entries))
+        lines.append("    ]")
+        lines.append("")
+
+    def conditional_packet(name, header, payloads):
+        discriminator = next(f for f in HEADERS[header] if f.enum)
+        lines.append(f"class {name}(Packet):")
+        lines.append(f'    name = "{name}"')
+        lines.append("    fields_desc = [")
+        entries = [f'        PacketField("header", {header}(), {header})']
+        for payload in payloads:
+            cls = f"{payload.name}Packet"
+            entries.append(f'        ConditionalField(PacketField("{payload.field}", {cls}(), {cls}), '
+                           f'lambda pkt: pkt.header.{discriminator.name} == {enum_value(payload.type)})')
+        lines.append(",\n".join(entries))
+        lines.append("    ]")
+        lines.append("")
+
+    conditional_packet("FlocPacket", "FlocHeader", FLOC_PAYLOADS)
+
+    for payload in SERIAL_PAYLOADS:
+        lines.append(f"class {payload.name}Packet(Packet):")
+        lines.append(f'    name = "{payload.name}Packet"')
+        lines.append("    fields_desc = [")
+        lines.append(f'        PacketField("header", {payload.header}(), {payload.header}),')
+        lines.append('        PacketField("floc_packet", FlocPacket(), FlocPacket)')
+        lines.append("    ]")
+        lines.append("")
+
+    conditional_packet("SerialFlocPacket", "SerialFlocHeader", SERIAL_PAYLOADS)
+
+    for payload in SERIAL_PAYLOADS:
+        lines.append(f"bind_layers(SerialFlocHeader, {payload.header}, type={enum_value(payload.type)})")
+    for payload in SERIAL_PAYLOADS:
+        lines.append(f"bind_layers({payload.header}, FlocHeader)")
+    for payload in FLOC_PAYLOADS:
+        lines.append(f"bind_layers(FlocHeader, {payload.name}Packet, type={enum_value(payload.type)})")
+    return "\n".join(lines) + "\n"
+
+
+OUTPUTS = {
+    "floc_defs.py": gen_defs,
+    "floc_pkts.py": gen_pkts,
+}
+
+
+def main(argv) -> int:
+    check = "--check" in argv
+    stale = []
+    for filename, gen in OUTPUTS.items():
+        path = os.path.join(HERE, filename)
+        text = gen()
+        try:
+            with open(path) as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = None
+        if current == text:
+            continue
+        stale.append(filename)
+        if not check:
+            with open(path, "w") as f:
+                f.write(text)
+            print(f"Wrote {path}")
+    if check and stale:
+        print(f"Out of date with {floc_spec.__name__}: {', '.join(stale)} (run python -m NestUi.Utils.floc_gen)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
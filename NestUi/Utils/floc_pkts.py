@@ -1,4 +1,5 @@
 # floc_pkts.py (VARIABLE LENGTH DATA)
+# GENERATED by floc_gen.py from floc_spec.py - edit the spec, not this file.
 from scapy.packet import Packet, bind_layers
 from scapy.fields import (
     BitField,
@@ -11,43 +12,19 @@ from scapy.fields import (
 )
 from scapy.compat import raw
 
-FLOC_DATA_TYPE = 'FLOC_DATA_TYPE'
-FLOC_COMMAND_TYPE = 'FLOC_COMMAND_TYPE'
-FLOC_ACK_TYPE = 'FLOC_ACK_TYPE'
-FLOC_RESPONSE_TYPE = 'FLOC_RESPONSE_TYPE'
-
-def get_floc_packet_type(value: int) -> str:
-    """Converts an integer value to the floc_packet_type enum's string representation."""
-    _mapping = {
-        0: FLOC_DATA_TYPE,
-        1: FLOC_COMMAND_TYPE,
-        2: FLOC_ACK_TYPE,
-        3: FLOC_RESPONSE_TYPE,
-    }
-    return _mapping.get(value, '')
-
-COMMAND_TYPE_1 = 'COMMAND_TYPE_1'
-COMMAND_TYPE_2 = 'COMMAND_TYPE_2'
-
-def get_command_type(value: int) -> str:
-    """Converts an integer value to the command_type enum's string representation."""
-    _mapping = {
-        1: COMMAND_TYPE_1,
-        2: COMMAND_TYPE_2,
-    }
-    return _mapping.get(value, '')
-
-SERIAL_BROADCAST_TYPE = 'SERIAL_BROADCAST_TYPE'
-SERIAL_UNICAST_TYPE = 'SERIAL_UNICAST_TYPE'
-
-def get_serial_floc_packet_type(value: int) -> str:
-    """Converts an integer value to the serial_floc_packet_type enum's string representation."""
-    _mapping = {
-        66: SERIAL_BROADCAST_TYPE,
-        85: SERIAL_UNICAST_TYPE,
-    }
-    return _mapping.get(value, '')
-
+from .floc_defs import (
+    FLOC_DATA_TYPE,
+    FLOC_COMMAND_TYPE,
+    FLOC_ACK_TYPE,
+    FLOC_RESPONSE_TYPE,
+    get_floc_packet_type,
+    COMMAND_TYPE_1,
+    COMMAND_TYPE_2,
+    get_command_type,
+    SERIAL_BROADCAST_TYPE,
+    SERIAL_UNICAST_TYPE,
+    get_serial_floc_packet_type,
+)
 
 
 class FlocHeader(Packet):
@@ -63,21 +40,19 @@ class FlocHeader(Packet):
     ]
 
     def do_dissect(self, s):
-         # Consume exactly one byte for the size field
         self.ttl = s[0] >> 4
-        self.type = s[0] & 0b1111
-        self.nid = int.from_bytes(s[1:3])
+        self.type = s[0] & 0xF
+        self.nid = int.from_bytes(s[1:3], "big")
         self.res = s[3] >> 6
-        self.pid = s[3] & 0b11_1111
-        self.dest_addr = int.from_bytes(s[4:6])
-        self.src_addr = int.from_bytes(s[6:8])
-
-        # Return the remaining bytes so that they’re available to the DataPacket
+        self.pid = s[3] & 0x3F
+        self.dest_addr = int.from_bytes(s[4:6], "big")
+        self.src_addr = int.from_bytes(s[6:8], "big")
+        # Return the remaining bytes so they're available to the next layer
         return s[8:]
 
     def extract_padding(self, s):
-         # Return an empty payload for this header and pass all remaining bytes to the next layer.
-         return b"", s
+        # Return an empty payload for this header and pass all remaining bytes to the next layer.
+        return b"", s
 
 class DataHeader(Packet):
     name = "DataHeader"
@@ -86,14 +61,13 @@ class DataHeader(Packet):
     ]
 
     def do_dissect(self, s):
-         # Consume exactly one byte for the size field
-         self.size = s[0]
-         # Return the remaining bytes so that they’re available to the DataPacket
-         return s[1:]
+        self.size = s[0]
+        # Return the remaining bytes so they're available to the next layer
+        return s[1:]
 
     def extract_padding(self, s):
-         # Return an empty payload for this header and pass all remaining bytes to the next layer.
-         return b"", s
+        # Return an empty payload for this header and pass all remaining bytes to the next layer.
+        return b"", s
 
 class CommandHeader(Packet):
     name = "CommandHeader"
@@ -103,15 +77,14 @@ class CommandHeader(Packet):
     ]
 
     def do_dissect(self, s):
-         # Consume exactly one byte for the size field
-         self.command_type = s[0]
-         self.size = s[1]
-         # Return the remaining bytes so that they’re available to the DataPacket
-         return s[2:]
+        self.command_type = s[0]
+        self.size = s[1]
+        # Return the remaining bytes so they're available to the next layer
+        return s[2:]
 
     def extract_padding(self, s):
-         # Return an empty payload for this header and pass all remaining bytes to the next layer.
-         return b"", s
+        # Return an empty payload for this header and pass all remaining bytes to the next layer.
+        return b"", s
 
 class AckHeader(Packet):
     name = "AckHeader"
@@ -120,14 +93,13 @@ class AckHeader(Packet):
     ]
 
     def do_dissect(self, s):
-         # Consume exactly one byte for the size field
-         self.ack_pid = s[0]
-         # Return the remaining bytes so that they’re available to the DataPacket
-         return s[1:]
+        self.ack_pid = s[0]
+        # Return the remaining bytes so they're available to the next layer
+        return s[1:]
 
     def extract_padding(self, s):
-         # Return an empty payload for this header and pass all remaining bytes to the next layer.
-         return b"", s
+        # Return an empty payload for this header and pass all remaining bytes to the next layer.
+        return b"", s
 
 class ResponseHeader(Packet):
     name = "ResponseHeader"
@@ -137,15 +109,14 @@ class ResponseHeader(Packet):
     ]
 
     def do_dissect(self, s):
-         # Consume exactly one byte for the size field
-         self.request_pid = s[0]
-         self.size = s[1]
-         # Return the remaining bytes so that they’re available to the DataPacket
-         return s[2:]
+        self.request_pid = s[0]
+        self.size = s[1]
+        # Return the remaining bytes so they're available to the next layer
+        return s[2:]
 
     def extract_padding(self, s):
-         # Return an empty payload for this header and pass all remaining bytes to the next layer.
-         return b"", s
+        # Return an empty payload for this header and pass all remaining bytes to the next layer.
+        return b"", s
 
 class SerialFlocHeader(Packet):
     name = "SerialFlocHeader"
@@ -155,46 +126,41 @@ class SerialFlocHeader(Packet):
     ]
 
     def do_dissect(self, s):
-         # Consume exactly one byte for the size field
-         self.type = s[0]
-         self.size = s[1]
-         # Return the remaining bytes so that they’re available to the DataPacket
-         return s[2:]
+        self.type = s[0]
+        self.size = s[1]
+        # Return the remaining bytes so they're available to the next layer
+        return s[2:]
 
     def extract_padding(self, s):
-         # Return an empty payload for this header and pass all remaining bytes to the next layer.
-         return b"", s
+        # Return an empty payload for this header and pass all remaining bytes to the next layer.
+        return b"", s
 
 class SerialBroadcastHeader(Packet):
     name = "SerialBroadcastHeader"
-    fields_desc = [
-
-    ]
+    fields_desc = []
 
     def do_dissect(self, s):
-         # Consume exactly one byte for the size field
-         # Return the remaining bytes so that they’re available to the DataPacket
-         return s
+        # Return the remaining bytes so they're available to the next layer
+        return s
 
     def extract_padding(self, s):
-         # Return an empty payload for this header and pass all remaining bytes to the next layer.
-         return b"", s
+        # Return an empty payload for this header and pass all remaining bytes to the next layer.
+        return b"", s
 
 class SerialUnicastHeader(Packet):
     name = "SerialUnicastHeader"
     fields_desc = [
-        ShortField("dest_addr", 0)
+        ShortField('dest_addr', 0)
     ]
 
     def do_dissect(self, s):
-         # Consume exactly one byte for the size field
-         self.dest_addr = int.from_bytes(s[:2],"big")
-         # Return the remaining bytes so that they’re available to the DataPacket
-         return s[2:]
+        self.dest_addr = int.from_bytes(s[0:2], "big")
+        # Return the remaining bytes so they're available to the next layer
+        return s[2:]
 
     def extract_padding(self, s):
-         # Return an empty payload for this header and pass all remaining bytes to the next layer.
-         return b"", s
+        # Return an empty payload for this header and pass all remaining bytes to the next layer.
+        return b"", s
 
 class DataPacket(Packet):
     name = "DataPacket"
@@ -229,7 +195,8 @@ class FlocPacket(Packet):
         PacketField("header", FlocHeader(), FlocHeader),
         ConditionalField(PacketField("data", DataPacket(), DataPacket), lambda pkt: pkt.header.type == 0),
         ConditionalField(PacketField("command", CommandPacket(), CommandPacket), lambda pkt: pkt.header.type == 1),
-        ConditionalField(PacketField("response", ResponsePacket(), ResponsePacket), lambda pkt: pkt.header.type == 3),
+        ConditionalField(PacketField("ack", AckPacket(), AckPacket), lambda pkt: pkt.header.type == 2),
+        ConditionalField(PacketField("response", ResponsePacket(), ResponsePacket), lambda pkt: pkt.header.type == 3)
     ]
 
 class SerialBroadcastPacket(Packet):
@@ -250,13 +217,15 @@ class SerialFlocPacket(Packet):
     name = "SerialFlocPacket"
     fields_desc = [
         PacketField("header", SerialFlocHeader(), SerialFlocHeader),
-        ConditionalField(PacketField("broadcast", SerialBroadcastPacket(), SerialBroadcastPacket), lambda pkt: pkt.header.type == ord('B')),
-        ConditionalField(PacketField("unicast", SerialUnicastPacket(), SerialUnicastPacket), lambda pkt: pkt.header.type == ord('U')),
+        ConditionalField(PacketField("broadcast", SerialBroadcastPacket(), SerialBroadcastPacket), lambda pkt: pkt.header.type == 66),
+        ConditionalField(PacketField("unicast", SerialUnicastPacket(), SerialUnicastPacket), lambda pkt: pkt.header.type == 85)
     ]
-bind_layers(SerialFlocHeader, SerialBroadcastHeader, type=ord('B'))
-bind_layers(SerialFlocHeader, SerialUnicastHeader, type=ord('U'))
+
+bind_layers(SerialFlocHeader, SerialBroadcastHeader, type=66)
+bind_layers(SerialFlocHeader, SerialUnicastHeader, type=85)
 bind_layers(SerialBroadcastHeader, FlocHeader)
 bind_layers(SerialUnicastHeader, FlocHeader)
 bind_layers(FlocHeader, DataPacket, type=0)
 bind_layers(FlocHeader, CommandPacket, type=1)
-bind_layers(FlocPacket, ResponsePacket, type=3)
\ No newline at end of file
+bind_layers(FlocHeader, AckPacket, type=2)
+bind_layers(FlocHeader, ResponsePacket, type=3)
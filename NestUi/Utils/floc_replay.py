@@ -0,0 +1,176 @@
+# floc_replay.py
+# Push a recorded capture back through the receive path - deframing,
+# SerialFlocPacket decoding and nest_db writes - to load test ingest.
+#
+#   python -m NestUi.Utils.floc_replay run.floccap               original timing
+#   python -m NestUi.Utils.floc_replay run.floccap --speed 10    10x faster
+#   python -m NestUi.Utils.floc_replay run.floccap --speed 0     as fast as possible
+#
+# Prints sustained packets/s and how the time split between stages.
+import argparse
+import time
+from datetime import datetime
+
+from .floc_capture import CaptureReader, CAPTURE_RX, CAPTURE_TX
+from .floc_codec import SERIAL_UNICAST_TYPE_VAL, decode_serial_floc_packet
+from .floc_deframer import SerialFlocDeframer, frame_serial_floc_packet
+
+STAGES = ("read", "deframe", "decode", "store", "wait")
+
+
+def decode_scapy(frame: bytes):
+    """What NuiSerialWidget does with a received packet."""
+    from .floc_pkts import SerialFlocPacket
+    return SerialFlocPacket(frame)
+
+
+DECODERS = {
+    "scapy": decode_scapy,
+    "fast": decode_serial_floc_packet,
+}
+
+
+def source_address(packet) -> int:
+    """src_addr of a decoded packet from either decoder."""
+    floc = packet.floc_packet if hasattr(packet, "floc_packet") else None
+    if floc is not None:
+        return floc.src_addr
+    serial = packet.unicast if packet.header.type == SERIAL_UNICAST_TYPE_VAL else packet.broadcast
+    return serial.floc_packet.header.src_addr
+
+
+def store_last_heard(packet):
+    """
+    Default DB stage: mark the sending buoy as heard from, one nest_db write
+    per packet. The source address is the buoy's DID (Buoy.did), as in the
+    gateway; a packet from an address no buoy has counts as a store error.
+    """
+    from . import nest_db
+    address = source_address(packet)
+    if nest_db.record_heard({address: {"time": datetime.now()}}):
+        raise LookupError(f"No buoy with DID {address}")
+
+
+class ReplayStats:
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+        self.decode_errors = 0
+        self.store_errors = 0
+        self.elapsed_s = 0.0
+        self.stage_s = dict.fromkeys(STAGES, 0.0)
+
+    @property
+    def packets_per_s(self) -> float:
+        return self.packets / self.elapsed_s if self.elapsed_s else 0.0
+
+    def report(self) -> str:
+        lines = [f"{self.packets} packets, {self.bytes} bytes in {self.elapsed_s:.3f} s "
+                 f"({self.packets_per_s:,.0f} packets/s)"]
+        if self.decode_errors or self.store_errors:
+            lines.append(f"{self.decode_errors} decode errors, {self.store_errors} store errors")
+        for stage in STAGES:
+            spent = self.stage_s[stage]
+            share = spent / self.elapsed_s if self.elapsed_s else 0.0
+            per_packet = spent / self.packets * 1e6 if self.packets else 0.0
+            lines.append(f"  {stage:<8} {spent:9.3f} s {share:6.1%} {per_packet:9.1f} us/packet")
+        return "\n".join(lines)
+
+
+def replay(reader: CaptureReader,
+           speed: float = 1.0,
+           decoder=decode_scapy,
+           store=store_last_heard,
+           start: int = 0,
+           stop: int = -1,
+           direction: int = CAPTURE_RX) -> ReplayStats:
+    """
+    Replay records start..stop of reader in the given direction. speed is a
+    multiplier on the recorded timing; 0 or less replays as fast as possible.
+    store=None leaves out the DB stage. Decode and store errors are counted
+    rather than raised, like the live reader would carry on.
+    """
+    if stop < 0:
+        stop = len(reader)
+    stats = ReplayStats()
+    stage_s = stats.stage_s
+    deframer = SerialFlocDeframer()
+    clock = time.perf_counter
+
+    first_ts = None
+    began = clock()
+    for i in range(start, stop):
+        t0 = clock()
+        record = reader[i]
+        if record.direction != direction:
+            continue
+        # Frame it again so the deframer sees what came off the wire.
+        wire = frame_serial_floc_packet(record.frame)
+        t1 = clock()
+        stage_s["read"] += t1 - t0
+
+        if speed > 0:
+            if first_ts is None:
+                first_ts = record.timestamp_ns
+            due = began + (record.timestamp_ns - first_ts) / 1e9 / speed
+            if due > t1:
+                time.sleep(due - t1)
+            t2 = clock()
+            stage_s["wait"] += t2 - t1
+            t1 = t2
+
+        frames = deframer.feed(wire)
+        t2 = clock()
+        stage_s["deframe"] += t2 - t1
+
+        for frame in frames:
+            stats.packets += 1
+            stats.bytes += len(wire)
+            t2 = clock()
+            try:
+                packet = decoder(frame)
+            except Exception:
+                stats.decode_errors += 1
+                stage_s["decode"] += clock() - t2
+                continue
+            t3 = clock()
+            stage_s["decode"] += t3 - t2
+            if store is not None:
+                try:
+                    store(packet)
+                except Exception:
+                    stats.store_errors += 1
+                stage_s["store"] += clock() - t3
+
+    stats.elapsed_s = clock() - began
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m NestUi.Utils.floc_replay",
+                                     description="Replay a FLOC capture through the receive path.")
+    parser.add_argument("capture", help=".floccap file")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="timing multiplier; 0 replays as fast as possible (default 1)")
+    parser.add_argument("--decoder", choices=sorted(DECODERS), default="scapy",
+                        help="packet decoder (default scapy, as the GUI uses)")
+    parser.add_argument("--no-db", action="store_true", help="skip the nest_db stage")
+    parser.add_argument("--start", type=int, default=0, help="first record")
+    parser.add_argument("--stop", type=int, default=-1, help="record to stop before")
+    parser.add_argument("--tx", action="store_true", help="replay sent instead of received packets")
+    args = parser.parse_args()
+
+    store = None
+    if not args.no_db:
+        from dotenv import load_dotenv
+        load_dotenv()
+        store = store_last_heard
+
+    with CaptureReader(args.capture) as reader:
+        stats = replay(reader, args.speed, DECODERS[args.decoder], store,
+                       args.start, args.stop, CAPTURE_TX if args.tx else CAPTURE_RX)
+    print(stats.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# floc_spec.py
+# Single source description of the FLOC and Serial FLOC protocols, kept in step
+# with the firmware in nova-floc. floc_gen.py turns it into:
+#   floc_pkts.py - the Scapy classes (dissection / show())
+#   floc_defs.py - enums, size limits, struct formats and the fast codec core
+# After editing this file run `python -m NestUi.Utils.floc_gen`.
+from typing import NamedTuple, Optional
+
+
+class Field(NamedTuple):
+    name: str
+    bits: int
+    # Enum (key of ENUMS) the value must belong to.
+    enum: Optional[str] = None
+    # Argument name in build_floc_packet / encode_floc_packet; None means the
+    # field is filled in by the codec (discriminator, size or fixed value).
+    arg: Optional[str] = None
+    # How the field is named in error messages.
+    label: Optional[str] = None
+    # Value written when there's no argument for it.
+    fixed: Optional[int] = None
+    # Set on a size byte: the name of the variable-length field it measures.
+    length_of: Optional[str] = None
+
+
+class Payload(NamedTuple):
+    # Enum member selecting this payload.
+    type: str
+    # Human name used for the Scapy class (<name>Packet) and in errors.
+    name: str
+    # Name of the ConditionalField on the parent packet.
+    field: str
+    # Header class that starts the payload.
+    header: str
+    # Largest data field in bytes, or None if the payload has no data field.
+    max_size: Optional[int] = None
+
+
+ENUMS = {
+    'floc_packet_type': {
+        'FLOC_DATA_TYPE': 0,
+        'FLOC_COMMAND_TYPE': 1,
+        'FLOC_ACK_TYPE': 2,
+        'FLOC_RESPONSE_TYPE': 3,
+    },
+    'command_type': {
+        'COMMAND_TYPE_1': 1,
+        'COMMAND_TYPE_2': 2,
+    },
+    'serial_floc_packet_type': {
+        'SERIAL_BROADCAST_TYPE': ord('B'),
+        'SERIAL_UNICAST_TYPE': ord('U'),
+    },
+}
+
+# Headers in wire order, most significant bits first. Bit fields must pack
+# into whole bytes.
+HEADERS = {
+    'FlocHeader': [
+        Field('ttl', 4, arg='ttl', label='TTL'),
+        Field('type', 4, enum='floc_packet_type'),
+        Field('nid', 16, arg='nid', label='network ID'),
+        Field('res', 2, fixed=0),
+        Field('pid', 6, arg='pid', label='pid'),
+        Field('dest_addr', 16, arg='dst', label='destination address'),
+        Field('src_addr', 16, arg='src', label='source address'),
+    ],
+    'DataHeader': [
+        Field('size', 8, length_of='data'),
+    ],
+    'CommandHeader': [
+        Field('command_type', 8, enum='command_type', arg='cmd_type_val', label='command type'),
+        Field('size', 8, length_of='data'),
+    ],
+    'AckHeader': [
+        Field('ack_pid', 8, arg='ack_pid_val', label='ack pid value'),
+    ],
+    'ResponseHeader': [
+        Field('request_pid', 8, arg='rsp_pid_val', label='response pid value'),
+        Field('size', 8, length_of='data'),
+    ],
+    'SerialFlocHeader': [
+        Field('type', 8, enum='serial_floc_packet_type'),
+        Field('size', 8),
+    ],
+    'SerialBroadcastHeader': [],
+    'SerialUnicastHeader': [
+        Field('dest_addr', 16, label='destination address'),
+    ],
+}
+
+# FlocPacket: FlocHeader, then one of these chosen by FlocHeader.type.
+FLOC_PAYLOADS = [
+    Payload('FLOC_DATA_TYPE', 'Data', 'data', 'DataHeader', max_size=55),
+    Payload('FLOC_COMMAND_TYPE', 'Command', 'command', 'CommandHeader', max_size=51),
+    Payload('FLOC_ACK_TYPE', 'Ack', 'ack', 'AckHeader'),
+    Payload('FLOC_RESPONSE_TYPE', 'Response', 'response', 'ResponseHeader', max_size=54),
+]
+
+# SerialFlocPacket: SerialFlocHeader, then one of these chosen by
+# SerialFlocHeader.type, then the FlocPacket (SerialFlocHeader.size bytes).
+SERIAL_PAYLOADS = [
+    Payload('SERIAL_BROADCAST_TYPE', 'SerialBroadcast', 'broadcast', 'SerialBroadcastHeader'),
+    Payload('SERIAL_UNICAST_TYPE', 'SerialUnicast', 'unicast', 'SerialUnicastHeader'),
+]
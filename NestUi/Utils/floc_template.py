@@ -0,0 +1,113 @@
+# floc_template.py
+# Precompiled '$'-framed Serial FLOC frames for sending the same packet over
+# and over with only dst, pid and ttl changing (polls, fleet-wide commands).
+# The frame is built once; each send just stamps those fields into a
+# preallocated bytearray.
+import struct
+
+from .floc_codec import encode_floc_packet, encode_serial_floc_packet
+from .floc_deframer import frame_serial_floc_packet
+
+_U16 = struct.Struct(">H")
+
+
+class FrameTemplate:
+    """
+    A framed Serial FLOC packet with dst, pid and ttl left variable.
+
+    Arguments are the same as encode_floc_packet / encode_serial_floc_packet
+    minus the variable fields. For unicast templates the serial dest_addr
+    follows dst unless serial_dest is given to stamp().
+    """
+
+    def __init__(self,
+                 type_val: int,
+                 nid: int,
+                 src: int,
+                 data: bytes = b"",
+                 ttl: int = 1,
+                 cmd_type_val: int = -1,
+                 ack_pid_val: int = -1,
+                 rsp_pid_val: int = -1,
+                 serial_type_val: str = "B"):
+        # Build it once with placeholder values; this also validates everything.
+        floc = encode_floc_packet(ttl, type_val, nid, 0, 0, src, data,
+                                  cmd_type_val=cmd_type_val,
+                                  ack_pid_val=ack_pid_val,
+                                  rsp_pid_val=rsp_pid_val)
+        serial = encode_serial_floc_packet(floc, serial_type_val, 0)
+
+        self.unicast = serial_type_val.upper() == "U"
+        self.ttl = ttl
+        self._type_val = type_val
+        self._frame = bytearray(frame_serial_floc_packet(serial))
+
+        # Offsets into the framed bytes ('$' first).
+        self._serial_dest_offset = 3 if self.unicast else None
+        floc_offset = 1 + len(serial) - len(floc)
+        self._ttl_type_offset = floc_offset
+        self._pid_offset = floc_offset + 3
+        self._dst_offset = floc_offset + 4
+
+    def __len__(self):
+        return len(self._frame)
+
+    def stamp(self, dst: int, pid: int, ttl: int = -1, serial_dest: int = -1) -> bytes:
+        """
+        Return the framed bytes for this dst/pid (and optionally ttl).
+        """
+        if ttl < 0:
+            ttl = self.ttl
+        if not 0 <= ttl <= 0xF:
+            raise ValueError(f"Invalid TTL: {ttl}")
+        if not 0 <= pid <= 0x3F:
+            raise ValueError(f"Invalid pid: {pid}")
+        if not 0 <= dst <= 0xFFFF:
+            raise ValueError(f"Invalid destination address: {dst}")
+        if serial_dest > 0xFFFF:
+            raise ValueError(f"Invalid destination address: {serial_dest}")
+
+        frame = self._frame
+        frame[self._ttl_type_offset] = (ttl << 4) | self._type_val
+        frame[self._pid_offset] = pid
+        _U16.pack_into(frame, self._dst_offset, dst)
+        if self.unicast:
+            _U16.pack_into(frame, self._serial_dest_offset, dst if serial_dest < 0 else serial_dest)
+        return bytes(frame)
+
+    def stamp_many(self, dsts, first_pid: int = 0, ttl: int = -1) -> list:
+        """
+        Frames for a burst to every dst in dsts, with pids counting up from
+        first_pid and wrapping at 64 like the serial widget does.
+        """
+        return [self.stamp(dst, (first_pid + i) % 64, ttl) for i, dst in enumerate(dsts)]
+
+    def stamp_burst(self, dsts, first_pid: int = 0, ttl: int = -1) -> bytes:
+        """
+        Same as stamp_many but as one buffer, ready for a single write().
+        """
+        return b"".join(self.stamp_many(dsts, first_pid, ttl))
+
+
+# --- Test Cases ---
+if __name__ == "__main__":
+    import time
+    from .networking import build_floc_packet, build_serial_floc_packet
+
+    template = FrameTemplate(type_val=1, nid=12, src=1, data=b"poll", ttl=4, cmd_type_val=2, serial_type_val="U")
+    for dst, pid, ttl in ((5, 0, -1), (65535, 63, 15), (300, 17, 0)):
+        expected_ttl = template.ttl if ttl < 0 else ttl
+        floc = build_floc_packet(expected_ttl, 1, 12, pid, dst, 1, b"poll", cmd_type_val=2)
+        expected = b"$" + build_serial_floc_packet(floc, "U", dst) + b"\r\n"
+        assert template.stamp(dst, pid, ttl) == expected, (template.stamp(dst, pid, ttl), expected)
+
+    broadcast = FrameTemplate(type_val=0, nid=3, src=9, data=b"\r\n$")
+    floc = build_floc_packet(1, 0, 3, 9, 77, 9, b"\r\n$")
+    assert broadcast.stamp(77, 9) == b"$" + build_serial_floc_packet(floc, "B") + b"\r\n"
+    print("Templates match build_floc_packet / build_serial_floc_packet")
+
+    dsts = list(range(1, 10001))
+    start = time.perf_counter()
+    burst = template.stamp_burst(dsts)
+    elapsed = time.perf_counter() - start
+    print(f"Stamped a {len(dsts)} buoy poll burst ({len(burst)} bytes) in {elapsed * 1000:.1f} ms")
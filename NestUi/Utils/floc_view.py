@@ -0,0 +1,198 @@
+# floc_view.py
+# Lazy, read-only views over FLOC / Serial FLOC frames held in a memoryview.
+# Nothing is decoded until a field is read and payloads are sub-views of the
+# original buffer, so filtering and routing can look at a couple of header
+# fields per frame without copying or building Packet objects.
+from .floc_codec import (
+    FLOC_COMMAND_TYPE_VAL,
+    FLOC_ACK_TYPE_VAL,
+    FLOC_RESPONSE_TYPE_VAL,
+    FLOC_HEADER_SIZE,
+    FLOC_TYPE_LAYOUTS,
+    SERIAL_FLOC_HEADER_SIZE,
+    SERIAL_TYPE_LAYOUTS,
+    SERIAL_UNICAST_TYPE_VAL,
+    decode_floc_packet,
+    decode_serial_floc_packet,
+    serial_floc_frame_size,
+)
+
+def _as_view(buf) -> memoryview:
+    view = buf if isinstance(buf, memoryview) else memoryview(buf)
+    if view.format != 'B':
+        view = view.cast('B')
+    return view
+
+
+class FlocView:
+    """
+    Read-only view of one FLOC packet. Per-type fields that don't apply to the
+    packet's type read as None, like FlocRecord.
+    """
+    __slots__ = ('buf',)
+
+    def __init__(self, buf):
+        self.buf = _as_view(buf)
+
+    @property
+    def ttl(self) -> int:
+        return self.buf[0] >> 4
+
+    @property
+    def type(self) -> int:
+        return self.buf[0] & 0xF
+
+    @property
+    def nid(self) -> int:
+        return (self.buf[1] << 8) | self.buf[2]
+
+    @property
+    def res(self) -> int:
+        return self.buf[3] >> 6
+
+    @property
+    def pid(self) -> int:
+        return self.buf[3] & 0x3F
+
+    @property
+    def dest_addr(self) -> int:
+        return (self.buf[4] << 8) | self.buf[5]
+
+    @property
+    def src_addr(self) -> int:
+        return (self.buf[6] << 8) | self.buf[7]
+
+    @property
+    def command_type(self):
+        return self.buf[FLOC_HEADER_SIZE] if self.type == FLOC_COMMAND_TYPE_VAL else None
+
+    @property
+    def ack_pid(self):
+        return self.buf[FLOC_HEADER_SIZE] if self.type == FLOC_ACK_TYPE_VAL else None
+
+    @property
+    def request_pid(self):
+        return self.buf[FLOC_HEADER_SIZE] if self.type == FLOC_RESPONSE_TYPE_VAL else None
+
+    @property
+    def size(self):
+        layout = FLOC_TYPE_LAYOUTS.get(self.type)
+        if layout is None or layout[2] is None:
+            return None
+        return self.buf[FLOC_HEADER_SIZE + layout[2]]
+
+    @property
+    def data(self) -> memoryview:
+        """Payload as a sub-view of the underlying buffer."""
+        layout = FLOC_TYPE_LAYOUTS.get(self.type)
+        if layout is None or layout[2] is None:
+            return self.buf[0:0]
+        start = FLOC_HEADER_SIZE + layout[1]
+        return self.buf[start:start + self.buf[FLOC_HEADER_SIZE + layout[2]]]
+
+    def to_record(self):
+        """Fully decode (and validate) into a FlocRecord."""
+        return decode_floc_packet(self.buf)
+
+    def to_scapy(self):
+        """Build the Scapy FlocPacket, e.g. for show()."""
+        from .floc_pkts import FlocPacket
+        return FlocPacket(bytes(self.buf))
+
+    def __repr__(self):
+        return (f"<FlocView ttl={self.ttl} type={self.type} nid={self.nid} pid={self.pid} "
+                f"dest_addr={self.dest_addr} src_addr={self.src_addr}>")
+
+
+class SerialFlocView:
+    """
+    Read-only view of one Serial FLOC packet (without the '$' / CRLF framing).
+    dest_addr is None for broadcasts.
+    """
+    __slots__ = ('buf',)
+
+    def __init__(self, buf):
+        self.buf = _as_view(buf)
+
+    @property
+    def type(self) -> int:
+        return self.buf[0]
+
+    @property
+    def size(self) -> int:
+        return self.buf[1]
+
+    @property
+    def dest_addr(self):
+        if self.buf[0] != SERIAL_UNICAST_TYPE_VAL:
+            return None
+        return (self.buf[2] << 8) | self.buf[3]
+
+    @property
+    def floc_packet(self) -> FlocView:
+        extra = SERIAL_TYPE_LAYOUTS.get(self.buf[0])
+        if extra is None:
+            raise ValueError(f"Invalid Serial FLOC packet type: {self.buf[0]}")
+        start = SERIAL_FLOC_HEADER_SIZE + extra
+        return FlocView(self.buf[start:start + self.buf[1]])
+
+    def to_record(self):
+        """Fully decode (and validate) into a SerialFlocRecord."""
+        return decode_serial_floc_packet(self.buf)
+
+    def to_scapy(self):
+        """Build the Scapy SerialFlocPacket, e.g. for show()."""
+        from .floc_pkts import SerialFlocPacket
+        return SerialFlocPacket(bytes(self.buf))
+
+    def __repr__(self):
+        return f"<SerialFlocView type={chr(self.type)!r} size={self.size} dest_addr={self.dest_addr}>"
+
+
+def iter_serial_floc_views(buf, offset: int = 0, end: int = -1):
+    """
+    Walk back to back Serial FLOC packets in buf[offset:end] and yield a view
+    for each one.
+    """
+    view = _as_view(buf)
+    if end < 0:
+        end = len(view)
+    while offset + SERIAL_FLOC_HEADER_SIZE <= end:
+        size = serial_floc_frame_size(view, offset)
+        if offset + size > end:
+            raise ValueError(f"Truncated Serial FLOC packet at offset {offset}")
+        yield SerialFlocView(view[offset:offset + size])
+        offset += size
+
+
+# --- Test Cases ---
+if __name__ == "__main__":
+    import random
+    from .floc_codec import encode_floc_packet, encode_serial_floc_packet
+
+    rng = random.Random(3)
+    packets = []
+    for i in range(2000):
+        type_val = i % 4
+        floc = encode_floc_packet(
+            ttl=rng.randrange(16), type_val=type_val, nid=rng.randrange(0x10000),
+            pid=rng.randrange(64), dst=rng.randrange(0x10000), src=rng.randrange(4),
+            data=b'' if type_val == 2 else bytes(rng.randrange(256) for _ in range(rng.randrange(40))),
+            cmd_type_val=2, ack_pid_val=rng.randrange(256), rsp_pid_val=rng.randrange(256))
+        packets.append(encode_serial_floc_packet(floc, "BU"[i % 2], rng.randrange(0x10000)))
+
+    capture = b"".join(packets)
+    views = list(iter_serial_floc_views(capture))
+    assert len(views) == len(packets)
+
+    for view in views:
+        record = view.to_record()
+        floc_view = view.floc_packet
+        assert (view.type, view.size, view.dest_addr) == (record.type, record.size, record.dest_addr)
+        assert tuple(getattr(floc_view, f) for f in record.floc_packet._fields[:-1]) == record.floc_packet[:-1]
+        assert floc_view.data.obj is capture
+        assert bytes(floc_view.data) == record.floc_packet.data
+
+    acks_from_2 = [v for v in views if v.floc_packet.src_addr == 2 and v.floc_packet.type == FLOC_ACK_TYPE_VAL]
+    print(f"{len(views)} views checked against floc_codec; {len(acks_from_2)} ACKs from src 2")
+    views[1].to_scapy().show()
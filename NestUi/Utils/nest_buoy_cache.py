@@ -0,0 +1,221 @@
+# nest_buoy_cache.py
+# Read-through cache of Buoy records in front of nest_db, so a marker click
+# or a map refresh is answered from memory. The database stays the source of
+# truth: nest_db tells the cache about every write (add_write_listener) and
+# only the entries that write could have changed are dropped:
+#
+#   by ID          the written buoy's entry
+#   list_buoys     any write
+#   in bounds      lists that held the buoy, or whose box the new position is in
+#   near           likewise, for the circle
+#
+# Bulk writes that don't report their rows (create_many_buoys, upsert_buoys)
+# clear everything. Entries are evicted least recently used once they hold
+# more than capacity buoy records between them.
+import threading
+from collections import OrderedDict
+
+from . import nest_db
+
+_MISSING = object()
+
+
+class _Entry:
+    __slots__ = ('value', 'ids', 'matches', 'cost')
+
+    def __init__(self, value, ids=frozenset(), matches=None):
+        self.value = value
+        # Buoy IDs in a list result, and whether a buoy at a position belongs
+        # in it; None for by-ID entries.
+        self.ids = ids
+        self.matches = matches
+        self.cost = max(1, len(value)) if isinstance(value, list) else 1
+
+
+class BuoyCache:
+    def __init__(self, capacity: int = 100000, db=nest_db):
+        self.capacity = capacity
+        self.db = db
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a read that raced a write doesn't
+        # store what it read.
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # --- Reading ---
+
+    def get_buoy_by_id(self, buoy_id: int):
+        """The buoy, or None if there isn't one (which is cached too)."""
+        return self._get(("id", buoy_id), lambda: self.db.get_buoy_by_id(buoy_id))
+
+    def list_buoys(self) -> list:
+        return self._get(("all",), self.db.list_buoys, lambda lat, long: True)
+
+    def list_buoys_in_bounds(self, south: float, west: float, north: float, east: float) -> list:
+        def matches(lat, long):
+            in_long = west <= long <= east if west <= east else (long >= west or long <= east)
+            return south <= lat <= north and in_long
+        return self._get(("bounds", south, west, north, east),
+                         lambda: self.db.list_buoys_in_bounds(south, west, north, east), matches)
+
+    def list_buoys_near(self, lat: float, lon: float, radius: float) -> list:
+        def matches(buoy_lat, buoy_long):
+            return nest_db.distance_m(lat, lon, buoy_lat, buoy_long) <= radius
+        return self._get(("near", lat, lon, radius),
+                         lambda: self.db.list_buoys_near(lat, lon, radius), matches)
+
+    def _get(self, key, load, matches=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+            generation = self._generation
+
+        value = load()
+
+        with self._lock:
+            if generation == self._generation:
+                ids = frozenset(buoy.buoy_id for buoy in value) if matches else frozenset()
+                self._put(key, _Entry(value, ids, matches))
+        return value
+
+    def _put(self, key, entry):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= old.cost
+        self._entries[key] = entry
+        self._size += entry.cost
+        while self._size > self.capacity and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.cost
+            self.evictions += 1
+
+    # --- Invalidation ---
+
+    def on_write(self, buoy_id, buoy=None):
+        """nest_db write listener; see nest_db.add_write_listener."""
+        if buoy_id is None:
+            self.invalidate()
+            return
+        with self._lock:
+            self._generation += 1
+            stale = [("id", buoy_id)]
+            for key, entry in self._entries.items():
+                if entry.matches is None:
+                    continue
+                if buoy_id in entry.ids or (buoy is not None and entry.matches(buoy.lat, buoy.long)):
+                    stale.append(key)
+            for key in stale:
+                self._drop(key)
+
+    def invalidate(self, buoy_id=None):
+        """Forget buoy_id, or everything if None."""
+        if buoy_id is not None:
+            self.on_write(buoy_id)
+            return
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._size = 0
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.cost
+            self.invalidations += 1
+
+    # --- Stats ---
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "records": self._size,
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache = None
+
+
+def buoy_cache() -> BuoyCache:
+    """The session's BuoyCache, kept up to date by nest_db's writes."""
+    global _cache
+    if _cache is None:
+        _cache = BuoyCache()
+        nest_db.add_write_listener(_cache.on_write)
+    return _cache
+
+
+# --- Test Cases ---
+if __name__ == "__main__":
+    from types import SimpleNamespace
+
+    class FakeDb:
+        def __init__(self):
+            self.buoys = {}
+            self.queries = 0
+
+        def get_buoy_by_id(self, buoy_id):
+            self.queries += 1
+            return self.buoys.get(buoy_id)
+
+        def list_buoys(self):
+            self.queries += 1
+            return list(self.buoys.values())
+
+        def list_buoys_in_bounds(self, south, west, north, east):
+            self.queries += 1
+            return [b for b in self.buoys.values() if south <= b.lat <= north and west <= b.long <= east]
+
+        def write(self, buoy_id, lat, long):
+            self.buoys[buoy_id] = SimpleNamespace(buoy_id=buoy_id, lat=lat, long=long)
+            return self.buoys[buoy_id]
+
+    db = FakeDb()
+    cache = BuoyCache(capacity=10, db=db)
+    cache.on_write(1, db.write(1, 44.5, -68.5))
+    cache.on_write(2, db.write(2, 10.0, 10.0))
+
+    # Read-through, then from memory
+    assert cache.get_buoy_by_id(1).lat == 44.5 and cache.get_buoy_by_id(1).lat == 44.5
+    assert cache.get_buoy_by_id(3) is None and cache.get_buoy_by_id(3) is None
+    assert db.queries == 2
+    assert len(cache.list_buoys_in_bounds(44, -69, 45, -68)) == 1
+    assert len(cache.list_buoys_in_bounds(0, 0, 20, 20)) == 1
+    assert db.queries == 4
+
+    # A write drops only what it touched
+    cache.on_write(2, db.write(2, 11.0, 11.0))
+    assert cache.get_buoy_by_id(1) is not None and db.queries == 4
+    assert len(cache.list_buoys_in_bounds(44, -69, 45, -68)) == 1 and db.queries == 4
+    assert cache.list_buoys_in_bounds(0, 0, 20, 20)[0].lat == 11.0 and db.queries == 5
+    # Moving into a cached box drops it too
+    cache.on_write(3, db.write(3, 44.6, -68.6))
+    assert len(cache.list_buoys_in_bounds(44, -69, 45, -68)) == 2 and db.queries == 6
+    assert cache.get_buoy_by_id(3) is not None and db.queries == 7
+    cache.on_write(1, None)
+    del db.buoys[1]
+    assert cache.get_buoy_by_id(1) is None and db.queries == 8
+
+    # LRU eviction by records held
+    for buoy_id in range(100, 120):
+        cache.get_buoy_by_id(buoy_id)
+    stats = cache.stats()
+    assert stats["records"] <= 10 and stats["evictions"] > 0
+    print(stats)
@@ -0,0 +1,319 @@
+# nest_correlator.py
+# Matches ACKs and responses coming back over the modem link to the requests
+# that caused them, on an asyncio loop.
+#
+# Each outstanding FLOC request is keyed by (nid, dest, pid): the ACK for it
+# comes back from `dest` on the same network with ack_pid == pid, a response
+# with request_pid == pid. Requests are retransmitted unchanged (same pid, so
+# a late ACK still matches) with exponential backoff and jitter until a reply
+# arrives or the retries run out. Text commands to the modem itself
+# (provisioning) are matched on their expected reply line instead.
+#
+#   tracker = RequestTracker(send=None)
+#   transport, link = await open_floc_link(port, baud, lambda: FlocLinkProtocol(
+#       on_frame=tracker.on_frame, on_unframed=tracker.on_text))
+#   tracker.send = lambda frame, on_sent: (link.write(frame), on_sent(None))
+#   reply = await tracker.request(serial_packet)
+import asyncio
+import random
+import statistics
+import time
+from collections import deque
+from typing import NamedTuple
+
+from .floc_codec import decode_serial_floc_packet
+from .floc_defs import FLOC_ACK_TYPE_VAL, FLOC_RESPONSE_TYPE_VAL
+from .floc_deframer import frame_serial_floc_packet
+
+# What a request waits for
+EXPECT_ACK = "ack"
+EXPECT_RESPONSE = "response"
+
+
+class RequestTimeout(TimeoutError):
+    """No reply after all retries."""
+
+
+class Reply(NamedTuple):
+    # FlocRecord of the ACK / response, or the reply line for text commands
+    reply: object
+    # Seconds from the last transmission to the reply
+    rtt: float
+    # Transmissions it took, 1 if the first one was answered
+    attempts: int
+
+
+class PendingRequest:
+    __slots__ = ('key', 'frame', 'expect', 'future', 'attempts', 'first_sent', 'last_sent', 'acked', 'timer')
+
+    def __init__(self, key, frame, expect, future):
+        self.key = key
+        self.frame = frame
+        self.expect = expect
+        self.future = future
+        self.attempts = 0
+        self.first_sent = 0.0
+        self.last_sent = 0.0
+        # An ACK has come back for a request waiting on a response
+        self.acked = False
+        self.timer = None
+
+
+def request_key(serial_packet: bytes):
+    floc = decode_serial_floc_packet(serial_packet).floc_packet
+    return (floc.nid, floc.dest_addr, floc.pid)
+
+
+class RequestTracker:
+    """
+    send(frame, on_sent) hands '$'-framed bytes to the link (a TransmitQueue
+    submit, or FlocLinkProtocol.write) and calls on_sent(item) once they have
+    actually gone out. The RTT and the retry timer start then, not at hand-off,
+    so time spent waiting in a queue counts against neither. Attempt n waits
+    timeout * backoff**n seconds, at most max_timeout, each scaled by a random
+    factor within +-jitter.
+    """
+
+    def __init__(self,
+                 send,
+                 timeout: float = 2.0,
+                 max_retries: int = 5,
+                 backoff: float = 2.0,
+                 max_timeout: float = 30.0,
+                 jitter: float = 0.1,
+                 rng=None,
+                 clock=time.monotonic):
+        self.send = send
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_timeout = max_timeout
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+        self.clock = clock
+        self.pending = {}
+        self._text = bytearray()
+
+        # on_reply(pending, rtt) for every answered request, for instrumentation
+        self.on_reply = None
+
+        self.requests = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.retransmissions = 0
+        self.unmatched = 0
+        # Recent round trip times, for stats()
+        self.rtts = deque(maxlen=1000)
+
+    def __len__(self):
+        return len(self.pending)
+
+    # --- Sending ---
+
+    def request(self, serial_packet: bytes, expect: str = EXPECT_ACK,
+                timeout: float = -1, max_retries: int = -1) -> asyncio.Future:
+        """
+        Send a Serial FLOC packet and return a future for its Reply. Raises
+        ValueError if a request with the same (nid, dest, pid) is in flight.
+        With EXPECT_RESPONSE an ACK stops retransmission but the future waits on
+        for the response.
+        """
+        return self._start(request_key(serial_packet), frame_serial_floc_packet(serial_packet), expect,
+                           timeout, max_retries)
+
+    def request_line(self, command: bytes, expect: bytes,
+                     timeout: float = -1, max_retries: int = -1) -> asyncio.Future:
+        """Send a text command (CRLF included) and wait for the reply line `expect`."""
+        return self._start(("line", expect), command, None, timeout, max_retries)
+
+    def _start(self, key, frame, expect, timeout, max_retries):
+        if key in self.pending:
+            raise ValueError(f"Request {key} is already pending")
+        future = asyncio.get_running_loop().create_future()
+        pending = PendingRequest(key, frame, expect, future)
+        self.pending[key] = pending
+        self.requests += 1
+        future.add_done_callback(lambda _: self._finish(pending))
+        self._transmit(pending,
+                       self.timeout if timeout < 0 else timeout,
+                       self.max_retries if max_retries < 0 else max_retries)
+        return future
+
+    def _transmit(self, pending, timeout, max_retries):
+        if pending.future.done():
+            return
+        if pending.attempts > max_retries:
+            self.timeouts += 1
+            pending.future.set_exception(
+                RequestTimeout(f"No reply to {pending.key} after {pending.attempts} attempts"))
+            return
+        pending.attempts += 1
+        if pending.acked:
+            # Only waiting for the response; nothing to send
+            self._arm(pending, timeout, max_retries)
+            return
+        if pending.attempts > 1:
+            self.retransmissions += 1
+        try:
+            self.send(pending.frame, lambda item: self._sent(pending, timeout, max_retries))
+        except Exception as e:
+            pending.future.set_exception(e)
+
+    def _sent(self, pending, timeout, max_retries):
+        # The frame left the queue: start the clock on this attempt
+        if pending.future.done():
+            return
+        pending.last_sent = self.clock()
+        if pending.attempts == 1:
+            pending.first_sent = pending.last_sent
+        self._arm(pending, timeout, max_retries)
+
+    def _arm(self, pending, timeout, max_retries):
+        wait = min(self.max_timeout, timeout * self.backoff ** (pending.attempts - 1))
+        wait *= 1 + self.rng.uniform(-self.jitter, self.jitter)
+        pending.timer = asyncio.get_running_loop().call_later(wait, self._transmit, pending, timeout, max_retries)
+
+    def _finish(self, pending):
+        if pending.timer:
+            pending.timer.cancel()
+        if self.pending.get(pending.key) is pending:
+            del self.pending[pending.key]
+
+    def cancel_all(self):
+        for pending in list(self.pending.values()):
+            pending.future.cancel()
+
+    # --- Receiving ---
+
+    def on_frame(self, frame: bytes) -> bool:
+        """
+        Feed a received Serial FLOC packet. Returns True if it answered a
+        pending request.
+        """
+        try:
+            floc = decode_serial_floc_packet(frame).floc_packet
+        except ValueError:
+            return False
+        if floc.type == FLOC_ACK_TYPE_VAL:
+            pid = floc.ack_pid
+        elif floc.type == FLOC_RESPONSE_TYPE_VAL:
+            pid = floc.request_pid
+        else:
+            return False
+
+        # The reply comes from the buoy the request went to.
+        pending = self.pending.get((floc.nid, floc.src_addr, pid & 0x3F))
+        if pending is None or pending.future.done():
+            self.unmatched += 1
+            return False
+        if floc.type == FLOC_ACK_TYPE_VAL and pending.expect == EXPECT_RESPONSE:
+            pending.acked = True
+            return True
+        self._resolve(pending, floc)
+        return True
+
+    def on_text(self, data: bytes):
+        """Feed bytes received outside frames; complete CRLF lines are matched."""
+        self._text += data
+        while True:
+            end = self._text.find(b"\r\n")
+            if end < 0:
+                return
+            line = bytes(self._text[:end])
+            del self._text[:end + 2]
+            pending = self.pending.get(("line", line))
+            if pending is not None and not pending.future.done():
+                self._resolve(pending, line)
+
+    def _resolve(self, pending, reply):
+        rtt = self.clock() - pending.last_sent
+        self.completed += 1
+        self.rtts.append(rtt)
+        if self.on_reply:
+            self.on_reply(pending, rtt)
+        pending.future.set_result(Reply(reply, rtt, pending.attempts))
+
+    def stats(self) -> dict:
+        rtts = sorted(self.rtts)
+        return {
+            "pending": len(self.pending),
+            "requests": self.requests,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "retransmissions": self.retransmissions,
+            "unmatched": self.unmatched,
+            "rtt_min_s": rtts[0] if rtts else 0.0,
+            "rtt_mean_s": statistics.fmean(rtts) if rtts else 0.0,
+            "rtt_p50_s": rtts[len(rtts) // 2] if rtts else 0.0,
+            "rtt_p95_s": rtts[min(len(rtts) - 1, int(len(rtts) * 0.95))] if rtts else 0.0,
+        }
+
+
+# --- Test Cases ---
+if __name__ == "__main__":
+    from .floc_codec import encode_floc_packet, encode_serial_floc_packet
+    from .nest_fake_modem import FakeModem
+    from .nest_serial_async import open_floc_link, FlocLinkProtocol
+    from .nest_tx_queue import TransmitQueue
+
+    def command(dst, pid, nid=12):
+        floc = encode_floc_packet(3, 1, nid, pid, dst, 1, b"poll", cmd_type_val=1)
+        return encode_serial_floc_packet(floc, "U", dst)
+
+    async def main():
+        async with FakeModem(address=1, echo=False, ack_delay=0.02) as modem:
+            tracker = RequestTracker(None, timeout=0.2, jitter=0.2)
+            transport, link = await open_floc_link(
+                modem.port, 9600, lambda: FlocLinkProtocol(on_frame=tracker.on_frame, on_unframed=tracker.on_text))
+            tracker.send = lambda frame, on_sent: (link.write(frame), on_sent(None))
+
+            # 64 pids x 8 buoys outstanding at once
+            requests = [tracker.request(command(dst, pid)) for dst in range(100, 108) for pid in range(64)]
+            replies = await asyncio.gather(*requests)
+            assert all(r.attempts == 1 and r.reply.type == FLOC_ACK_TYPE_VAL for r in replies)
+            stats = tracker.stats()
+            print(f"{stats['completed']} concurrent requests ACKed, "
+                  f"RTT p50 {stats['rtt_p50_s'] * 1000:.1f} ms, p95 {stats['rtt_p95_s'] * 1000:.1f} ms")
+
+            # The first two transmissions are lost: answered on the third.
+            modem.ack = False
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.3, setattr, modem, "ack", True)
+            reply = await tracker.request(command(200, 5))
+            assert reply.attempts == 3, reply
+            print(f"Retried: answered on attempt {reply.attempts}")
+
+            # Nobody answers: gives up after max_retries.
+            modem.ack = False
+            try:
+                await tracker.request(command(201, 6), max_retries=2, timeout=0.05)
+                raise AssertionError("expected a timeout")
+            except RequestTimeout:
+                pass
+            assert tracker.retransmissions == 2 + 2 and not tracker.pending
+
+            # Behind a slow queue: frames held longer than the timeout aren't
+            # retransmitted, and the queue wait isn't counted in the RTT.
+            modem.ack = True
+            queue = TransmitQueue(frames_per_s=4)
+            drainer = asyncio.create_task(queue.drain(link.write))
+            tracker.send = lambda frame, on_sent: queue.submit(frame, coalesce=False, on_sent=on_sent)
+            retransmissions = tracker.retransmissions
+            started = time.monotonic()
+            replies = await asyncio.gather(*[tracker.request(command(dst, 7), timeout=0.15) for dst in range(300, 304)])
+            assert time.monotonic() - started > 0.6
+            assert all(r.attempts == 1 and r.rtt < 0.15 for r in replies), replies
+            assert tracker.retransmissions == retransmissions
+            drainer.cancel()
+            tracker.send = lambda frame, on_sent: (link.write(frame), on_sent(None))
+            print(f"Queued requests answered first time, RTT max {max(r.rtt for r in replies) * 1000:.1f} ms")
+
+            # Provisioning text commands match on their reply line.
+            reply = await tracker.request_line(b"!Q1234\r\n", b"?Q1")
+            assert reply.reply == b"?Q1"
+            print(f"Gave up after {tracker.timeouts} timeout; provisioning reply matched")
+
+            link.close()
+            await link.closed
+
+    asyncio.run(main())
@@ -1,34 +1,159 @@
 import asyncio
-from datetime import datetime
-from prisma import Prisma
+import atexit
+import math
+import threading
+from datetime import datetime, timezone
 
-# This decorator automatically opens a Prisma context and passes the db object to your function.
+import numpy as np
+
+# One Prisma client for the whole process, connected once and kept open on
+# its own event loop thread. The helpers below are coroutines on that loop;
+# run_sync lets any other thread (the GUI, the gateway's flusher) call them
+# and wait for the result, so a call costs a query rather than a new loop
+# and a new connection. The query engine pools its database connections
+# (size it with connection_limit in DATABASE_URL).
+_loop = None
+_thread = None
+_db = None
+_lock = threading.Lock()
+
+
+def _db_loop():
+    global _loop, _thread
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="nest-db", daemon=True)
+            _thread.start()
+    return _loop
+
+
+async def _connected_client():
+    global _db
+    if _db is None:
+        # The client is imported on first use since it's slow to load at startup.
+        from prisma import Prisma
+        _db = Prisma()
+    if not _db.is_connected():
+        await _db.connect()
+    return _db
+
+
+async def _disconnect():
+    global _db
+    if _db is not None and _db.is_connected():
+        await _db.disconnect()
+    _db = None
+
+
+def disconnect():
+    """Close the shared client; the next call reconnects."""
+    if _loop is not None:
+        asyncio.run_coroutine_threadsafe(_disconnect(), _loop).result()
+
+
+atexit.register(disconnect)
+
+
+# This decorator passes the shared, connected client to your function as db.
 def prisma_wrapper(func):
     async def wrapper(*args, **kwargs):
-        async with Prisma() as db:
-            return await func(db, *args, **kwargs)
+        return await func(await _connected_client(), *args, **kwargs)
     return wrapper
 
 
-# This decorator allows an async function to be called in a synchronous context.
+# This decorator runs an async function on the database loop and waits for
+# it, so it can be called from synchronous code on any other thread.
 def run_sync(func):
     def wrapper(*args, **kwargs):
-        return asyncio.run(func(*args, **kwargs))
+        loop = _db_loop()
+        if threading.current_thread() is _thread:
+            raise RuntimeError(f"{func.__name__}() called from the database thread; await it instead")
+        return asyncio.run_coroutine_threadsafe(func(*args, **kwargs), loop).result()
     return wrapper
 
+# Callbacks told about every Buoy write, as listener(buoy_id, buoy): buoy is
+# the record as written, None once deleted (or when the write didn't fetch
+# it), and buoy_id is None for bulk writes that don't say which rows changed.
+# They run on the database thread.
+_write_listeners = []
+
+
+def add_write_listener(listener):
+    _write_listeners.append(listener)
+
+
+def remove_write_listener(listener):
+    _write_listeners.remove(listener)
+
+
+def _notify(buoy_id, buoy=None):
+    for listener in list(_write_listeners):
+        listener(buoy_id, buoy)
+
 # Create a new Buoy record.
 # Note: Using `long_val` instead of `long` because `long` is a Python built-in.
 @run_sync
 @prisma_wrapper
-async def create_buoy(db, lat: float, long_val: float, battery: int, drop_time: datetime):
-    return await db.buoy.create(
+async def create_buoy(db, lat: float, long_val: float, battery: int, drop_time: datetime, did: int = None):
+    buoy = await db.buoy.create(
         data={
             "lat": lat,
             "long": long_val,
             "battery": battery,
             "drop_time": drop_time,
+            "did": did,
+            "cell": buoy_cell(lat, long_val),
         }
     )
+    _notify(buoy.buoy_id, buoy)
+    return buoy
+
+# Create several Buoy records in one transaction: all of them or none.
+# Each row is a dict with lat, long, battery, drop_time and optionally did.
+@run_sync
+@prisma_wrapper
+async def create_buoys(db, rows: list):
+    async with db.tx() as transaction:
+        buoys = [await transaction.buoy.create(data=_with_cell(row)) for row in rows]
+    for buoy in buoys:
+        _notify(buoy.buoy_id, buoy)
+    return buoys
+
+# Insert many Buoy records with one statement. Returns how many were created.
+# With skip_duplicates, rows clashing with an existing (source, external_id)
+# are skipped instead of failing the whole insert.
+@run_sync
+@prisma_wrapper
+async def create_many_buoys(db, rows: list, skip_duplicates: bool = False):
+    if not rows:
+        return 0
+    created = await db.buoy.create_many(data=[_with_cell(row) for row in rows], skip_duplicates=skip_duplicates)
+    _notify(None)
+    return created
+
+# Create or update imported Buoy records keyed by (source, external_id), all
+# in one transaction, so importing the same data again updates those buoys
+# instead of adding copies.
+# Each row is a dict with external_id, lat, long, battery and drop_time;
+# drop_time is only set when the buoy is first created. Returns the row count.
+@run_sync
+@prisma_wrapper
+async def upsert_buoys(db, source: str, rows: list):
+    async with db.batch_() as batcher:
+        for row in rows:
+            external_id = str(row["external_id"])
+            fields = _with_cell({k: v for k, v in row.items() if k != "external_id"})
+            update = {k: v for k, v in fields.items() if k != "drop_time"}
+            batcher.buoy.upsert(
+                where={"source_external_id": {"source": source, "external_id": external_id}},
+                data={
+                    "create": dict(fields, source=source, external_id=external_id),
+                    "update": update,
+                },
+            )
+    _notify(None)
+    return len(rows)
 
 # Retrieve a Buoy record by its buoy_id.
 @run_sync
@@ -38,25 +163,249 @@ async def get_buoy_by_id(db, buoy_id: int):
         where={"buoy_id": buoy_id}
     )
 
-# Update a Buoy record.
+# Update a Buoy record. New lat / long / battery values are also appended to
+# the buoy's readings, in the same transaction, so the history isn't lost.
 @run_sync
 @prisma_wrapper
 async def update_buoy(db, buoy_id: int, update_data: dict):
-    return await db.buoy.update(
-        where={"buoy_id": buoy_id},
-        data=update_data,
-    )
+    if "lat" in update_data or "long" in update_data:
+        if "lat" not in update_data or "long" not in update_data:
+            current = await db.buoy.find_unique(where={"buoy_id": buoy_id})
+            if current is not None:
+                update_data = dict({"lat": current.lat, "long": current.long}, **update_data)
+        update_data = _with_cell(update_data)
+    reading = {k: update_data[k] for k in READING_FIELDS if k in update_data}
+    if not reading:
+        buoy = await db.buoy.update(
+            where={"buoy_id": buoy_id},
+            data=update_data,
+        )
+    else:
+        async with db.tx() as transaction:
+            buoy = await transaction.buoy.update(
+                where={"buoy_id": buoy_id},
+                data=update_data,
+            )
+            # No buoy, no reading: Reading has no foreign key to refuse it
+            if buoy is not None:
+                await transaction.reading.create(data=dict(reading, buoy_id=buoy_id, time=_utc(datetime.now())))
+    if buoy is not None:
+        _notify(buoy_id, buoy)
+    return buoy
 
 # Delete a Buoy record.
 @run_sync
 @prisma_wrapper
 async def delete_buoy(db, buoy_id: int):
-    return await db.buoy.delete(
+    buoy = await db.buoy.delete(
         where={"buoy_id": buoy_id}
     )
+    _notify(buoy_id, None)
+    return buoy
 
 # List all Buoy records.
 @run_sync
 @prisma_wrapper
 async def list_buoys(db):
-    return await db.buoy.find_many()
\ No newline at end of file
+    return await db.buoy.find_many()
+
+
+# --- Spatial queries ---
+# Buoys carry the cell of a fixed 0.1 degree grid they're in (about 11 km of
+# latitude), indexed. A bounding box covers a few runs of consecutive cells,
+# one per grid row, so a viewport is a handful of index range scans however
+# many buoys there are elsewhere; lat / long then trim the edges exactly.
+
+CELLS_PER_DEGREE = 10
+CELL_ROWS = 180 * CELLS_PER_DEGREE
+CELL_COLUMNS = 360 * CELLS_PER_DEGREE
+# Boxes spanning more grid rows than this (most of the map at once) just
+# filter on lat / long: they return most buoys anyway.
+MAX_CELL_ROWS = 256
+EARTH_RADIUS_M = 6371008.8
+
+
+def _cell_row(lat: float) -> int:
+    return min(max(math.floor((lat + 90.0) * CELLS_PER_DEGREE), 0), CELL_ROWS - 1)
+
+
+def _cell_column(long: float) -> int:
+    return min(max(math.floor((long + 180.0) * CELLS_PER_DEGREE), 0), CELL_COLUMNS - 1)
+
+
+def buoy_cell(lat: float, long: float) -> int:
+    """The grid cell stored in Buoy.cell for a position."""
+    return _cell_row(lat) * CELL_COLUMNS + _cell_column(long)
+
+
+def _with_cell(data: dict) -> dict:
+    if "lat" in data and "long" in data:
+        return dict(data, cell=buoy_cell(data["lat"], data["long"]))
+    return data
+
+
+def bounds_filter(south: float, west: float, north: float, east: float) -> dict:
+    """
+    Prisma where clause for buoys in a box. west > east means the box crosses
+    the antimeridian.
+    """
+    spans = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+    clauses = [
+        {"lat": {"gte": south, "lte": north}},
+        {"OR": [{"long": {"gte": w, "lte": e}} for w, e in spans]},
+    ]
+    first_row, last_row = _cell_row(south), _cell_row(north)
+    if last_row - first_row < MAX_CELL_ROWS:
+        clauses.append({"OR": [
+            {"cell": {"gte": row * CELL_COLUMNS + _cell_column(w), "lte": row * CELL_COLUMNS + _cell_column(e)}}
+            for row in range(first_row, last_row + 1) for w, e in spans
+        ]})
+    return {"AND": clauses}
+
+
+def distance_m(lat1: float, long1: float, lat2: float, long2: float) -> float:
+    """Great-circle (haversine) distance in metres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(long2 - long1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+# Buoys written before the cell column existed have none; fill them in once
+# per process, before the first spatial query.
+_cells_backfilled = False
+
+async def _backfill_cells(db, batch: int = 1000):
+    global _cells_backfilled
+    while not _cells_backfilled:
+        missing = await db.buoy.find_many(where={"cell": None}, take=batch)
+        if missing:
+            async with db.batch_() as batcher:
+                for buoy in missing:
+                    batcher.buoy.update(where={"buoy_id": buoy.buoy_id},
+                                        data={"cell": buoy_cell(buoy.lat, buoy.long)})
+        _cells_backfilled = len(missing) < batch
+
+# Buoys inside a lat / long box.
+@run_sync
+@prisma_wrapper
+async def list_buoys_in_bounds(db, south: float, west: float, north: float, east: float):
+    await _backfill_cells(db)
+    return await db.buoy.find_many(where=bounds_filter(south, west, north, east))
+
+# Buoys within radius metres of (lat, lon), nearest first.
+@run_sync
+@prisma_wrapper
+async def list_buoys_near(db, lat: float, lon: float, radius: float):
+    await _backfill_cells(db)
+    dlat = math.degrees(radius / EARTH_RADIUS_M)
+    south, north = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    cos_lat = math.cos(math.radians(max(abs(south), abs(north))))
+    dlon = dlat / cos_lat if cos_lat > 1e-9 else 180.0
+    if dlon >= 180.0:
+        west, east = -180.0, 180.0
+    else:
+        west = (lon - dlon + 180.0) % 360.0 - 180.0
+        east = (lon + dlon + 180.0) % 360.0 - 180.0
+    candidates = await db.buoy.find_many(where=bounds_filter(south, west, north, east))
+    near = [(distance_m(lat, lon, buoy.lat, buoy.long), buoy) for buoy in candidates]
+    return [buoy for distance, buoy in sorted(near, key=lambda pair: pair[0]) if distance <= radius]
+
+
+# --- Telemetry readings ---
+
+# Reading columns besides buoy_id and time; None where a sample lacks one.
+READING_FIELDS = ("lat", "long", "battery")
+
+
+# Readings are stored in UTC; naive datetimes are taken as local time.
+def _utc(when: datetime) -> datetime:
+    return when.astimezone(timezone.utc)
+
+# Append one reading. Prefer add_readings for more than a few.
+def add_reading(buoy_id: int, time: datetime = None, **values):
+    return add_readings([dict(values, buoy_id=buoy_id, time=time or datetime.now())])
+
+# Append many readings with one INSERT. Each row is a dict with buoy_id, time
+# and any of lat, long, battery. Returns how many were added.
+@run_sync
+@prisma_wrapper
+async def add_readings(db, rows: list):
+    if not rows:
+        return 0
+    return await db.reading.create_many(
+        data=[dict(row, time=_utc(row["time"])) for row in rows]
+    )
+
+# One buoy's readings with start <= time < end (end defaults to now), oldest
+# first, as numpy arrays rather than records: {"time": datetime64[us] (UTC),
+# "battery": float64, ...}, with NaN where a reading lacks a value.
+# Runs as a raw query on the (buoy_id, time) index, skipping the ORM models;
+# time comes back as epoch microseconds so there are no timestamps to parse.
+@run_sync
+@prisma_wrapper
+async def get_readings(db, buoy_id: int, start: datetime, end: datetime = None,
+                       fields: tuple = READING_FIELDS):
+    unknown = set(fields) - set(READING_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown reading fields: {', '.join(sorted(unknown))}")
+    columns = ", ".join(f'"{field}"' for field in fields)
+    rows = await db.query_raw(
+        f'SELECT EXTRACT(EPOCH FROM "time")::float8 * 1000000 AS "time"{", " if fields else ""}{columns} '
+        'FROM "Reading" '
+        'WHERE "buoy_id" = $1 '
+        "AND \"time\" >= ($2::timestamptz AT TIME ZONE 'UTC') "
+        "AND \"time\" < ($3::timestamptz AT TIME ZONE 'UTC') "
+        'ORDER BY "Reading"."time"',
+        buoy_id,
+        _utc(start).isoformat(),
+        _utc(end or datetime.now()).isoformat(),
+    )
+    times = np.rint(np.array([row["time"] for row in rows], dtype=np.float64))
+    readings = {"time": times.astype(np.int64).astype("datetime64[us]")}
+    for field in fields:
+        readings[field] = np.array([row[field] for row in rows], dtype=np.float64)
+    return readings
+
+# Record buoys heard on the link, keyed by device address (Buoy.did): each
+# known buoy's updatedAt is bumped, its lat / long / battery replaced by any
+# the sample carries, and the sample appended to its readings, all in one
+# batch. heard maps did -> {"time": datetime, and any of lat, long, battery}.
+# Returns the addresses no buoy has.
+@run_sync
+@prisma_wrapper
+async def record_heard(db, heard: dict):
+    if not heard:
+        return []
+    buoys = await db.buoy.find_many(where={"did": {"in": list(heard)}})
+    by_did = {buoy.did: buoy.buoy_id for buoy in buoys}
+    if by_did:
+        async with db.batch_() as batcher:
+            readings = []
+            for did, buoy_id in by_did.items():
+                sample = heard[did]
+                when = _utc(sample["time"])
+                values = {k: sample[k] for k in READING_FIELDS if sample.get(k) is not None}
+                latest = dict(values)
+                if "lat" not in latest or "long" not in latest:
+                    latest.pop("lat", None)
+                    latest.pop("long", None)
+                batcher.buoy.update(where={"buoy_id": buoy_id}, data=dict(_with_cell(latest), updatedAt=when))
+                readings.append(dict(values, buoy_id=buoy_id, time=when))
+            batcher.reading.create_many(data=readings)
+        # Listeners get each buoy as written, as from update_buoy, so a cache
+        # can tell whether a moved one entered a cached area. A batch doesn't
+        # return rows: read them back, one query on the primary key.
+        for buoy in await db.buoy.find_many(where={"buoy_id": {"in": list(by_did.values())}}):
+            _notify(buoy.buoy_id, buoy)
+    return [did for did in heard if did not in by_did]
+
+# Drop one buoy's readings older than before (all of them if None). Returns
+# how many were deleted.
+@run_sync
+@prisma_wrapper
+async def delete_readings(db, buoy_id: int, before: datetime = None):
+    where = {"buoy_id": buoy_id}
+    if before is not None:
+        where["time"] = {"lt": _utc(before)}
+    return await db.reading.delete_many(where=where)
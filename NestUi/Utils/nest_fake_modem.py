@@ -0,0 +1,220 @@
+# nest_fake_modem.py
+# A stand-in acoustic modem on a local pseudo-terminal, so the serial stack
+# can be run, tested and benchmarked on Linux without hardware.
+#
+#   python -m NestUi.Utils.nest_fake_modem --traffic 2
+#
+# prints a /dev/pts/N path to point NuiSerialWidget (or open_floc_link) at.
+# The modem:
+#   - echoes every packet written to it back to the host,
+#   - answers each unicast data / command / response packet with an ACK from
+#     the destination buoy,
+#   - answers the provisioning commands (!Q<serial>, S<did>,<nid>) with ?Q1 / ?S1,
+#   - optionally emits data packets from a set of buoys every few seconds.
+import argparse
+import asyncio
+import os
+import random
+import tty
+
+from .floc_codec import decode_serial_floc_packet, encode_floc_packet, encode_serial_floc_packet
+from .floc_defs import FLOC_ACK_TYPE_VAL, FLOC_DATA_TYPE_VAL
+from .floc_deframer import SerialFlocDeframer, frame_serial_floc_packet
+
+# Destination address every buoy accepts; never ACKed.
+BROADCAST_ADDR = 0xFFFF
+
+
+class FakeModem:
+    """
+    Modem stand-in on the master side of a pty; the host opens `port`.
+    Use as an async context manager, or call start() / close().
+    """
+
+    def __init__(self,
+                 address: int = 0,
+                 nid: int = 0,
+                 echo: bool = True,
+                 ack: bool = True,
+                 ack_delay: float = 0.0,
+                 traffic_interval: float = 0.0,
+                 traffic_buoys=(1, 2, 3),
+                 seed=None):
+        # FLOC address of the modem itself; packets to it aren't ACKed.
+        self.address = address
+        self.nid = nid
+        self.echo = echo
+        self.ack = ack
+        self.ack_delay = ack_delay
+        self.traffic_interval = traffic_interval
+        self.traffic_buoys = tuple(traffic_buoys)
+        self.rng = random.Random(seed)
+
+        self.port = None
+        # Serial number -> "did,nid" as the provisioning commands set them;
+        # S applies to the buoy the last !Q named, as on the real modem.
+        self.provisioned = {}
+        self.provisioning = None
+        self.frames_in = 0
+        self.frames_out = 0
+        self._master = self._slave = None
+        self._deframer = SerialFlocDeframer(on_discard=self._on_text)
+        self._text = bytearray()
+        # Bytes the pty wouldn't take yet; flushed when it's writable
+        self._out = bytearray()
+        self._tasks = set()
+        self._loop = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._master, self._slave = os.openpty()
+        # Raw on both ends: no echo, no CR/LF translation.
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self.port = os.ttyname(self._slave)
+        self._loop.add_reader(self._master, self._on_readable)
+        if self.traffic_interval > 0:
+            self._spawn(self._emit_traffic())
+        return self
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._master is not None:
+            self._loop.remove_reader(self._master)
+            self._loop.remove_writer(self._master)
+            self._out.clear()
+            os.close(self._master)
+            os.close(self._slave)
+            self._master = self._slave = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # --- Host -> modem ---
+
+    def _on_readable(self):
+        try:
+            data = os.read(self._master, 4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            # EIO: nothing has the slave open
+            return
+        for frame in self._deframer.feed(data):
+            self.frames_in += 1
+            self.handle_frame(frame)
+
+    def handle_frame(self, frame: bytes):
+        """Called with each Serial FLOC packet the host sends."""
+        if self.echo:
+            self.inject(frame)
+        try:
+            record = decode_serial_floc_packet(frame).floc_packet
+        except ValueError:
+            return
+        if (self.ack and record.type != FLOC_ACK_TYPE_VAL
+                and record.dest_addr not in (self.address, BROADCAST_ADDR)):
+            ack = encode_floc_packet(record.ttl, FLOC_ACK_TYPE_VAL, record.nid, record.pid,
+                                     record.src_addr, record.dest_addr, b"", ack_pid_val=record.pid)
+            self.inject(encode_serial_floc_packet(ack, "B"), self.ack_delay)
+
+    def _on_text(self, data: bytes):
+        self._text += data
+        while b"\r\n" in self._text:
+            line, _, rest = bytes(self._text).partition(b"\r\n")
+            self._text[:] = rest
+            self.handle_line(line)
+
+    def handle_line(self, line: bytes):
+        """Called with each CRLF-terminated text command outside a frame."""
+        if line.startswith(b"!Q"):
+            self.provisioning = line[2:].decode(errors="replace")
+            self.write(b"?Q1\r\n")
+        elif line.startswith(b"S"):
+            if self.provisioning is not None:
+                self.provisioned[self.provisioning] = line[1:].decode(errors="replace")
+            self.write(b"?S1\r\n")
+
+    # --- Modem -> host ---
+
+    def write(self, data: bytes):
+        """Write raw bytes to the host; what the pty can't take yet is queued."""
+        if self._master is None:
+            return
+        if self._out:
+            # Already waiting on the pty: keep the order
+            self._out += data
+            return
+        try:
+            written = os.write(self._master, data)
+        except (BlockingIOError, InterruptedError):
+            written = 0
+        if written < len(data):
+            self._out += data[written:]
+            self._loop.add_writer(self._master, self._on_writable)
+
+    def _on_writable(self):
+        try:
+            written = os.write(self._master, self._out)
+        except (BlockingIOError, InterruptedError):
+            return
+        del self._out[:written]
+        if not self._out:
+            self._loop.remove_writer(self._master)
+
+    def inject(self, serial_packet: bytes, delay: float = 0.0):
+        """Send a Serial FLOC packet to the host, after delay seconds."""
+        self.frames_out += 1
+        frame = frame_serial_floc_packet(serial_packet)
+        if delay > 0:
+            self._loop.call_later(delay, self.write, frame)
+        else:
+            self.write(frame)
+
+    async def _emit_traffic(self):
+        pid = 0
+        while True:
+            await asyncio.sleep(self.traffic_interval)
+            src = self.rng.choice(self.traffic_buoys)
+            data = bytes(self.rng.randrange(256) for _ in range(self.rng.randrange(1, 33)))
+            floc = encode_floc_packet(1, FLOC_DATA_TYPE_VAL, self.nid, pid, self.address, src, data)
+            self.inject(encode_serial_floc_packet(floc, "B"))
+            pid = (pid + 1) % 64
+
+    def _spawn(self, coro):
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m NestUi.Utils.nest_fake_modem",
+                                     description="Run a stand-in modem on a pseudo-terminal.")
+    parser.add_argument("--address", type=int, default=0, help="the modem's own FLOC address")
+    parser.add_argument("--nid", type=int, default=0, help="network ID of emitted traffic")
+    parser.add_argument("--no-echo", action="store_true", help="don't echo sent packets")
+    parser.add_argument("--no-ack", action="store_true", help="don't ACK unicast packets")
+    parser.add_argument("--ack-delay", type=float, default=0.0, help="seconds before an ACK")
+    parser.add_argument("--traffic", type=float, default=0.0,
+                        help="emit a data packet every this many seconds (default off)")
+    args = parser.parse_args()
+
+    async def run():
+        async with FakeModem(args.address, args.nid, not args.no_echo, not args.no_ack,
+                             args.ack_delay, args.traffic) as modem:
+            print(f"Fake modem on {modem.port} (Ctrl+C to stop)")
+            await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
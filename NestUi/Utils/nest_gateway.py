@@ -0,0 +1,668 @@
+# nest_gateway.py
+# Headless gateway: owns the modem link, decodes what comes in, keeps the
+# database's last-heard times current and publishes everything to local
+# clients (the GUI, loggers, scripts). No Qt, so it can run unattended on the
+# ship's box and keep ingesting while the UI is closed or restarted.
+#
+#   python -m NestUi.Utils.nest_gateway /dev/ttyUSB0
+#   python -m NestUi.Utils.nest_gateway /dev/ttyUSB0 --tcp 7878 --no-db
+#   python -m NestUi.Utils.nest_gateway --self-test    against the stand-in modem
+#
+# Clients connect to a Unix socket (DEFAULT_SOCKET) or a localhost TCP port
+# and get one JSON object per line:
+#   {"event": "hello", "port": ..., "is_open": ..., "buoys": {address: seconds since heard}}
+#   {"event": "packet", "dir": "rx" | "tx", "frame": <hex>, "floc": {...}, ...}
+#   {"event": "text", "data": <hex>}               modem text outside frames
+#   {"event": "link", "is_open": ..., "error": ...}
+#   {"event": "buoy_heard", "address": ..., "first": ...}
+#   {"event": "buoy_silent", "address": ..., "silent_s": ...}
+# (address: the buoy's FLOC address, i.e. its DID, not the database buoy_id)
+# and may send:
+#   {"cmd": "send", "frame": <hex>, "priority": 1, "coalesce": true, "id": n}
+#       queue a '$'-framed packet; answered with {"event": "sent", "id": n}
+#   {"cmd": "stats", "id": n}   answered with {"event": "stats", "id": n, ...}
+# A client that stops reading has events dropped rather than slowing the rest.
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+from typing import NamedTuple
+
+from .floc_codec import decode_serial_floc_packet
+from .floc_defs import FLOC_DATA_TYPE_VAL
+from .nest_link_metrics import write_metrics_file
+from .nest_correlator import RequestTracker
+from .nest_serial_hub import SerialHub, serial_hub
+from .nest_tx_queue import PRIORITY_NORMAL, coalesce_key
+
+DEFAULT_SOCKET = os.environ.get("NEST_GATEWAY_SOCKET", "/tmp/nest-gateway.sock")
+# Bytes a client may fall behind by before its events are dropped
+MAX_CLIENT_BACKLOG = 1 << 20
+
+
+def packet_event(serial_packet: bytes, direction: str) -> dict:
+    """The 'packet' event for a Serial FLOC packet (without '$' / CRLF)."""
+    event = {"event": "packet", "time": time.time(), "dir": direction, "frame": serial_packet.hex()}
+    try:
+        record = decode_serial_floc_packet(serial_packet)
+    except ValueError as e:
+        event["error"] = str(e)
+        return event
+    floc = record.floc_packet._asdict()
+    floc["data"] = floc["data"].hex()
+    event.update(serial_type=chr(record.type), serial_dest=record.dest_addr, floc=floc)
+    return event
+
+
+def store_last_heard(heard: dict) -> int:
+    """
+    Default DB stage: the buoys heard since the last flush, by FLOC address
+    -> {"time": ..., and any telemetry}, written in one nest_db batch (last
+    heard time and a Reading each; see nest_db.record_heard). Returns how many
+    failed (addresses no buoy in the database was provisioned with).
+    """
+    from . import nest_db
+    return len(nest_db.record_heard(heard))
+
+
+def _socket_answers(socket_path: str) -> bool:
+    """Whether something accepts connections on a Unix socket path."""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    probe.settimeout(1.0)
+    try:
+        probe.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+class _Client:
+    __slots__ = ('writer', 'peer', 'dropped')
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.peer = writer.get_extra_info('peername') or 'unix'
+        self.dropped = 0
+
+
+class Gateway:
+    """
+    Runs the link on a SerialHub (its loop thread also serves the clients) and
+    the database writes on the calling thread, so a slow database never holds
+    up the link. Buoys are known by their FLOC address (the DID they were
+    provisioned with). Last-heard times are coalesced per buoy and written
+    every flush_interval seconds; a buoy not heard for silent_after seconds is
+    reported silent.
+
+    telemetry(address, payload) may turn a data packet's payload into a dict
+    of lat / long / battery to store with it; the FLOC spec doesn't define a
+    telemetry payload, so by default only the time heard is recorded.
+    """
+
+    def __init__(self,
+                 serial_port: str,
+                 baud_rate: int = 9600,
+                 bytes_per_s: float = 0,
+                 frames_per_s: float = 0,
+                 store=store_last_heard,
+                 flush_interval: float = 5.0,
+                 silent_after: float = 600.0,
+                 reconnect_interval: float = 5.0,
+                 metrics_file: str = None,
+                 telemetry=None,
+                 hub: SerialHub = None):
+        self.serial_port = serial_port
+        self.baud_rate = baud_rate
+        self.bytes_per_s = bytes_per_s
+        self.frames_per_s = frames_per_s
+        self.store = store
+        self.flush_interval = flush_interval
+        self.silent_after = silent_after
+        self.reconnect_interval = reconnect_interval
+        # Link metrics are written here every flush_interval, if set
+        self.metrics_file = metrics_file
+        self.telemetry = telemetry
+        self.hub = hub or SerialHub()
+
+        self.clients = set()
+        # FLOC address -> monotonic time last heard; only touched on the hub loop
+        self.fleet = {}
+        self.silent = set()
+        self._heard = {}
+        self._heard_lock = threading.Lock()
+        self._servers = []
+        self._stop = threading.Event()
+
+        self.frames_in = 0
+        self.frames_out = 0
+        self.decode_errors = 0
+        self.stored = 0
+        self.store_errors = 0
+
+        self.hub.subscribe(self._on_frame)
+        self.hub.subscribe_text(self._on_text)
+        self.hub.subscribe_state(self._on_state)
+
+    # --- Serving ---
+
+    def listen(self, socket_path: str = None, tcp_port: int = None):
+        """
+        Start accepting clients on a Unix socket and / or a localhost TCP port.
+        Raises RuntimeError if another gateway is serving on socket_path.
+        """
+        if socket_path:
+            if os.path.exists(socket_path):
+                if _socket_answers(socket_path):
+                    raise RuntimeError(f"A gateway is already serving on {socket_path}")
+                # Left behind by a gateway that didn't shut down cleanly
+                os.unlink(socket_path)
+            self._servers.append(self.hub.run(asyncio.start_unix_server(self._serve_client, socket_path)))
+        if tcp_port is not None:
+            self._servers.append(self.hub.run(asyncio.start_server(self._serve_client, "127.0.0.1", tcp_port)))
+
+    def run(self):
+        """Keep the link open and flush telemetry until stop()."""
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stop.is_set():
+            if not self.hub.is_open:
+                try:
+                    self.hub.open(self.serial_port, self.baud_rate, self.bytes_per_s, self.frames_per_s)
+                    print(f"Opened {self.serial_port}")
+                except Exception as e:
+                    print(f"Couldn't open {self.serial_port}: {e}")
+            now = time.monotonic()
+            if now >= next_flush:
+                self.flush()
+                self.hub.call(self._check_silent)
+                if self.metrics_file:
+                    write_metrics_file(self.metrics_file, self.hub.link_metrics())
+                next_flush = now + self.flush_interval
+            self._stop.wait(min(self.reconnect_interval, max(0.0, next_flush - time.monotonic())))
+        self.flush()
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        for server in self._servers:
+            server.close()
+        self._servers.clear()
+        self.hub.call(self._close_clients)
+        self.hub.close()
+
+    def _close_clients(self):
+        for client in self.clients:
+            client.writer.close()
+        self.clients.clear()
+
+    def flush(self):
+        """Write the buoys heard since the last flush to the database."""
+        with self._heard_lock:
+            heard, self._heard = self._heard, {}
+        if not heard or self.store is None:
+            return
+        try:
+            errors = self.store(heard)
+        except Exception:
+            traceback.print_exc()
+            errors = len(heard)
+        self.stored += len(heard) - errors
+        self.store_errors += errors
+
+    async def _serve_client(self, reader, writer):
+        client = _Client(writer)
+        self.clients.add(client)
+        self._write(client, {"event": "hello", "port": self.hub.port, "is_open": self.hub.is_open,
+                             "buoys": {str(b): time.monotonic() - t for b, t in self.fleet.items()}})
+        try:
+            while line := await reader.readline():
+                try:
+                    self._handle(client, json.loads(line))
+                except (ValueError, KeyError, TypeError, ConnectionError) as e:
+                    # ConnectionError: the modem port is down, not this client
+                    self._write(client, {"event": "error", "error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # This client's socket
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+
+    def _handle(self, client, message: dict):
+        cmd = message["cmd"]
+        if cmd == "send":
+            frame = bytes.fromhex(message["frame"])
+            request_id = message.get("id")
+            self.hub.submit(frame, int(message.get("priority", PRIORITY_NORMAL)), bool(message.get("coalesce", True)),
+                            on_sent=lambda item: self._on_sent(client, request_id, item))
+        elif cmd == "stats":
+            self._write(client, dict(self._stats(), event="stats", id=message.get("id")))
+        else:
+            raise ValueError(f"Unknown command {cmd!r}")
+
+    def stats(self) -> dict:
+        # Clients, fleet and queue belong to the hub loop
+        return self.hub.call(self._stats)
+
+    def _stats(self):
+        return {
+            "is_open": self.hub.is_open,
+            "clients": len(self.clients),
+            "frames_in": self.frames_in,
+            "frames_out": self.frames_out,
+            "decode_errors": self.decode_errors,
+            "stored": self.stored,
+            "store_errors": self.store_errors,
+            "buoys": len(self.fleet),
+            "silent": len(self.silent),
+            "dropped_events": sum(c.dropped for c in self.clients),
+            "tx": self.hub.tx_queue.metrics() if self.hub.tx_queue is not None else {},
+            "requests": self.hub.tracker.stats(),
+            "link": self.hub.link_metrics(),
+        }
+
+    # --- Publishing (all on the hub loop) ---
+
+    def _write(self, client, event: dict):
+        if client.writer.transport.get_write_buffer_size() > MAX_CLIENT_BACKLOG:
+            client.dropped += 1
+            return
+        client.writer.write(json.dumps(event).encode() + b"\n")
+
+    def _publish(self, event: dict):
+        if not self.clients:
+            return
+        line = json.dumps(event).encode() + b"\n"
+        for client in self.clients:
+            if client.writer.transport.get_write_buffer_size() > MAX_CLIENT_BACKLOG:
+                client.dropped += 1
+            else:
+                client.writer.write(line)
+
+    def _on_frame(self, frame: bytes):
+        self.frames_in += 1
+        event = packet_event(frame, "rx")
+        self._publish(event)
+        if "error" in event:
+            self.decode_errors += 1
+            return
+        floc = event["floc"]
+        address = floc["src_addr"]
+        first = address not in self.fleet
+        self.fleet[address] = time.monotonic()
+        sample = {"time": datetime.now()}
+        if self.telemetry is not None and floc["type"] == FLOC_DATA_TYPE_VAL:
+            try:
+                sample.update(self.telemetry(address, bytes.fromhex(floc["data"])) or {})
+            except Exception:
+                traceback.print_exc()
+        with self._heard_lock:
+            previous = self._heard.get(address)
+            if previous:
+                # Keep telemetry from earlier packets this flush that this one lacks
+                sample = dict(previous, **sample)
+            self._heard[address] = sample
+        if first or address in self.silent:
+            self.silent.discard(address)
+            self._publish({"event": "buoy_heard", "address": address, "first": first})
+
+    def _on_sent(self, client, request_id, item):
+        self.frames_out += 1
+        frame = item.frame
+        if frame[:1] == b"$":
+            self._publish(packet_event(frame[1:-2], "tx"))
+        if request_id is not None and client in self.clients:
+            self._write(client, {"event": "sent", "id": request_id})
+
+    def _on_text(self, data: bytes):
+        self._publish({"event": "text", "data": data.hex()})
+
+    def _on_state(self, is_open, error):
+        self._publish({"event": "link", "is_open": is_open, "port": self.hub.port, "error": error})
+        if not is_open:
+            print(f"Link closed{': ' + error if error else ''}")
+
+    def _check_silent(self):
+        now = time.monotonic()
+        for address, heard in self.fleet.items():
+            if address not in self.silent and now - heard > self.silent_after:
+                self.silent.add(address)
+                self._publish({"event": "buoy_silent", "address": address, "silent_s": now - heard})
+
+
+class SentItem(NamedTuple):
+    # What on_sent gets, like a TxItem
+    frame: bytes
+
+
+class GatewayClient:
+    """
+    A connection to a running gateway with the parts of SerialHub the GUI
+    and provisioning use (subscribe*, submit, tracker / run, tx_metrics,
+    is_open / port), so it can stand in for the hub. Callbacks run on the
+    client's own thread.
+    """
+
+    def __init__(self):
+        self.port = None
+        # The gateway's; kept for parity with SerialHub
+        self.baud_rate = None
+        self.is_open = False
+        # Correlates requests made through this client with the replies the
+        # gateway publishes, as hub.tracker does for the port
+        self.tracker = RequestTracker(self._send_tracked)
+        self._frame_subscribers = []
+        self._text_subscribers = []
+        self._state_subscribers = []
+        self._pending = {}
+        self._ids = 0
+        self._writer = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="gateway-client", daemon=True)
+        self._thread.start()
+
+    def connect(self, socket_path: str = DEFAULT_SOCKET, tcp_port: int = None, timeout: float = 2.0):
+        """Connect and wait for the gateway's hello. Raises OSError if nobody is listening."""
+        asyncio.run_coroutine_threadsafe(self._connect(socket_path, tcp_port), self._loop).result(timeout)
+
+    async def _connect(self, socket_path, tcp_port):
+        if tcp_port is not None:
+            reader, self._writer = await asyncio.open_connection("127.0.0.1", tcp_port)
+        else:
+            reader, self._writer = await asyncio.open_unix_connection(socket_path)
+        hello = json.loads(await reader.readline())
+        self.port, self.is_open = hello["port"], hello["is_open"]
+        self._loop.create_task(self._read(reader))
+
+    async def _read(self, reader):
+        error = ""
+        try:
+            while line := await reader.readline():
+                self._dispatch(json.loads(line))
+        except (ConnectionError, ValueError) as e:
+            error = str(e)
+        self._writer = None
+        self.is_open = False
+        self.tracker.cancel_all()
+        for future in self._pending.values():
+            if isinstance(future, asyncio.Future) and not future.done():
+                future.set_exception(ConnectionError("Gateway connection closed"))
+        self._pending.clear()
+        self._notify_state(False, error or "Gateway connection closed")
+
+    def _dispatch(self, event):
+        kind = event["event"]
+        if kind == "packet":
+            if event["dir"] == "rx":
+                frame = bytes.fromhex(event["frame"])
+                self.tracker.on_frame(frame)
+                floc_type = event["floc"]["type"] if "floc" in event else None
+                for callback, types in self._frame_subscribers:
+                    if types is None or floc_type in types:
+                        SerialHub._deliver(callback, frame)
+        elif kind == "text":
+            data = bytes.fromhex(event["data"])
+            self.tracker.on_text(data)
+            for callback in self._text_subscribers:
+                SerialHub._deliver(callback, data)
+        elif kind == "link":
+            self.port, self.is_open = event["port"], event["is_open"]
+            self._notify_state(event["is_open"], event["error"])
+        elif kind in ("sent", "stats"):
+            waiter = self._pending.pop(event.get("id"), None)
+            if isinstance(waiter, asyncio.Future):
+                if not waiter.done():
+                    waiter.set_result(event)
+            elif waiter is not None:
+                SerialHub._deliver(waiter, event)
+
+    def _notify_state(self, is_open, error):
+        for callback in self._state_subscribers:
+            SerialHub._deliver(callback, is_open, error)
+
+    # SerialHub's subscription interface
+    subscribe = SerialHub.subscribe
+    subscribe_text = SerialHub.subscribe_text
+    subscribe_state = SerialHub.subscribe_state
+    unsubscribe = SerialHub.unsubscribe
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine (e.g. a provisioning handshake) on the client loop and wait for its result."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("GatewayClient.run() called from the client thread; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def open(self, port: str, baud_rate: int, bytes_per_s: float = 0, frames_per_s: float = 0):
+        if not self.is_open:
+            raise ValueError(f"The gateway's serial port ({self.port or 'none'}) isn't open")
+
+    def close(self):
+        # The gateway owns the port; a client only disconnects.
+        if self._writer is not None:
+            self._loop.call_soon_threadsafe(self._writer.close)
+
+    def _send(self, message: dict):
+        if self._writer is None:
+            raise ConnectionError("Not connected to the gateway")
+        self._writer.write(json.dumps(message).encode() + b"\n")
+
+    def submit(self, frame: bytes, priority: int = PRIORITY_NORMAL, coalesce: bool = True, on_sent=None):
+        """
+        Queue a frame on the gateway's link. on_sent(item) runs on the client
+        thread. A malformed packet raises ValueError here, as with the hub.
+        """
+        if self._writer is None:
+            raise ConnectionError("Not connected to the gateway")
+        if coalesce:
+            coalesce_key(frame)
+        self._loop.call_soon_threadsafe(self._submit, frame, priority, coalesce, on_sent)
+
+    def _submit(self, frame, priority, coalesce, on_sent):
+        message = {"cmd": "send", "frame": frame.hex(), "priority": priority, "coalesce": coalesce}
+        if on_sent:
+            self._ids += 1
+            message["id"] = self._ids
+            self._pending[self._ids] = lambda event: on_sent(SentItem(frame))
+        self._send(message)
+
+    def _send_tracked(self, frame: bytes, on_sent):
+        # Requests and their retransmissions, from the tracker on the client
+        # loop; not coalesced, as on the hub
+        if self._writer is None:
+            raise ConnectionError("Not connected to the gateway")
+        self._submit(frame, PRIORITY_NORMAL, False, on_sent)
+
+    def stats(self, timeout: float = 2.0) -> dict:
+        async def request():
+            self._ids += 1
+            future = self._pending[self._ids] = self._loop.create_future()
+            self._send({"cmd": "stats", "id": self._ids})
+            return await future
+        return asyncio.run_coroutine_threadsafe(request(), self._loop).result(timeout)
+
+    def tx_metrics(self) -> dict:
+        return self.stats().get("tx", {}) if self._writer is not None else {}
+
+    def link_metrics(self) -> dict:
+        return self.stats().get("link", {}) if self._writer is not None else {}
+
+
+def connect_gateway(socket_path: str = DEFAULT_SOCKET, tcp_port: int = None):
+    """A GatewayClient connected to a running gateway, or None if there isn't one."""
+    if tcp_port is None and not os.path.exists(socket_path):
+        return None
+    client = GatewayClient()
+    try:
+        client.connect(socket_path, tcp_port)
+    except (OSError, asyncio.TimeoutError, ValueError):
+        client._loop.call_soon_threadsafe(client._loop.stop)
+        return None
+    return client
+
+
+_session_client = None
+
+
+def session_link():
+    """
+    The link this process should use: a client of the running gateway if
+    there is one (it owns the modem), else the in-process serial hub.
+    """
+    global _session_client
+    if _session_client is not None and not _session_client.connected:
+        _session_client._loop.call_soon_threadsafe(_session_client._loop.stop)
+        _session_client = None
+    if _session_client is None:
+        _session_client = connect_gateway()
+    return _session_client or serial_hub()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the modem link headless and publish its traffic")
+    parser.add_argument("port", help="modem serial port")
+    parser.add_argument("--baud", type=int, default=9600)
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket to serve clients on ('' for none)")
+    parser.add_argument("--tcp", type=int, default=None, help="also serve on this localhost TCP port")
+    parser.add_argument("--bytes-per-s", type=float, default=0, help="link budget, 0 for no limit")
+    parser.add_argument("--frames-per-s", type=float, default=1)
+    parser.add_argument("--flush", type=float, default=5.0, help="seconds between database writes")
+    parser.add_argument("--silent-after", type=float, default=600.0, help="seconds before a buoy is reported silent")
+    parser.add_argument("--no-db", action="store_true", help="don't write to the database")
+    parser.add_argument("--metrics-file", default=None,
+                        help="write link metrics here every flush (.prom for Prometheus text, else JSON)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve link metrics on http://127.0.0.1:<port>/metrics")
+    args = parser.parse_args()
+
+    gateway = Gateway(args.port, args.baud, args.bytes_per_s, args.frames_per_s,
+                      store=None if args.no_db else store_last_heard,
+                      flush_interval=args.flush, silent_after=args.silent_after, metrics_file=args.metrics_file)
+    try:
+        # Before opening the port: a second gateway mustn't take it (or the
+        # socket) from a running one.
+        gateway.listen(args.socket or None, args.tcp)
+    except (RuntimeError, OSError) as e:
+        gateway.close()
+        sys.exit(f"Not starting: {e}")
+    if args.metrics_port is not None:
+        gateway.hub.serve_metrics(args.metrics_port)
+    print(f"Serving on {' and '.join(filter(None, [args.socket, args.tcp and f'127.0.0.1:{args.tcp}']))}")
+    try:
+        gateway.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gateway.close()
+        print(json.dumps({k: v for k, v in gateway.stats().items() if not isinstance(v, dict)}))
+
+
+# --- Test Cases ---
+if __name__ == "__main__" and sys.argv[1:] == ["--self-test"]:
+    import tempfile
+    from .floc_codec import encode_floc_packet, encode_serial_floc_packet
+    from .floc_defs import FLOC_ACK_TYPE_VAL
+    from .floc_deframer import frame_serial_floc_packet
+    from .nest_fake_modem import FakeModem
+
+    async def run_modem(started, stop):
+        async with FakeModem(address=1, echo=False) as modem:
+            started.set_result(modem)
+            await stop
+
+    modem_loop = asyncio.new_event_loop()
+    started = modem_loop.create_future()
+    stop = modem_loop.create_future()
+    threading.Thread(target=modem_loop.run_until_complete, args=(run_modem(started, stop),), daemon=True).start()
+    while not started.done():
+        time.sleep(0.01)
+    modem = started.result()
+
+    heard = {}
+
+    def store(batch):
+        heard.update(batch)
+        return 0
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "gateway.sock")
+    gateway = Gateway(modem.port, store=store, hub=SerialHub())
+    gateway.listen(socket_path)
+
+    # A second gateway mustn't take the socket from a running one.
+    second = Gateway(modem.port, store=None, hub=SerialHub())
+    try:
+        second.listen(socket_path)
+        raise AssertionError("second gateway started")
+    except RuntimeError:
+        pass
+    finally:
+        second.close()
+    assert _socket_answers(socket_path)
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(5.0)
+    client.connect(socket_path)
+    stream = client.makefile("rwb")
+
+    def request(message):
+        stream.write(json.dumps(message).encode() + b"\n")
+        stream.flush()
+
+    def read_until(done):
+        events = []
+        while not events or not done(events[-1]):
+            events.append(json.loads(stream.readline()))
+        return events
+
+    hello = read_until(lambda e: True)[0]
+    assert hello["event"] == "hello" and not hello["is_open"], hello
+
+    dst = 100
+    floc = encode_floc_packet(1, 1, 3, 5, dst, 1, b"poll", cmd_type_val=1)
+    frame = frame_serial_floc_packet(encode_serial_floc_packet(floc, "U", dst))
+
+    # Port down: refused with an error event, and the connection stays up.
+    request({"cmd": "send", "frame": frame.hex(), "id": 1})
+    error = read_until(lambda e: True)[0]
+    assert error["event"] == "error" and "not open" in error["error"], error
+
+    gateway.hub.open(modem.port, 9600)
+    assert read_until(lambda e: e["event"] == "link")[-1]["is_open"]
+    request({"cmd": "send", "frame": frame.hex(), "id": 2})
+    events = read_until(lambda e: e["event"] == "buoy_heard")
+    kinds = [(e["event"], e.get("dir")) for e in events]
+    assert kinds == [("packet", "tx"), ("sent", None), ("packet", "rx"), ("buoy_heard", None)], kinds
+    assert events[1]["id"] == 2
+    assert events[2]["floc"]["type"] == FLOC_ACK_TYPE_VAL and events[2]["floc"]["src_addr"] == dst
+    assert events[3]["address"] == dst and events[3]["first"]
+
+    request({"cmd": "stats", "id": 3})
+    stats = read_until(lambda e: e["event"] == "stats")[-1]
+    assert stats["id"] == 3 and stats["clients"] == 1 and stats["buoys"] == 1, stats
+    assert stats["frames_out"] == 1 and stats["frames_in"] == 1 and stats["tx"]["sent"] == 1, stats
+    assert gateway.stats()["frames_out"] == 1
+
+    # The DB stage gets what was heard, keyed by FLOC address.
+    gateway.flush()
+    assert list(heard) == [dst] and "time" in heard[dst], heard
+    assert gateway.stored == 1
+
+    client.close()
+    gateway.close()
+    modem_loop.call_soon_threadsafe(stop.set_result, None)
+    print(f"Gateway served hello / send / sent / packet / stats, refused a send with the port down "
+          f"and a second gateway on {socket_path}")
+
+elif __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# nest_link_metrics.py
+# Counters and histograms for the modem link: what went over it, how long
+# requests waited in the transmit queue and for their ACKs, and how often
+# they had to be retried. SerialHub keeps one LinkMetrics and feeds it; read
+# it with hub.link_metrics(), or export it:
+#
+#   write_metrics_file("link.json", snapshot)   JSON
+#   write_metrics_file("link.prom", snapshot)   Prometheus text format
+#   metrics.serve(9464)                         http://127.0.0.1:9464/metrics
+#                                               (and /metrics.json)
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .floc_defs import FLOC_PACKET_TYPE_VALS, get_floc_packet_type
+
+# Histogram bucket upper bounds in seconds: 1 ms doubling up to ~2 min
+LATENCY_BOUNDS = tuple(0.001 * 2 ** i for i in range(18))
+
+
+class Histogram:
+    """Cumulative counts in fixed buckets, plus count / sum / min / max."""
+
+    def __init__(self, bounds=LATENCY_BOUNDS):
+        self.bounds = tuple(bounds)
+        # One more bucket for values past the last bound
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimated q-quantile: the upper bound of the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.bounds] + ["+Inf"], self.counts)),
+        }
+
+
+class LinkMetrics:
+    COUNTERS = ("bytes_in", "bytes_out", "frames_in", "frames_out", "decode_errors", "resyncs",
+                "discarded_bytes", "requests", "retransmissions", "timeouts", "unmatched_replies")
+    HISTOGRAMS = ("ack_rtt_s", "queue_wait_s")
+
+    def __init__(self):
+        self.started = time.time()
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.frames_in_by_type = dict.fromkeys(FLOC_PACKET_TYPE_VALS, 0)
+        self.frames_out_by_type = dict.fromkeys(FLOC_PACKET_TYPE_VALS, 0)
+        self.ack_rtt_s = Histogram()
+        self.queue_wait_s = Histogram()
+        self._server = None
+
+    # --- Recording ---
+
+    def frame_in(self, floc_type):
+        """A received packet; floc_type None if it didn't decode."""
+        self.frames_in += 1
+        if floc_type is None:
+            self.decode_errors += 1
+        elif floc_type in self.frames_in_by_type:
+            self.frames_in_by_type[floc_type] += 1
+
+    def frame_out(self, floc_type, queue_wait: float):
+        """A packet handed to the port after queue_wait seconds in the queue."""
+        self.frames_out += 1
+        if floc_type in self.frames_out_by_type:
+            self.frames_out_by_type[floc_type] += 1
+        self.queue_wait_s.observe(queue_wait)
+
+    # --- Reading ---
+
+    def snapshot(self) -> dict:
+        uptime = time.time() - self.started
+        snapshot = {"time": time.time(), "uptime_s": uptime}
+        snapshot.update({name: getattr(self, name) for name in self.COUNTERS})
+        snapshot["frames_in_by_type"] = {get_floc_packet_type(t): n for t, n in self.frames_in_by_type.items()}
+        snapshot["frames_out_by_type"] = {get_floc_packet_type(t): n for t, n in self.frames_out_by_type.items()}
+        snapshot["bytes_in_per_s"] = self.bytes_in / uptime if uptime else 0.0
+        snapshot["bytes_out_per_s"] = self.bytes_out / uptime if uptime else 0.0
+        snapshot.update({name: getattr(self, name).snapshot() for name in self.HISTOGRAMS})
+        return snapshot
+
+    @staticmethod
+    def prometheus(snapshot: dict) -> str:
+        """A snapshot in Prometheus text exposition format."""
+        lines = []
+        for name in LinkMetrics.COUNTERS:
+            lines += [f"# TYPE nest_link_{name} counter", f"nest_link_{name} {snapshot[name]}"]
+        for direction in ("in", "out"):
+            lines.append(f"# TYPE nest_link_frames_{direction}_by_type counter")
+            for floc_type, count in snapshot[f"frames_{direction}_by_type"].items():
+                lines.append(f'nest_link_frames_{direction}_by_type{{type="{floc_type}"}} {count}')
+        for name in LinkMetrics.HISTOGRAMS:
+            histogram = snapshot[name]
+            metric = f"nest_link_{name[:-2]}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in histogram["buckets"].items():
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines += [f"{metric}_sum {histogram['sum']}", f"{metric}_count {histogram['count']}"]
+        return "\n".join(lines) + "\n"
+
+    # --- Exporting ---
+
+    def write_file(self, path: str):
+        write_metrics_file(path, self.snapshot())
+
+    def serve(self, port: int, host: str = "127.0.0.1", snapshot=None):
+        """
+        Serve /metrics (Prometheus) and /metrics.json on a background thread.
+        snapshot() is called per request (default: self.snapshot).
+        """
+        snapshot = snapshot or self.snapshot
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = LinkMetrics.prometheus(snapshot()), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(snapshot()), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="link-metrics", daemon=True).start()
+        return self._server.server_address[1]
+
+    def stop_serving(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def write_metrics_file(path: str, snapshot: dict):
+    """
+    Write a snapshot to path, as Prometheus text for .prom / .txt files and
+    JSON otherwise. Replaced atomically, so it can be polled.
+    """
+    if path.endswith((".prom", ".txt")):
+        text = LinkMetrics.prometheus(snapshot)
+    else:
+        text = json.dumps(snapshot, indent=2)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+# --- Test Cases ---
+if __name__ == "__main__":
+    import urllib.request
+
+    histogram = Histogram()
+    for ms in range(1, 1001):
+        histogram.observe(ms / 1000)
+    # Bucket estimates: within a factor of two of the true quantile
+    assert 0.5 <= histogram.quantile(0.5) <= 1.024, histogram.quantile(0.5)
+    assert histogram.quantile(1.0) == 1.0 and histogram.min == 0.001
+
+    metrics = LinkMetrics()
+    metrics.frame_in(2)
+    metrics.frame_in(None)
+    metrics.frame_out(1, 0.25)
+    metrics.ack_rtt_s.observe(0.8)
+    snapshot = metrics.snapshot()
+    assert snapshot["decode_errors"] == 1 and snapshot["frames_in_by_type"]["FLOC_ACK_TYPE"] == 1
+    assert snapshot["queue_wait_s"]["count"] == 1
+    text = LinkMetrics.prometheus(snapshot)
+    assert 'nest_link_ack_rtt_seconds_bucket{le="+Inf"} 1' in text
+
+    port = metrics.serve(0)
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics.json") as response:
+        assert json.load(response)["frames_out"] == 1
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+        assert b"nest_link_frames_in 2" in response.read()
+    metrics.stop_serving()
+    print(text[:400])
@@ -1,7 +1,7 @@
-import requests
 import socket
 from pyqtlet2 import L
 from ..Utils.nest_db import *
+from ..Utils.nest_buoy_cache import buoy_cache
 
 ########################################
 # EarthRanger Data Functions
@@ -13,6 +13,7 @@ class EarthRangerClient:
         self.auth = (username, password)
 
     def get_events(self, limit=100):
+        import requests
         endpoint = f"{self.base_url}/events"
         params = {"limit": limit}
         response = requests.get(endpoint, auth=self.auth, params=params)
@@ -56,6 +57,7 @@ def get_buoys(lat=39.7749, lon=-120.4194, state=None, updated_since=None, page=1
         params["updated_since"] = updated_since
 
     try:
+        import requests
         response = requests.get(BASE_URL, headers=headers, params=params)
         print("Status Code:", response.status_code)
         if response.status_code != 200:
@@ -84,14 +86,23 @@ def get_buoys(lat=39.7749, lon=-120.4194, state=None, updated_since=None, page=1
         print("Error fetching data:", str(e))
         return []
 
-def get_buoys_from_db():
-    """Retrieve buoy records from the database and return as PyQtlet2 markers."""
-    buoy_records = list_buoys()
-    markers = []
-    
+def get_buoys_from_db(bounds=None):
+    """
+    Retrieve buoy records from the database and return as PyQtlet2 markers,
+    only those inside bounds (south, west, north, east) if given.
+    """
+    cache = buoy_cache()
+    buoy_records = cache.list_buoys_in_bounds(*bounds) if bounds else cache.list_buoys()
+
     if not buoy_records:
         print("No buoys found in the database.")
-        return markers
+        return []
+
+    return buoys_to_markers(buoy_records)
+
+def buoys_to_markers(buoy_records):
+    """Turn buoy records into PyQtlet2 markers colored by battery level."""
+    markers = []
 
     for buoy in buoy_records:
         lat = buoy.lat
@@ -0,0 +1,308 @@
+# nest_mesh_sim.py
+# A simulated FLOC mesh of N virtual buoys behind the stand-in modem, for
+# testing the host side at fleet scale without hardware.
+#
+#   python -m NestUi.Utils.nest_mesh_sim --buoys 500 --loss 0.05 --latency 0.3 --bit-rate 480
+#
+# prints a /dev/pts/N path to open from the GUI, a gateway or open_floc_link.
+#
+# Buoys are scattered over a square sized so each hears about `degree`
+# others, the modem in the middle. Every transmission is a broadcast on the
+# acoustic channel: each neighbour in range gets it with probability
+# 1 - loss, after its airtime at bit_rate (a node sends one packet at a time)
+# plus latency. A buoy that hears a packet for the first time:
+#   - drops it if it's for another network (nid),
+#   - handles it if it's addressed to the buoy or to everyone: data is ACKed,
+#     a command ACKed (unless broadcast) and then answered with a response,
+#   - otherwise floods it on with ttl - 1, while ttl is above 1.
+# Packets reaching the modem for its address or everyone go up to the host.
+# What the host sends is transmitted from the modem into the mesh.
+import argparse
+import asyncio
+import math
+import time
+
+from .floc_codec import decode_floc_packet, decode_serial_floc_packet, encode_floc_packet, encode_serial_floc_packet
+from .floc_defs import (FLOC_ACK_TYPE_VAL, FLOC_COMMAND_TYPE_VAL, FLOC_DATA_TYPE_VAL, FLOC_RESPONSE_TYPE_VAL,
+                        FLOC_HEADER_SIZE)
+from .nest_fake_modem import FakeModem, BROADCAST_ADDR
+
+
+def packet_key(floc_bytes: bytes):
+    """What identifies a packet as it floods: its header without the ttl."""
+    return floc_bytes[0] & 0x0F, floc_bytes[1:FLOC_HEADER_SIZE]
+
+
+def with_ttl(floc_bytes: bytes, ttl: int) -> bytes:
+    """The same FLOC packet with a new ttl."""
+    return bytes(((ttl << 4) | (floc_bytes[0] & 0x0F),)) + floc_bytes[1:]
+
+
+class MeshNode:
+    __slots__ = ('address', 'nid', 'x', 'y', 'neighbours', 'busy_until', 'pid', 'seen', 'seen_purge')
+
+    def __init__(self, address, nid, x, y):
+        self.address = address
+        self.nid = nid
+        self.x = x
+        self.y = y
+        self.neighbours = []
+        # Loop time the node's transmitter is free again
+        self.busy_until = 0.0
+        self.pid = 0
+        # Packets already handled / forwarded -> loop time they're forgotten
+        self.seen = {}
+        self.seen_purge = 0.0
+
+    def next_pid(self) -> int:
+        self.pid = (self.pid + 1) % 64
+        return self.pid
+
+    def first_time(self, key, now: float, window: float) -> bool:
+        """Remember key for window seconds; False if it was already remembered."""
+        if self.seen.get(key, 0.0) > now:
+            return False
+        self.seen[key] = now + window
+        if now >= self.seen_purge:
+            self.seen = {k: expiry for k, expiry in self.seen.items() if expiry > now}
+            self.seen_purge = now + window
+        return True
+
+
+class MeshModem(FakeModem):
+    """
+    FakeModem whose packets go through a simulated mesh instead of being
+    ACKed on the spot. Arguments beyond FakeModem's:
+
+    buoys / first_address   how many buoys, numbered up from first_address
+                            (skipping the modem's address)
+    networks                buoys are split round robin over this many nids
+                            from `nid`; only the first shares the modem's
+    degree                  mean number of buoys in range of each other
+    loss                    probability each hop's reception is lost
+    latency / jitter        seconds per hop, +- that fraction at random
+    bit_rate                channel bits/s for airtime, 0 for none
+    ttl                     ttl of packets the buoys originate
+    report_interval         each buoy sends the modem a data packet about
+                            this often (0 for never)
+    response_delay          seconds a buoy takes to answer a command
+    dedupe_window           seconds a node remembers a packet it has seen
+    """
+
+    def __init__(self,
+                 buoys: int = 100,
+                 first_address: int = 1,
+                 networks: int = 1,
+                 degree: float = 6.0,
+                 loss: float = 0.0,
+                 latency: float = 0.05,
+                 jitter: float = 0.2,
+                 bit_rate: float = 0.0,
+                 ttl: int = 4,
+                 report_interval: float = 0.0,
+                 response_delay: float = 0.0,
+                 dedupe_window: float = 30.0,
+                 address: int = 0,
+                 nid: int = 0,
+                 echo: bool = False,
+                 seed=None):
+        super().__init__(address=address, nid=nid, echo=echo, ack=False, seed=seed)
+        self.networks = networks
+        self.degree = degree
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+        self.bit_rate = bit_rate
+        self.ttl = ttl
+        self.report_interval = report_interval
+        self.response_delay = response_delay
+        self.dedupe_window = dedupe_window
+
+        self.stats = dict.fromkeys(("transmissions", "receptions", "lost", "duplicates", "other_network",
+                                    "expired", "forwarded", "handled", "to_host", "from_host"), 0)
+        self.nodes = {}
+        self.modem_node = None
+        self._build(buoys, first_address)
+
+    # --- Topology ---
+
+    def _build(self, count, first_address):
+        # Unit radio range; the square is sized for the requested mean degree.
+        side = math.sqrt(max(count, 1) * math.pi / max(self.degree, 0.1))
+        self.modem_node = MeshNode(self.address, self.nid, side / 2, side / 2)
+        self.nodes[self.address] = self.modem_node
+        address = first_address
+        for i in range(count):
+            if address == self.address:
+                address += 1
+            nid = self.nid + i % self.networks
+            self.nodes[address] = MeshNode(address, nid, self.rng.uniform(0, side), self.rng.uniform(0, side))
+            address += 1
+
+        # Bucket by unit cell so each node only checks the 9 cells around it.
+        cells = {}
+        for node in self.nodes.values():
+            cells.setdefault((int(node.x), int(node.y)), []).append(node)
+        for node in self.nodes.values():
+            cx, cy = int(node.x), int(node.y)
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for other in cells.get((cx + dx, cy + dy), ()):
+                        if other is not node and (other.x - node.x) ** 2 + (other.y - node.y) ** 2 <= 1.0:
+                            node.neighbours.append(other)
+
+    def reachable(self) -> int:
+        """Buoys with a path to the modem (ignoring networks)."""
+        seen = {self.modem_node.address}
+        frontier = [self.modem_node]
+        while frontier:
+            frontier = [n for node in frontier for n in node.neighbours
+                        if n.address not in seen and not seen.add(n.address)]
+        return len(seen) - 1
+
+    def max_hops(self) -> int:
+        """Hops from the modem to the farthest reachable buoy."""
+        seen = {self.modem_node.address}
+        frontier, hops = [self.modem_node], 0
+        while True:
+            frontier = [n for node in frontier for n in node.neighbours
+                        if n.address not in seen and not seen.add(n.address)]
+            if not frontier:
+                return hops
+            hops += 1
+
+    async def start(self):
+        await super().start()
+        if self.report_interval > 0:
+            for node in self.nodes.values():
+                if node is not self.modem_node:
+                    self._loop.call_later(self.rng.uniform(0, self.report_interval), self._report, node)
+        return self
+
+    # --- Channel ---
+
+    def transmit(self, node: MeshNode, floc: bytes):
+        """node puts floc on the channel; its neighbours may hear it."""
+        self.stats["transmissions"] += 1
+        now = self._loop.time()
+        start = max(now, node.busy_until)
+        airtime = len(floc) * 8 / self.bit_rate if self.bit_rate > 0 else 0.0
+        node.busy_until = start + airtime
+        for neighbour in node.neighbours:
+            if self.loss and self.rng.random() < self.loss:
+                self.stats["lost"] += 1
+                continue
+            delay = self.latency * (1 + self.rng.uniform(-self.jitter, self.jitter))
+            self._loop.call_at(start + airtime + delay, self.receive, neighbour, floc)
+
+    def originate(self, node: MeshNode, type_val: int, dest: int, data: bytes = b"", delay: float = 0.0, **kwargs):
+        floc = encode_floc_packet(self.ttl, type_val, node.nid, node.next_pid(), dest, node.address, data, **kwargs)
+        # A node doesn't relay its own packet when the flood comes back.
+        node.first_time(packet_key(floc), self._loop.time(), self.dedupe_window)
+        if delay > 0:
+            self._loop.call_later(delay, self.transmit, node, floc)
+        else:
+            self.transmit(node, floc)
+
+    def receive(self, node: MeshNode, floc_bytes: bytes):
+        self.stats["receptions"] += 1
+        # Most receptions are repeats of a flood or another network's; they're
+        # told apart from the header without decoding.
+        if (floc_bytes[1] << 8 | floc_bytes[2]) != node.nid:
+            self.stats["other_network"] += 1
+            return
+        if not node.first_time(packet_key(floc_bytes), self._loop.time(), self.dedupe_window):
+            self.stats["duplicates"] += 1
+            return
+        try:
+            floc = decode_floc_packet(floc_bytes)
+        except ValueError:
+            return
+
+        for_node = floc.dest_addr in (node.address, BROADCAST_ADDR)
+        if for_node:
+            self.stats["handled"] += 1
+            if node is self.modem_node:
+                self.stats["to_host"] += 1
+                self.inject(encode_serial_floc_packet(floc_bytes, "B"))
+            elif floc.src_addr != node.address:
+                self.handle_packet(node, floc)
+        if floc.dest_addr != node.address:
+            if floc.ttl > 1:
+                self.stats["forwarded"] += 1
+                self.transmit(node, with_ttl(floc_bytes, floc.ttl - 1))
+            elif not for_node:
+                self.stats["expired"] += 1
+
+    def handle_packet(self, node: MeshNode, floc):
+        """A buoy's reaction to a packet for it (or everyone)."""
+        broadcast = floc.dest_addr == BROADCAST_ADDR
+        if floc.type == FLOC_DATA_TYPE_VAL and not broadcast:
+            self.originate(node, FLOC_ACK_TYPE_VAL, floc.src_addr, ack_pid_val=floc.pid)
+        elif floc.type == FLOC_COMMAND_TYPE_VAL:
+            if not broadcast:
+                self.originate(node, FLOC_ACK_TYPE_VAL, floc.src_addr, ack_pid_val=floc.pid)
+            # Spread broadcast answers out a little, as buoys would.
+            delay = self.response_delay + (self.rng.uniform(0, self.latency) if broadcast else 0.0)
+            self.originate(node, FLOC_RESPONSE_TYPE_VAL, floc.src_addr, b"OK", delay=delay,
+                           rsp_pid_val=floc.pid)
+
+    def _report(self, node):
+        data = bytes(self.rng.randrange(256) for _ in range(8))
+        self.originate(node, FLOC_DATA_TYPE_VAL, self.address, data)
+        self._loop.call_later(self.report_interval * self.rng.uniform(0.5, 1.5), self._report, node)
+
+    # --- Host ---
+
+    def handle_frame(self, frame: bytes):
+        if self.echo:
+            self.inject(frame)
+        try:
+            record = decode_serial_floc_packet(frame)
+        except ValueError:
+            return
+        self.stats["from_host"] += 1
+        floc_bytes = bytes(frame[len(frame) - record.size:])
+        self.modem_node.first_time(packet_key(floc_bytes), self._loop.time(), self.dedupe_window)
+        self.transmit(self.modem_node, floc_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m NestUi.Utils.nest_mesh_sim",
+                                     description="Run a simulated FLOC mesh behind a stand-in modem.")
+    parser.add_argument("--buoys", type=int, default=100)
+    parser.add_argument("--networks", type=int, default=1, help="split the buoys over this many nids")
+    parser.add_argument("--degree", type=float, default=6.0, help="mean neighbours in range")
+    parser.add_argument("--loss", type=float, default=0.0, help="per-hop loss probability")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per hop")
+    parser.add_argument("--bit-rate", type=float, default=0.0, help="channel bits/s (0 for no airtime)")
+    parser.add_argument("--ttl", type=int, default=4, help="ttl of packets the buoys send")
+    parser.add_argument("--report", type=float, default=0.0,
+                        help="each buoy sends a data packet about this often, in seconds (default off)")
+    parser.add_argument("--address", type=int, default=0, help="the modem's own FLOC address")
+    parser.add_argument("--nid", type=int, default=0)
+    parser.add_argument("--echo", action="store_true", help="echo sent packets")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--stats", type=float, default=10.0, help="print stats this often, in seconds")
+    args = parser.parse_args()
+
+    async def run():
+        async with MeshModem(args.buoys, networks=args.networks, degree=args.degree, loss=args.loss,
+                             latency=args.latency, bit_rate=args.bit_rate, ttl=args.ttl,
+                             report_interval=args.report, address=args.address, nid=args.nid,
+                             echo=args.echo, seed=args.seed) as modem:
+            print(f"Mesh of {args.buoys} buoys ({modem.reachable()} reachable, up to {modem.max_hops()} hops) "
+                  f"on {modem.port} (Ctrl+C to stop)")
+            start = time.monotonic()
+            while True:
+                await asyncio.sleep(args.stats)
+                print(f"{time.monotonic() - start:7.0f} s " + " ".join(f"{k}={v}" for k, v in modem.stats.items()))
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# nest_monitor_buffer.py
+# Fixed-size ring buffer of serial monitor entries: decoded packets and text.
+# Adding is O(1) and memory stays bounded however long the port is open; views
+# ask for what's new since the last sequence number they saw.
+import time
+from typing import NamedTuple, Optional
+
+from .floc_codec import decode_serial_floc_packet
+from .floc_defs import get_floc_packet_type, get_command_type
+
+ROLE_SENT = "sent"
+ROLE_RECEIVED = "received"
+ROLE_INFO = "info"
+
+COLUMNS = ("Time", "Dir", "Serial", "TTL", "Type", "NID", "PID", "Dest", "Src", "Info", "Size", "Data")
+
+
+class MonitorEntry(NamedTuple):
+    seq: int
+    timestamp: float
+    role: str
+    # Decoded packet; None for text entries and packets that didn't decode
+    record: Optional[object]
+    # The Serial FLOC packet, or the text for text entries
+    raw: bytes
+    error: str = ""
+
+    def columns(self) -> tuple:
+        """Display values, one per COLUMNS entry."""
+        when = time.strftime("%H:%M:%S", time.localtime(self.timestamp)) + f".{int(self.timestamp * 1000) % 1000:03d}"
+        direction = {ROLE_SENT: "TX", ROLE_RECEIVED: "RX"}.get(self.role, "")
+        record = self.record
+        if record is None:
+            text = self.error or _printable(self.raw)
+            return (when, direction, "", "", "text" if not self.error else "error", "", "", "", "", "", str(len(self.raw)), text)
+
+        floc = record.floc_packet
+        serial = chr(record.type) + ("" if record.dest_addr is None else f" {record.dest_addr}")
+        if floc.command_type is not None:
+            info = f"cmd {get_command_type(floc.command_type) or floc.command_type}"
+        elif floc.ack_pid is not None:
+            info = f"ack pid {floc.ack_pid}"
+        elif floc.request_pid is not None:
+            info = f"req pid {floc.request_pid}"
+        else:
+            info = ""
+        return (when, direction, serial, str(floc.ttl), get_floc_packet_type(floc.type) or str(floc.type),
+                str(floc.nid), str(floc.pid), str(floc.dest_addr), str(floc.src_addr), info,
+                str(len(floc.data)), _printable(floc.data))
+
+    def matches(self, text: str) -> bool:
+        """Case-insensitive substring match against any column."""
+        text = text.lower()
+        return any(text in column.lower() for column in self.columns())
+
+
+def _printable(data: bytes) -> str:
+    return "".join(chr(b) if 32 <= b < 127 else f"\\x{b:02x}" for b in data)
+
+
+class MonitorBuffer:
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self._entries = [None] * capacity
+        # Sequence number the next entry gets; entries first_seq..next_seq-1 are held
+        self.next_seq = 0
+
+    @property
+    def first_seq(self) -> int:
+        return max(0, self.next_seq - self.capacity)
+
+    def __len__(self):
+        return self.next_seq - self.first_seq
+
+    def add_packet(self, serial_packet: bytes, role: str = ROLE_RECEIVED, timestamp: float = -1) -> MonitorEntry:
+        try:
+            record, error = decode_serial_floc_packet(serial_packet), ""
+        except ValueError as e:
+            record, error = None, f"{e}: {_printable(serial_packet)}"
+        return self._add(role, record, bytes(serial_packet), error, timestamp)
+
+    def add_text(self, text: str, role: str = ROLE_INFO, timestamp: float = -1) -> MonitorEntry:
+        return self._add(role, None, text.encode('latin1', 'replace'), "", timestamp)
+
+    def _add(self, role, record, raw, error, timestamp):
+        entry = MonitorEntry(self.next_seq, time.time() if timestamp < 0 else timestamp, role, record, raw, error)
+        self._entries[self.next_seq % self.capacity] = entry
+        self.next_seq += 1
+        return entry
+
+    def since(self, seq: int) -> list:
+        """Entries with sequence number >= seq that are still held, oldest first."""
+        return [self._entries[s % self.capacity] for s in range(max(seq, self.first_seq), self.next_seq)]
+
+    def clear(self):
+        self._entries = [None] * self.capacity
+        # Keep counting so views see everything they hold as dropped
+        self.next_seq += self.capacity
+
+
+# --- Test Cases ---
+if __name__ == "__main__":
+    from .floc_codec import encode_floc_packet, encode_serial_floc_packet
+
+    buffer = MonitorBuffer(capacity=1000)
+    start = time.perf_counter()
+    for i in range(100000):
+        floc = encode_floc_packet(1, i % 4, 7, i % 64, 5, 9, b"" if i % 4 == 2 else b"hello",
+                                  cmd_type_val=1, ack_pid_val=3, rsp_pid_val=4)
+        buffer.add_packet(encode_serial_floc_packet(floc, "U", 5))
+    elapsed = time.perf_counter() - start
+    assert len(buffer) == 1000 and buffer.first_seq == 99000
+    assert [e.seq for e in buffer.since(99990)] == list(range(99990, 100000))
+    assert len(buffer.since(0)) == 1000
+
+    buffer.add_text("Opened serial port: /dev/pts/3")
+    buffer.add_packet(b"Bxx")
+    rows = [e.columns() for e in buffer.since(buffer.next_seq - 3)]
+    assert rows[0][4] == "FLOC_RESPONSE_TYPE" and rows[0][9] == "req pid 4", rows[0]
+    assert rows[1][4] == "text" and rows[2][4] == "error"
+    assert sum(e.matches("ack pid") for e in buffer.since(0)) == 250
+    print(f"Added 100000 packets to a 1000 entry buffer in {elapsed * 1000:.0f} ms")
+    for row in rows:
+        print(" | ".join(row))
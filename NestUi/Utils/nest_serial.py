@@ -1,26 +1,28 @@
 import serial
 from PySide6.QtWidgets import QMessageBox
 
-def send_packet(serial_port, baud_rate, data, ser=None, parent=None):
+from .nest_serial_hub import serial_hub
+from .nest_tx_queue import PRIORITY_OPERATOR
+
+def send_packet(serial_port, baud_rate, data, parent=None, priority=PRIORITY_OPERATOR, on_sent=None, hub=None):
     """
-    Send data over a serial port.
-    
-    If 'ser' (a serial.Serial instance) is provided, it is used to write the data.
-    Otherwise, a new connection is opened and closed.
-    
+    Send data over the session's serial port (see nest_serial_hub).
+
+    The port is opened on first use and stays open; if another port is already
+    open, that's an error. data is a '$'-framed packet or a CRLF-terminated
+    text command. It is queued and written when the link budget allows;
+    on_sent(item) is called from the hub thread once it has been. hub can be a
+    GatewayClient to send through a running nest_gateway instead.
+
     The 'parent' parameter is used as the parent widget for any popup messages.
     """
+    hub = hub or serial_hub()
     try:
-        if ser is None:
-            timeout = 2
-            with serial.Serial(serial_port, baudrate=baud_rate, timeout=timeout) as ser_temp:
-                ser_temp.write(data)
-        else:
-            ser.write(data)
-        print("Packet sent over serial!")
-        QMessageBox.information(parent, "Success", "Packet sent successfully!")
+        hub.open(serial_port, baud_rate)
+        hub.submit(data, priority, coalesce=data[:1] == b"$", on_sent=on_sent)
+        print("Packet queued for serial!")
         return True
-    except serial.SerialException as e:
+    except (serial.SerialException, OSError, ValueError) as e:
         print(f"Error sending packet: {e}")
         QMessageBox.critical(parent, "Error", f"Failed to send packet:\n{e}")
         return False
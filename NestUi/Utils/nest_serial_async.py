@@ -0,0 +1,135 @@
+# nest_serial_async.py
+# asyncio transport / protocol for the modem link, so many outstanding
+# requests, timers and retries can share one event loop instead of threads.
+#
+#   transport, link = await open_floc_link("/dev/ttyUSB0", 9600)
+#   link.send(serial_floc_packet)
+#   packet = await link.recv()
+import asyncio
+
+import serial_asyncio
+
+from .floc_deframer import SerialFlocDeframer, frame_serial_floc_packet
+
+
+class FlocLinkProtocol(asyncio.Protocol):
+    """
+    Deframes what comes off the port into Serial FLOC packets (without the
+    '$' / CRLF framing).
+
+    Packets are handed to on_frame if given, otherwise queued for recv().
+    on_unframed gets any bytes outside a frame (modem text). Byte counts,
+    resyncs and discards also go to metrics (a LinkMetrics) if given.
+    """
+
+    def __init__(self, on_frame=None, on_unframed=None, metrics=None):
+        self.transport = None
+        self.on_frame = on_frame
+        self.deframer = SerialFlocDeframer(on_discard=on_unframed)
+        self.frames = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        self.connected = loop.create_future()
+        self.closed = loop.create_future()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.metrics = metrics
+
+    def connection_made(self, transport):
+        self.transport = transport
+        if not self.connected.done():
+            self.connected.set_result(None)
+
+    def data_received(self, data):
+        self.bytes_in += len(data)
+        metrics = self.metrics
+        if metrics:
+            deframer = self.deframer
+            resyncs, discarded = deframer.resyncs, deframer.discarded_bytes
+        for frame in self.deframer.feed(data):
+            if self.on_frame:
+                self.on_frame(frame)
+            else:
+                self.frames.put_nowait(frame)
+        if metrics:
+            metrics.bytes_in += len(data)
+            metrics.resyncs += deframer.resyncs - resyncs
+            metrics.discarded_bytes += deframer.discarded_bytes - discarded
+
+    def connection_lost(self, exc):
+        self.transport = None
+        if not self.closed.done():
+            if exc:
+                self.closed.set_exception(exc)
+            else:
+                self.closed.set_result(None)
+
+    def write(self, data: bytes):
+        """Write raw bytes (already framed packets, modem text commands)."""
+        if self.transport is None:
+            raise ConnectionError("Serial link is closed")
+        self.bytes_out += len(data)
+        if self.metrics:
+            self.metrics.bytes_out += len(data)
+        self.transport.write(data)
+
+    def send(self, serial_packet: bytes):
+        """Frame and write one Serial FLOC packet."""
+        self.write(frame_serial_floc_packet(serial_packet))
+
+    async def recv(self) -> bytes:
+        """Next received Serial FLOC packet (when no on_frame is set)."""
+        return await self.frames.get()
+
+    def close(self):
+        if self.transport:
+            self.transport.close()
+
+
+async def open_floc_link(serial_port: str, baud_rate: int, protocol_factory=FlocLinkProtocol):
+    """
+    Open serial_port and connect a FlocLinkProtocol (or protocol_factory()) to
+    it. Returns (transport, protocol).
+    """
+    loop = asyncio.get_running_loop()
+    transport, protocol = await serial_asyncio.create_serial_connection(loop, protocol_factory, serial_port,
+                                                                        baudrate=baud_rate)
+    # connection_made is scheduled, not called, by create_serial_connection.
+    await protocol.connected
+    return transport, protocol
+
+
+# --- Test Cases ---
+if __name__ == "__main__":
+    import time
+    from .floc_codec import encode_floc_packet, encode_serial_floc_packet, decode_serial_floc_packet
+    from .floc_defs import FLOC_ACK_TYPE_VAL
+    from .nest_fake_modem import FakeModem
+
+    async def main():
+        async with FakeModem(address=1) as modem:
+            transport, link = await open_floc_link(modem.port, 9600)
+
+            # A command to buoy 7 comes back as the echo, then buoy 7's ACK.
+            floc = encode_floc_packet(3, 1, 12, 5, 7, 1, b"poll", cmd_type_val=1)
+            link.send(encode_serial_floc_packet(floc, "U", 7))
+            echo = decode_serial_floc_packet(await asyncio.wait_for(link.recv(), 1))
+            ack = decode_serial_floc_packet(await asyncio.wait_for(link.recv(), 1)).floc_packet
+            assert echo.floc_packet.data == b"poll"
+            assert (ack.type, ack.src_addr, ack.dest_addr, ack.ack_pid) == (FLOC_ACK_TYPE_VAL, 7, 1, 5)
+
+            # Many requests in flight at once on one loop.
+            modem.echo = False
+            count = 500
+            start = time.perf_counter()
+            for pid in range(count):
+                floc = encode_floc_packet(3, 1, 12, pid % 64, 100 + pid, 1, b"x", cmd_type_val=1)
+                link.send(encode_serial_floc_packet(floc, "U", 100 + pid))
+            acks = [await asyncio.wait_for(link.recv(), 2) for _ in range(count)]
+            elapsed = time.perf_counter() - start
+            assert [decode_serial_floc_packet(a).floc_packet.src_addr for a in acks] == list(range(100, 100 + count))
+            print(f"{count} command/ACK round trips through the pty modem in {elapsed * 1000:.0f} ms")
+
+            link.close()
+            await link.closed
+
+    asyncio.run(main())
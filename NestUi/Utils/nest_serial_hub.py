@@ -0,0 +1,329 @@
+# nest_serial_hub.py
+# The one owner of the modem's serial port for the whole session.
+#
+# The hub opens the port once and runs it on its own asyncio loop thread.
+# Everything else goes through it:
+#   - subscribe() fans received Serial FLOC packets out by FLOC type,
+#     subscribe_text() gets modem text outside frames,
+#   - submit() queues outgoing frames on one paced TransmitQueue, so writes
+#     from the GUI, provisioning and pollers never interleave,
+#   - hub.tracker correlates ACKs / responses and is fed every packet,
+#   - run() executes a coroutine (e.g. a provisioning handshake) on the loop,
+#   - hub.metrics counts what crosses the link (see nest_link_metrics).
+# Callbacks run on the hub thread; GUI code re-emits them as Qt signals.
+import asyncio
+import threading
+import traceback
+
+from .floc_view import SerialFlocView
+from .nest_correlator import RequestTracker
+from .nest_link_metrics import LinkMetrics
+from .nest_serial_async import open_floc_link, FlocLinkProtocol
+from .nest_tx_queue import TransmitQueue, PRIORITY_NORMAL, coalesce_key
+
+
+class SerialHub:
+    def __init__(self):
+        self.port = None
+        self.baud_rate = None
+        self.link = None
+        self.tx_queue = None
+        self.tracker = RequestTracker(self._send_tracked)
+        self.frames_in = 0
+        # Lives as long as the hub, across port opens
+        self.metrics = LinkMetrics()
+        self.tracker.on_reply = self._on_reply
+
+        self._frame_subscribers = []
+        self._text_subscribers = []
+        self._state_subscribers = []
+        self._drainer = None
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.link is not None
+
+    # --- Loop thread ---
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="serial-hub", daemon=True)
+                self._thread.start()
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the hub loop and wait for its result."""
+        self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("SerialHub.run() called from the hub thread; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def call(self, func, *args):
+        """Call func(*args) on the hub loop (it isn't thread safe) and return the result."""
+        if threading.current_thread() is self._thread:
+            return func(*args)
+
+        async def call():
+            return func(*args)
+        return self.run(call())
+
+    # --- Port ---
+
+    def open(self, port: str, baud_rate: int, bytes_per_s: float = 0, frames_per_s: float = 0):
+        """
+        Open the port, if it isn't already. Opening a different port while one
+        is open raises ValueError; close() it first.
+        """
+        if self.is_open:
+            if port == self.port:
+                return
+            raise ValueError(f"{self.port} is already open")
+        self.run(self._open(port, baud_rate, bytes_per_s, frames_per_s))
+        self._notify_state(True, "")
+
+    async def _open(self, port, baud_rate, bytes_per_s, frames_per_s):
+        transport, link = await open_floc_link(
+            port, baud_rate,
+            lambda: FlocLinkProtocol(on_frame=self._on_frame, on_unframed=self._on_text, metrics=self.metrics))
+        self.port, self.baud_rate, self.link = port, baud_rate, link
+        self.tx_queue = TransmitQueue(bytes_per_s, frames_per_s)
+        self.tx_queue.on_pop = self._on_pop
+        self._drainer = asyncio.get_running_loop().create_task(self.tx_queue.drain(link.write))
+        link.closed.add_done_callback(self._on_closed)
+
+    def close(self):
+        if self.is_open:
+            self.run(self._close())
+
+    async def _close(self):
+        link = self.link
+        link.close()
+        try:
+            await link.closed
+        except Exception:
+            pass
+
+    def _on_closed(self, closed):
+        # Runs on the hub loop when the port closes, asked to or not.
+        error = closed.exception() if not closed.cancelled() else None
+        if self._drainer:
+            self._drainer.cancel()
+        self.tracker.cancel_all()
+        self.link = self.tx_queue = self._drainer = None
+        self.port = self.baud_rate = None
+        self._notify_state(False, str(error) if error else "")
+
+    # --- Writing ---
+
+    def submit(self, frame: bytes, priority: int = PRIORITY_NORMAL, coalesce: bool = True, on_sent=None):
+        """
+        Queue a '$'-framed packet (or a CRLF-terminated text command, with
+        coalesce=False) for the port. Thread safe. on_sent(item) runs on the
+        hub thread when it's written. A malformed packet raises ValueError
+        here, on the caller's thread.
+        """
+        if not self.is_open:
+            raise ConnectionError("Serial port is not open")
+        key = coalesce_key(frame) if coalesce else None
+        self._loop.call_soon_threadsafe(self._submit, frame, priority, coalesce, on_sent, key)
+
+    def _submit(self, frame, priority, coalesce, on_sent, key=None):
+        if self.tx_queue is not None:
+            self.tx_queue.submit(frame, priority, coalesce, on_sent, key)
+
+    def _send_tracked(self, frame: bytes, on_sent):
+        # Requests and their retransmissions, from the tracker on the hub loop.
+        # Not coalesced: the tracker already sends each one once, and a folded
+        # submit would lose its on_sent.
+        if self.tx_queue is None:
+            raise ConnectionError("Serial port is not open")
+        self.tx_queue.submit(frame, PRIORITY_NORMAL, coalesce=False, on_sent=on_sent)
+
+    def tx_metrics(self) -> dict:
+        return self.call(lambda: self.tx_queue.metrics() if self.tx_queue is not None else {})
+
+    # --- Metrics ---
+
+    def link_metrics(self) -> dict:
+        """Snapshot of hub.metrics, with the tracker's request counts."""
+        return self.call(self._link_metrics)
+
+    def _link_metrics(self):
+        tracker, metrics = self.tracker, self.metrics
+        metrics.requests = tracker.requests
+        metrics.retransmissions = tracker.retransmissions
+        metrics.timeouts = tracker.timeouts
+        metrics.unmatched_replies = tracker.unmatched
+        return metrics.snapshot()
+
+    def serve_metrics(self, port: int, host: str = "127.0.0.1") -> int:
+        """Serve link_metrics() over HTTP (see LinkMetrics.serve). Returns the port."""
+        return self.metrics.serve(port, host, self.link_metrics)
+
+    def _on_pop(self, item, waited):
+        frame = item.frame
+        floc_type = None
+        if frame[:1] == b"$":
+            try:
+                floc_type = SerialFlocView(memoryview(frame)[1:-2]).floc_packet.type
+            except (ValueError, IndexError):
+                pass
+        self.metrics.frame_out(floc_type, waited)
+
+    def _on_reply(self, pending, rtt):
+        # FLOC requests only; provisioning text commands aren't link round trips.
+        if pending.expect is not None:
+            self.metrics.ack_rtt_s.observe(rtt)
+
+    # --- Subscribers ---
+
+    def subscribe(self, callback, types=None):
+        """
+        callback(frame) for every received Serial FLOC packet, or only those
+        whose FLOC type is in types. Runs on the hub thread.
+        """
+        self._frame_subscribers.append((callback, frozenset(types) if types is not None else None))
+
+    def subscribe_text(self, callback):
+        """callback(data) for bytes received outside frames."""
+        self._text_subscribers.append(callback)
+
+    def subscribe_state(self, callback):
+        """callback(is_open, error) when the port opens or closes."""
+        self._state_subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._frame_subscribers = [s for s in self._frame_subscribers if s[0] != callback]
+        self._text_subscribers = [s for s in self._text_subscribers if s != callback]
+        self._state_subscribers = [s for s in self._state_subscribers if s != callback]
+
+    def _on_frame(self, frame: bytes):
+        self.frames_in += 1
+        self.tracker.on_frame(frame)
+        try:
+            floc_type = SerialFlocView(frame).floc_packet.type
+        except (ValueError, IndexError):
+            floc_type = None
+        self.metrics.frame_in(floc_type)
+        for callback, types in self._frame_subscribers:
+            if types is None or floc_type in types:
+                self._deliver(callback, frame)
+
+    def _on_text(self, data: bytes):
+        self.tracker.on_text(data)
+        for callback in self._text_subscribers:
+            self._deliver(callback, data)
+
+    def _notify_state(self, is_open, error):
+        for callback in self._state_subscribers:
+            self._deliver(callback, is_open, error)
+
+    @staticmethod
+    def _deliver(callback, *args):
+        # One broken subscriber mustn't stop the others or the reader.
+        try:
+            callback(*args)
+        except Exception:
+            traceback.print_exc()
+
+
+_hub = None
+
+
+def serial_hub() -> SerialHub:
+    """The session's SerialHub."""
+    global _hub
+    if _hub is None:
+        _hub = SerialHub()
+    return _hub
+
+
+# --- Test Cases ---
+if __name__ == "__main__":
+    import time
+    from .floc_codec import encode_floc_packet, encode_serial_floc_packet
+    from .floc_defs import FLOC_ACK_TYPE_VAL, FLOC_DATA_TYPE_VAL
+    from .floc_deframer import frame_serial_floc_packet
+    from .nest_fake_modem import FakeModem
+    from .nest_serialno_init import provision_buoy
+
+    class SlowIdModem(FakeModem):
+        # Drops the first S command for DID 7, so that buoy's handshake needs
+        # a retry - the window in which another buoy's !Q could get in.
+        dropped = False
+
+        def handle_line(self, line):
+            if line.startswith(b"S7,") and not self.dropped:
+                self.dropped = True
+                return
+            super().handle_line(line)
+
+    async def run_modem(started, stop):
+        async with SlowIdModem(address=1, echo=False, traffic_interval=0.02, seed=5) as modem:
+            started.set_result(modem)
+            await stop
+
+    modem_loop = asyncio.new_event_loop()
+    port = modem_loop.create_future()
+    stop = modem_loop.create_future()
+    threading.Thread(target=modem_loop.run_until_complete, args=(run_modem(port, stop),), daemon=True).start()
+    while not port.done():
+        time.sleep(0.01)
+
+    hub = serial_hub()
+    acks, data, states = [], [], []
+    hub.subscribe(acks.append, types={FLOC_ACK_TYPE_VAL})
+    hub.subscribe(data.append, types={FLOC_DATA_TYPE_VAL})
+    hub.subscribe_state(lambda is_open, error: states.append(is_open))
+    modem = port.result()
+    hub.open(modem.port, 9600)
+    hub.open(modem.port, 9600)  # already open: no-op
+
+    # Writes from several threads go out through the one queue.
+    def sender(first):
+        for dst in range(first, first + 50):
+            floc = encode_floc_packet(1, 1, 3, dst % 64, dst, 1, b"poll", cmd_type_val=1)
+            hub.submit(frame_serial_floc_packet(encode_serial_floc_packet(floc, "U", dst)))
+    threads = [threading.Thread(target=sender, args=(first,)) for first in (100, 200, 300)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # A malformed packet is refused on the caller's thread, not lost on the hub's.
+    for bad in (b"$\x00\r\n", b"$zz\r\n"):
+        try:
+            hub.submit(bad)
+            raise AssertionError(f"{bad!r} was queued")
+        except ValueError:
+            pass
+
+    # Provisioning runs on the hub loop, sharing the port.
+    assert hub.run(provision_buoy(hub.tracker, "1234", 4, 5, timeout=0.5))
+
+    # Two handshakes at once, the first retrying its S step: the second's !Q
+    # must wait, or the retried S would give buoy A's IDs to buoy B.
+    async def provision_two():
+        return await asyncio.gather(provision_buoy(hub.tracker, "A", 7, 1, timeout=0.2),
+                                    provision_buoy(hub.tracker, "B", 8, 1, timeout=0.2))
+    assert hub.run(provision_two()) == [True, True]
+    assert modem.dropped and modem.provisioned["A"] == "7,1" and modem.provisioned["B"] == "8,1", modem.provisioned
+    deadline = time.monotonic() + 5
+    while (len(acks) < 150 or not data) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(acks) == 150, len(acks)
+    assert data, "no data traffic fanned out"
+    print(f"Fanned out {len(acks)} ACKs and {len(data)} data packets; "
+          f"{hub.tx_metrics()['sent']} frames written through one queue")
+    link = hub.link_metrics()
+    # 150 polls and 7 provisioning lines (three handshakes, one retry)
+    assert link["frames_out"] == 157 and link["frames_in_by_type"]["FLOC_ACK_TYPE"] == 150, link
+    assert link["bytes_in"] > 0 and link["queue_wait_s"]["count"] == 157
+
+    hub.close()
+    assert states == [True, False] and not hub.is_open
+    modem_loop.call_soon_threadsafe(stop.set_result, None)
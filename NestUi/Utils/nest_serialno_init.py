@@ -1,34 +1,222 @@
-from ..Utils.nest_serial import send_packet
+import argparse
+import asyncio
+import csv
 import time
-import serial
-
-
-def send_with_ack(serial_port, baud_rate, data, parent=None, max_retries=5, timeout=2):
-    for attempt in range(max_retries):
-        send_packet(serial_port, baud_rate, data, parent=parent)
-        start = time.time()
-        with serial.Serial(serial_port, baudrate=baud_rate, timeout=timeout) as ser:
-            while time.time() - start < timeout:
-                if ser.in_waiting:
-                    response = ser.read(ser.in_waiting).decode('ascii')
-                    if b'?Q1\r\n' or b'?S1\r\n' in response:
-                        return True
-        # If no good response, retry
-    return False
-
-def add_buoy_serial_protocol(serial_port, baud_rate, serial_number, did, nid, parent=None):
-    # 1. Send serial number
-    serial_cmd = f"!Q{serial_number}\r\n".encode('ascii')
-    if not send_with_ack(serial_port, baud_rate, serial_cmd, parent):
-        print("Failed to send serial number after retries.")
-        return False
+import weakref
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from .nest_correlator import RequestTracker, RequestTimeout
+from .nest_serial_hub import serial_hub
+
+
+async def provision_buoy(tracker: RequestTracker, serial_number, did, nid, timeout=2, max_retries=5, lock=None):
+    """
+    Run the provisioning handshake through tracker, which must be fed the
+    link's unframed text (on_text). Returns True once the modem has confirmed
+    both steps.
+
+    S<did>,<nid> applies to whichever buoy the last !Q named, and neither
+    reply says which buoy it's for, so the whole handshake holds lock (by
+    default one per tracker): another buoy's !Q can't slip in between.
+    """
+    if lock is None:
+        lock = handshake_lock(tracker)
+    async with lock:
+        # 1. Send serial number
+        try:
+            await tracker.request_line(f"!Q{serial_number}\r\n".encode('ascii'), b"?Q1", timeout, max_retries)
+        except RequestTimeout:
+            print("Failed to send serial number after retries.")
+            return False
+
+        # 2. Send device ID and network ID
+        try:
+            await tracker.request_line(f"S{did},{nid}\r\n".encode('ascii'), b"?S1", timeout, max_retries)
+        except RequestTimeout:
+            print("Failed to send device/network ID after retries.")
+            return False
+
+    return True
+
+
+_handshake_locks = weakref.WeakKeyDictionary()
 
-    # 2. Send device ID and network ID
-    did_cmd = f"S{did},{nid}\r\n".encode('ascii')
-    if not send_with_ack(serial_port, baud_rate, did_cmd, parent):
-        print("Failed to send device/network ID after retries.")
+
+def handshake_lock(tracker: RequestTracker) -> asyncio.Lock:
+    """The lock provisioning handshakes over tracker's link take turns on."""
+    lock = _handshake_locks.get(tracker)
+    if lock is None:
+        lock = _handshake_locks[tracker] = asyncio.Lock()
+    return lock
+
+
+def add_buoy_serial_protocol(serial_port, baud_rate, serial_number, did, nid, parent=None, max_retries=5, timeout=2,
+                             hub=None):
+    # Runs on the session's link (hub: the serial hub, opening the port if
+    # nothing has yet, or a gateway client).
+    hub = hub or serial_hub()
+    hub.open(serial_port, baud_rate)
+    if not hub.run(provision_buoy(hub.tracker, serial_number, did, nid, timeout, max_retries)):
         return False
 
     # 3. Only now add to DB
     print("Buoy can be added to DB!")
     return True
+
+
+# --- Bulk provisioning ---
+
+def device_address(did):
+    """A DID as stored in Buoy.did (the buoy's FLOC address), or None if it isn't a number."""
+    try:
+        return int(did)
+    except (TypeError, ValueError):
+        return None
+
+
+class ManifestEntry(NamedTuple):
+    serial_number: str
+    did: str
+    nid: str
+    # Where and how charged it goes in the database; None for the batch default
+    lat: Optional[float] = None
+    long: Optional[float] = None
+    battery: Optional[int] = None
+
+
+class ProvisionResult(NamedTuple):
+    entry: ManifestEntry
+    ok: bool
+    # Seconds from the first command to the last reply
+    elapsed: float
+    error: str = ""
+
+
+class ProvisionReport:
+    def __init__(self, total: int):
+        self.total = total
+        self.results = []
+        self.stored = 0
+        self.store_error = ""
+        self.elapsed_s = 0.0
+
+    @property
+    def succeeded(self) -> list:
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> list:
+        return [r for r in self.results if not r.ok]
+
+    def summary(self) -> str:
+        lines = [f"Provisioned {len(self.succeeded)} of {self.total} buoys in {self.elapsed_s:.1f} s, "
+                 f"{self.stored} added to the database"]
+        if self.store_error:
+            lines.append(f"Database write failed: {self.store_error}")
+        for result in self.failed:
+            lines.append(f"  {result.entry.serial_number}: {result.error}")
+        return "\n".join(lines)
+
+
+def read_manifest(path: str) -> list:
+    """
+    Read a CSV manifest with a header row: serial, did, nid and optionally
+    lat, long, battery columns.
+    """
+    entries = []
+    with open(path, newline="") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            try:
+                entries.append(ManifestEntry(
+                    row["serial"], row["did"], row["nid"],
+                    float(row["lat"]) if row.get("lat") else None,
+                    float(row["long"]) if row.get("long") else None,
+                    int(row["battery"]) if row.get("battery") else None))
+            except (KeyError, ValueError) as e:
+                raise ValueError(f"{path}:{line}: bad manifest row ({e})") from None
+    return entries
+
+
+async def provision_many(tracker: RequestTracker, entries, timeout=2, max_retries=5, on_progress=None) -> list:
+    """
+    Provision entries through tracker one handshake at a time (see
+    provision_buoy), so a buoy that needs retries only costs its own time.
+    on_progress(result, done, total) is called as each finishes. Returns the
+    ProvisionResults in manifest order.
+    """
+    results = []
+    for entry in entries:
+        start = time.monotonic()
+        try:
+            ok = await provision_buoy(tracker, entry.serial_number, entry.did, entry.nid, timeout, max_retries)
+            error = "" if ok else "no reply from the modem"
+        except (ValueError, ConnectionError, UnicodeEncodeError) as e:
+            ok, error = False, str(e)
+        results.append(ProvisionResult(entry, ok, time.monotonic() - start, error))
+        if on_progress:
+            on_progress(results[-1], len(results), len(entries))
+    return results
+
+
+def provision_manifest(serial_port, baud_rate, entries, lat=0.0, long=0.0, battery=100,
+                       timeout=2, max_retries=5, store=True, on_progress=None, hub=None) -> ProvisionReport:
+    """
+    Provision every manifest entry over the session's link (hub, default the
+    in-process serial hub), then add the buoys that succeeded to the database
+    in one transaction, so an import is stored whole or not at all. lat, long
+    and battery fill in what the manifest leaves out. on_progress runs on the
+    hub thread.
+    """
+    hub = hub or serial_hub()
+    hub.open(serial_port, baud_rate)
+    report = ProvisionReport(len(entries))
+    start = time.monotonic()
+    report.results = hub.run(provision_many(hub.tracker, entries, timeout, max_retries, on_progress))
+
+    if store and report.succeeded:
+        from . import nest_db
+        now = datetime.now()
+        try:
+            report.stored = len(nest_db.create_buoys([{
+                "did": device_address(result.entry.did),
+                "lat": lat if result.entry.lat is None else result.entry.lat,
+                "long": long if result.entry.long is None else result.entry.long,
+                "battery": battery if result.entry.battery is None else result.entry.battery,
+                "drop_time": now,
+            } for result in report.succeeded]))
+        except Exception as e:
+            report.store_error = str(e)
+    report.elapsed_s = time.monotonic() - start
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m NestUi.Utils.nest_serialno_init",
+                                     description="Provision the BuRDs in a manifest and add them to the database.")
+    parser.add_argument("manifest", help="CSV with serial, did, nid (and optionally lat, long, battery) columns")
+    parser.add_argument("--port", required=True, help="modem serial port")
+    parser.add_argument("--baud", type=int, default=9600)
+    parser.add_argument("--lat", type=float, default=0.0, help="latitude for rows without one")
+    parser.add_argument("--long", type=float, default=0.0, help="longitude for rows without one")
+    parser.add_argument("--battery", type=int, default=100, help="battery %% for rows without one")
+    parser.add_argument("--timeout", type=float, default=2.0)
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--no-db", action="store_true", help="provision only")
+    args = parser.parse_args()
+
+    entries = read_manifest(args.manifest)
+
+    def progress(result, done, total):
+        print(f"[{done}/{total}] {result.entry.serial_number}: "
+              f"{'ok' if result.ok else result.error} ({result.elapsed:.2f} s)")
+
+    report = provision_manifest(args.port, args.baud, entries, args.lat, args.long, args.battery,
+                                args.timeout, args.retries, store=not args.no_db, on_progress=progress)
+    serial_hub().close()
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
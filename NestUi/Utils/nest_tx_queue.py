@@ -0,0 +1,300 @@
+# nest_tx_queue.py
+# Paced, prioritized transmit queue for the acoustic modem link.
+#
+# Outgoing '$'-framed Serial FLOC packets wait here and are released no faster
+# than the link budget (bytes/s and frames/s, token buckets). Operator commands
+# go ahead of background polls, and a command queued again for the same
+# destination before the first copy went out replaces it instead of being
+# sent twice.
+#
+# TransmitQueue does no I/O itself: pop_ready() says what to send now or how
+# long to wait. drain() runs it on an asyncio loop; the serial widget drives it
+# from a QTimer.
+import asyncio
+import heapq
+import itertools
+import time
+
+from .floc_view import SerialFlocView
+
+PRIORITY_OPERATOR = 0
+PRIORITY_NORMAL = 1
+PRIORITY_POLL = 2
+PRIORITY_NAMES = {
+    PRIORITY_OPERATOR: "operator",
+    PRIORITY_NORMAL: "normal",
+    PRIORITY_POLL: "poll",
+}
+
+
+class TxItem:
+    __slots__ = ('frame', 'priority', 'dest_addr', 'key', 'enqueued', 'seq', 'cancelled', 'coalesced', 'on_sent')
+
+    def __init__(self, frame, priority, dest_addr, key, enqueued, seq, on_sent):
+        self.frame = frame
+        self.priority = priority
+        self.dest_addr = dest_addr
+        self.key = key
+        self.enqueued = enqueued
+        self.seq = seq
+        self.cancelled = False
+        # How many later submits were folded into this one
+        self.coalesced = 0
+        self.on_sent = on_sent
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+def coalesce_key(frame: bytes):
+    """
+    What makes two framed packets duplicates: same destination, FLOC type,
+    command type and data. pid and ttl are ignored. Raises ValueError if frame
+    isn't a '$'-framed Serial FLOC packet.
+    """
+    if frame[:1] != b"$" or frame[-2:] != b"\r\n":
+        raise ValueError("Not a '$'-framed packet")
+    try:
+        floc = SerialFlocView(memoryview(frame)[1:-2]).floc_packet
+        return (floc.dest_addr, floc.type, floc.command_type, bytes(floc.data))
+    except IndexError:
+        raise ValueError(f"Truncated Serial FLOC packet ({len(frame) - 3} bytes)") from None
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def wait_for(self, amount: float, now: float) -> float:
+        """Seconds until amount tokens are available (0 if they are now)."""
+        if self.rate <= 0:
+            return 0.0
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # A frame bigger than the burst only has to wait for a full bucket.
+        amount = min(amount, self.burst)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        if self.rate > 0:
+            self.tokens -= min(amount, self.burst)
+
+
+class TransmitQueue:
+    """
+    bytes_per_s / frames_per_s of 0 leave that limit off. burst_bytes and
+    burst_frames are how much can go out back to back after the link has been
+    idle (default: one frame).
+    """
+
+    def __init__(self,
+                 bytes_per_s: float = 0,
+                 frames_per_s: float = 0,
+                 burst_bytes: float = 0,
+                 burst_frames: float = 1,
+                 clock=time.monotonic):
+        self.clock = clock
+        now = clock()
+        # Default burst: one largest framed packet ('$' + 4 + 64 + CRLF)
+        self._bytes = _TokenBucket(bytes_per_s, burst_bytes or 71, now)
+        self._frames = _TokenBucket(frames_per_s, burst_frames, now)
+        self._heap = []
+        self._pending = {}
+        self._seq = itertools.count()
+        # Called after every submit, so a driver can wake up
+        self.on_submit = None
+        # on_pop(item, waited) for every frame released, for instrumentation
+        self.on_pop = None
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.bytes_sent = 0
+        self.wait_total = dict.fromkeys(PRIORITY_NAMES, 0.0)
+        self.wait_max = dict.fromkeys(PRIORITY_NAMES, 0.0)
+        self.sent_by_priority = dict.fromkeys(PRIORITY_NAMES, 0)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, frame: bytes, priority: int = PRIORITY_NORMAL, coalesce: bool = True, on_sent=None,
+               key=None) -> TxItem:
+        """
+        Queue a framed packet. With coalesce, a pending duplicate (see
+        coalesce_key) is replaced by this frame, keeping its place in line or
+        moving up to this priority, and that item is returned.
+        on_sent(item) is called when the frame is handed to the writer.
+        key is coalesce_key(frame) if the caller already has it.
+        """
+        if coalesce and key is None:
+            key = coalesce_key(frame)
+        elif not coalesce:
+            key = None
+        self.submitted += 1
+        item = self._pending.get(key) if key is not None else None
+        if item is not None:
+            self.coalesced += 1
+            item.coalesced += 1
+            item.frame = frame
+            if on_sent:
+                item.on_sent = on_sent
+            if priority < item.priority:
+                # Move it up: the old heap entry is skipped when popped.
+                item.cancelled = True
+                item = TxItem(frame, priority, item.dest_addr, key, item.enqueued, next(self._seq), item.on_sent)
+                item.coalesced = self._pending[key].coalesced
+                self._pending[key] = item
+                heapq.heappush(self._heap, item)
+        else:
+            seq = next(self._seq)
+            if key is None:
+                dest_addr, key = -1, ('seq', seq)
+            else:
+                dest_addr = key[0]
+            item = TxItem(frame, priority, dest_addr, key, self.clock(), seq, on_sent)
+            self._pending[key] = item
+            heapq.heappush(self._heap, item)
+        if self.on_submit:
+            self.on_submit()
+        return item
+
+    def _peek(self):
+        while self._heap and self._heap[0].cancelled:
+            heapq.heappop(self._heap)
+        return self._heap[0] if self._heap else None
+
+    def pop_ready(self):
+        """
+        (item, 0.0) if a frame may go out now - it is removed and the link
+        budget charged - else (None, seconds to wait), or (None, None) when
+        the queue is empty.
+        """
+        item = self._peek()
+        if item is None:
+            return None, None
+        now = self.clock()
+        wait = max(self._bytes.wait_for(len(item.frame), now), self._frames.wait_for(1, now))
+        if wait > 0:
+            return None, wait
+
+        heapq.heappop(self._heap)
+        del self._pending[item.key]
+        self._bytes.take(len(item.frame))
+        self._frames.take(1)
+
+        waited = now - item.enqueued
+        self.sent += 1
+        self.bytes_sent += len(item.frame)
+        self.sent_by_priority[item.priority] += 1
+        self.wait_total[item.priority] += waited
+        self.wait_max[item.priority] = max(self.wait_max[item.priority], waited)
+        if self.on_pop:
+            self.on_pop(item, waited)
+        if item.on_sent:
+            item.on_sent(item)
+        return item, 0.0
+
+    def cancel(self, dest_addr: int) -> int:
+        """Drop everything pending for dest_addr. Returns how many were dropped."""
+        dropped = [key for key, item in self._pending.items() if item.dest_addr == dest_addr]
+        for key in dropped:
+            self._pending.pop(key).cancelled = True
+        return len(dropped)
+
+    def metrics(self) -> dict:
+        depth = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+        now = self.clock()
+        oldest = 0.0
+        for item in self._pending.values():
+            depth[PRIORITY_NAMES[item.priority]] += 1
+            oldest = max(oldest, now - item.enqueued)
+        return {
+            "depth": len(self._pending),
+            "depth_by_priority": depth,
+            "oldest_wait_s": oldest,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "sent": self.sent,
+            "bytes_sent": self.bytes_sent,
+            "mean_wait_s": {
+                PRIORITY_NAMES[p]: self.wait_total[p] / self.sent_by_priority[p] if self.sent_by_priority[p] else 0.0
+                for p in PRIORITY_NAMES
+            },
+            "max_wait_s": {PRIORITY_NAMES[p]: self.wait_max[p] for p in PRIORITY_NAMES},
+        }
+
+    async def drain(self, write):
+        """
+        Hand frames to write(frame) as the link budget allows, until
+        cancelled. Wakes up early when something is submitted.
+        """
+        wake = asyncio.Event()
+        self.on_submit = wake.set
+        try:
+            while True:
+                item, wait = self.pop_ready()
+                if item is not None:
+                    write(item.frame)
+                    continue
+                wake.clear()
+                try:
+                    await asyncio.wait_for(wake.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.on_submit = None
+
+
+# --- Test Cases ---
+if __name__ == "__main__":
+    from .floc_template import FrameTemplate
+
+    now = [0.0]
+    queue = TransmitQueue(bytes_per_s=100, frames_per_s=2, clock=lambda: now[0])
+    poll = FrameTemplate(type_val=1, nid=1, src=1, data=b"poll", cmd_type_val=1, serial_type_val="U")
+    command = FrameTemplate(type_val=1, nid=1, src=1, data=b"release", cmd_type_val=2, serial_type_val="U")
+
+    for dst in range(10, 15):
+        queue.submit(poll.stamp(dst, dst), PRIORITY_POLL)
+    # Same poll to 12 again: replaces the pending one (new pid), no new entry.
+    queue.submit(poll.stamp(12, 40), PRIORITY_POLL)
+    # Operator command jumps the polls.
+    queue.submit(command.stamp(13, 41), PRIORITY_OPERATOR)
+    assert len(queue) == 6 and queue.coalesced == 1
+
+    sent = []
+    while len(queue):
+        item, wait = queue.pop_ready()
+        if item is None:
+            now[0] += wait
+            continue
+        sent.append((now[0], SerialFlocView(item.frame[1:-2]).floc_packet.pid))
+    pids = [pid for _, pid in sent]
+    assert pids == [41, 10, 11, 40, 13, 14], pids
+    # Frames go out no faster than 2/s, and within the byte budget.
+    gaps = [b[0] - a[0] for a, b in zip(sent, sent[1:])]
+    assert all(gap >= 0.5 - 1e-9 for gap in gaps), gaps
+    assert queue.bytes_sent / sent[-1][0] <= 100 * 1.1
+    metrics = queue.metrics()
+    print(f"Sent {metrics['sent']} frames in {sent[-1][0]:.2f} s of link time; "
+          f"mean poll wait {metrics['mean_wait_s']['poll']:.2f} s, "
+          f"operator {metrics['mean_wait_s']['operator']:.2f} s")
+
+    async def paced():
+        queue = TransmitQueue(frames_per_s=50)
+        out = []
+        drainer = asyncio.create_task(queue.drain(out.append))
+        start = time.monotonic()
+        for dst in range(20):
+            queue.submit(poll.stamp(dst, dst), PRIORITY_POLL)
+        while len(out) < 20:
+            await asyncio.sleep(0.01)
+        drainer.cancel()
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(paced())
+    assert 0.35 <= elapsed < 0.6, elapsed
+    print(f"drain() paced 20 frames at 50 frames/s in {elapsed:.2f} s")
@@ -1,9 +1,7 @@
 # packet_builder.py (VARIABLE LENGTH DATA)
+from scapy.packet import Raw
 from ..Utils.floc_pkts import *  # Import the generated file
-
-MAX_DATA_SIZE = 55
-MAX_COMMAND_SIZE = 51
-MAX_RESPONSE_SIZE = 54
+from ..Utils.floc_defs import MAX_DATA_SIZE, MAX_COMMAND_SIZE, MAX_RESPONSE_SIZE
 
 
 def build_floc_packet(ttl: int,
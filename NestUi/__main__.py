@@ -1,16 +1,19 @@
 import sys
 from PySide6.QtGui import QFont, QIcon
 from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QCoreApplication, Qt
 from dotenv import load_dotenv
 
 from .Gui import NestMainWindow
-from .Utils.nest_db import *
 
 # Run the application
 if __name__ == "__main__":
     # load environment variables from .env file
     load_dotenv()
 
+    # QtWebEngine is imported after the window is up (see NestMainWidget.load_map),
+    # which it only allows if contexts are shared from the start.
+    QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
     app.setApplicationName("BuRD Control Program")
     app.setWindowIcon(QIcon("NestUi/Gui/GuiImages/EchoNetLogo.png"))
@@ -0,0 +1,105 @@
+# Benchmark suite for the codec and the NestUi pipeline.
+#
+#   python -m benchmarks                     run everything, write results JSON
+#   python -m benchmarks --quick             shorter runs, for a smoke test
+#   python -m benchmarks --only deframe      run only groups matching a name
+#   python -m benchmarks --compare old.json  flag regressions against an old run
+#
+# Runs headless; groups whose dependencies (Scapy, NumPy, PySide6, pyqtlet2,
+# Postgres) are missing are recorded as skipped.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from . import codec, db, startup
+from .common import Skipped
+
+GROUPS = {
+    "codec": codec.run,
+    "deframe": codec.run_deframe,
+    "markers": codec.run_markers,
+    "db": db.run,
+    "startup": startup.run,
+}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: list, old_path: str, threshold: float) -> int:
+    with open(old_path) as f:
+        old = {r["name"]: r for r in json.load(f)["results"]}
+
+    regressions = 0
+    for result in results:
+        before = old.get(result["name"])
+        if not before:
+            continue
+        change = result["ns_per_op"] / before["ns_per_op"] - 1.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{result['name']:<45} {before['ns_per_op']:>12.0f} -> {result['ns_per_op']:>12.0f} ns/op "
+              f"({change:+.1%}){flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--quick", action="store_true", help="shorter runs")
+    parser.add_argument("--only", action="append", default=[], help="run only groups containing this name")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown that counts as a regression (default 0.10 = 10%%)")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = []
+    skipped = {}
+    for name, group in GROUPS.items():
+        if args.only and not any(o in name for o in args.only):
+            continue
+        print(f"== {name}")
+        try:
+            group_results = group(quick=args.quick)
+        except Skipped as e:
+            print(f"   skipped: {e}")
+            skipped[name] = str(e)
+            continue
+        for result in group_results:
+            result["group"] = name
+            print(f"   {result['name']:<45} {result['ns_per_op']:>12.0f} ns/op {result['ops_per_s']:>14.0f} ops/s")
+        results.extend(group_results)
+
+    output = args.output or os.path.join("benchmarks", "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "skipped": skipped,
+            "results": results,
+        }, f, indent=2)
+    print(f"Wrote {len(results)} results to {output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# codec.py
+# Build / dissect throughput for every FLOC type and both serial framings,
+# Scapy classes against the fast paths.
+import random
+
+from .common import bench, Skipped
+
+# (name, type_val, data size, extra build_floc_packet kwargs)
+FLOC_CASES = (
+    ("data", 0, 32, {}),
+    ("command", 1, 16, {"cmd_type_val": 1}),
+    ("ack", 2, 0, {"ack_pid_val": 7}),
+    ("response", 3, 32, {"rsp_pid_val": 7}),
+)
+SERIAL_TYPES = ("B", "U")
+
+
+def _floc_args(type_val, size, extra):
+    args = dict(ttl=5, type_val=type_val, nid=12, pid=9, dst=300, src=4, data=b"x" * size)
+    args.update(extra)
+    return args
+
+
+def run(quick: bool = False) -> list:
+    from NestUi.Utils.floc_codec import (
+        encode_floc_packet, encode_serial_floc_packet, decode_floc_packet, decode_serial_floc_packet
+    )
+    from NestUi.Utils.floc_view import SerialFlocView
+    from NestUi.Utils.floc_template import FrameTemplate
+
+    repeat = 3 if quick else 5
+    min_time = 0.05 if quick else 0.2
+    results = []
+
+    try:
+        from NestUi.Utils.networking import build_floc_packet, build_serial_floc_packet
+        from NestUi.Utils.floc_pkts import FlocPacket, SerialFlocPacket
+        have_scapy = True
+    except ImportError:
+        have_scapy = False
+
+    for name, type_val, size, extra in FLOC_CASES:
+        args = _floc_args(type_val, size, extra)
+        floc = encode_floc_packet(**args)
+
+        results.append(bench(f"build.fast.{name}", lambda: encode_floc_packet(**args),
+                             repeat=repeat, min_time=min_time))
+        results.append(bench(f"dissect.fast.{name}", lambda: decode_floc_packet(floc),
+                             repeat=repeat, min_time=min_time))
+        if have_scapy:
+            results.append(bench(f"build.scapy.{name}", lambda: build_floc_packet(**args),
+                                 repeat=repeat, min_time=min_time))
+            results.append(bench(f"dissect.scapy.{name}", lambda: FlocPacket(floc),
+                                 repeat=repeat, min_time=min_time))
+
+        for serial_type in SERIAL_TYPES:
+            serial = encode_serial_floc_packet(floc, serial_type, 300)
+            tag = f"{name}.{serial_type}"
+            results.append(bench(f"build.fast.serial.{tag}",
+                                 lambda: encode_serial_floc_packet(encode_floc_packet(**args), serial_type, 300),
+                                 repeat=repeat, min_time=min_time))
+            results.append(bench(f"dissect.fast.serial.{tag}", lambda: decode_serial_floc_packet(serial),
+                                 repeat=repeat, min_time=min_time))
+            results.append(bench(f"dissect.view.serial.{tag}",
+                                 lambda: SerialFlocView(serial).floc_packet.src_addr,
+                                 repeat=repeat, min_time=min_time))
+            if have_scapy:
+                results.append(bench(f"build.scapy.serial.{tag}",
+                                     lambda: build_serial_floc_packet(build_floc_packet(**args), serial_type, 300),
+                                     repeat=repeat, min_time=min_time))
+                results.append(bench(f"dissect.scapy.serial.{tag}", lambda: SerialFlocPacket(serial),
+                                     repeat=repeat, min_time=min_time))
+
+    template = FrameTemplate(type_val=1, nid=12, src=4, data=b"poll", cmd_type_val=1, serial_type_val="U")
+    results.append(bench("build.template.command.U", lambda: template.stamp(300, 9),
+                         repeat=repeat, min_time=min_time))
+
+    try:
+        from NestUi.Utils.floc_batch import decode_serial_floc_batch, frames_to_buffer
+    except ImportError:
+        return results
+
+    rng = random.Random(6)
+    count = 2000 if quick else 20000
+    frames = []
+    for i in range(count):
+        name, type_val, size, extra = FLOC_CASES[i % len(FLOC_CASES)]
+        floc = encode_floc_packet(**_floc_args(type_val, rng.randrange(size + 1) if size else 0, extra))
+        frames.append(encode_serial_floc_packet(floc, SERIAL_TYPES[i % 2], 300))
+    buf, offsets, ends = frames_to_buffer(frames)
+    results.append(bench("dissect.batch.serial.mixed", lambda: decode_serial_floc_batch(buf, offsets, ends),
+                         items=count, repeat=repeat, min_time=min_time))
+    return results
+
+
+def run_deframe(quick: bool = False) -> list:
+    from NestUi.Utils.floc_codec import encode_floc_packet, encode_serial_floc_packet
+    from NestUi.Utils.floc_deframer import SerialFlocDeframer, frame_serial_floc_packet
+
+    rng = random.Random(7)
+    count = 5000 if quick else 50000
+    stream = bytearray()
+    for i in range(count):
+        name, type_val, size, extra = FLOC_CASES[i % len(FLOC_CASES)]
+        floc = encode_floc_packet(**_floc_args(type_val, rng.randrange(size + 1) if size else 0, extra))
+        stream += frame_serial_floc_packet(encode_serial_floc_packet(floc, SERIAL_TYPES[i % 2], 300))
+        if i % 50 == 0:
+            stream += b"?Q1\r\n"
+    stream = bytes(stream)
+
+    results = []
+    for chunk_size in (16, 256, 4096):
+        chunks = [stream[i:i + chunk_size] for i in range(0, len(stream), chunk_size)]
+
+        def deframe():
+            deframer = SerialFlocDeframer()
+            for chunk in chunks:
+                deframer.feed(chunk)
+
+        results.append(bench(f"deframe.stream.chunk{chunk_size}", deframe, items=count,
+                             repeat=3, min_time=0.05 if quick else 0.2,
+                             stream_bytes=len(stream)))
+    return results
+
+
+def run_markers(quick: bool = False) -> list:
+    import os
+    from datetime import datetime
+    from types import SimpleNamespace
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from NestUi.Utils.nest_map import buoys_to_markers
+    except ImportError as e:
+        raise Skipped(f"nest_map unavailable: {e}")
+
+    rng = random.Random(8)
+    results = []
+    for count in ((100, 1000) if quick else (100, 1000, 10000)):
+        records = [SimpleNamespace(buoy_id=i, lat=44 + rng.random(), long=-68 - rng.random(),
+                                   battery=rng.randrange(101), drop_time=datetime(2025, 2, 19))
+                   for i in range(count)]
+        results.append(bench(f"markers.buoys_to_markers.{count}", lambda: buoys_to_markers(records),
+                             items=count, repeat=3, min_time=0.05 if quick else 0.2))
+    return results
@@ -0,0 +1,73 @@
+# common.py
+# Timing helpers shared by the benchmark modules.
+import time
+
+
+class Skipped(Exception):
+    """Raised by a benchmark group that can't run here (missing dependency, no DB)."""
+
+
+def bench(name: str, func, items: int = 1, repeat: int = 5, min_time: float = 0.2, **meta) -> dict:
+    """
+    Time func() the way timeit.autorange does: find a loop count that takes at
+    least min_time, then take the best of `repeat` runs. `items` is how many
+    operations one call of func does (e.g. frames in a stream), so the result
+    is reported per item.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    timings = [elapsed]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings) / (number * items)
+    result = {
+        "name": name,
+        "ns_per_op": best * 1e9,
+        "ops_per_s": 1.0 / best if best else float("inf"),
+        "loops": number,
+        "items": items,
+        "repeat": repeat,
+    }
+    result.update(meta)
+    return result
+
+
+def latency(name: str, func, samples: int = 50, **meta) -> dict:
+    """
+    Call func() `samples` times and report latency percentiles, for operations
+    too slow or too stateful to loop (DB round trips).
+    """
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    def pct(p):
+        return timings[min(len(timings) - 1, int(p * len(timings)))] * 1e3
+
+    median = pct(0.5) / 1e3
+    result = {
+        "name": name,
+        "ns_per_op": median * 1e9,
+        "ops_per_s": 1.0 / median if median else float("inf"),
+        "p50_ms": pct(0.5),
+        "p90_ms": pct(0.9),
+        "p99_ms": pct(0.99),
+        "samples": samples,
+    }
+    result.update(meta)
+    return result
@@ -0,0 +1,66 @@
+# db.py
+# nest_db CRUD round-trip latency against the local Postgres from the .env file,
+# on the shared connection and ("_cold") with a fresh one, plus telemetry
+# ingest in batches and a week-long range query on one buoy's readings.
+import os
+from datetime import datetime, timedelta
+
+from .common import latency, Skipped
+
+
+def run(quick: bool = False) -> list:
+    try:
+        from dotenv import load_dotenv
+        load_dotenv("NestUi/.env")
+    except ImportError:
+        pass
+    if not os.environ.get("DATABASE_URL"):
+        raise Skipped("DATABASE_URL not set (run ./setup or point it at a local Postgres)")
+    try:
+        from NestUi.Utils import nest_db
+    except ImportError as e:
+        raise Skipped(f"nest_db unavailable: {e}")
+
+    samples = 10 if quick else 50
+    created = []
+
+    def create():
+        created.append(nest_db.create_buoy(44.5, -68.5, 90, datetime.now()).buoy_id)
+
+    results = [latency("db.create_buoy", create, samples=samples)]
+    buoy_id = created[0]
+    results.append(latency("db.get_buoy_by_id", lambda: nest_db.get_buoy_by_id(buoy_id), samples=samples))
+    from NestUi.Utils.nest_buoy_cache import buoy_cache
+    results.append(latency("db.cached_get_buoy_by_id", lambda: buoy_cache().get_buoy_by_id(buoy_id),
+                           samples=samples))
+    results.append(latency("db.update_buoy", lambda: nest_db.update_buoy(buoy_id, {"battery": 80}),
+                           samples=samples))
+    results.append(latency("db.list_buoys", nest_db.list_buoys, samples=samples))
+    results.append(latency("db.list_buoys_in_bounds", lambda: nest_db.list_buoys_in_bounds(44.0, -69.0, 45.0, -68.0),
+                           samples=samples))
+    results.append(latency("db.list_buoys_near", lambda: nest_db.list_buoys_near(44.5, -68.5, 10000),
+                           samples=samples))
+
+
+    # What every call used to cost: connecting before the query.
+    def cold_get():
+        nest_db.disconnect()
+        nest_db.get_buoy_by_id(buoy_id)
+    results.append(latency("db.get_buoy_by_id_cold", cold_get, samples=max(3, samples // 5)))
+
+    # A reading a minute for the last week, ingested in 1000-row batches.
+    now = datetime.now()
+    week = [{"buoy_id": buoy_id, "time": now - timedelta(minutes=m), "battery": 100 - m % 100}
+            for m in range(7 * 24 * 60)]
+    batches = [week[i:i + 1000] for i in range(0, len(week), 1000)]
+    pending_batches = list(batches)
+    results.append(latency("db.add_readings_1000", lambda: nest_db.add_readings(pending_batches.pop()),
+                           samples=len(batches)))
+    results.append(latency("db.get_readings_week",
+                           lambda: nest_db.get_readings(buoy_id, now - timedelta(days=7), fields=("battery",)),
+                           samples=max(3, samples // 5)))
+    nest_db.delete_readings(buoy_id)
+
+    pending = list(created)
+    results.append(latency("db.delete_buoy", lambda: nest_db.delete_buoy(pending.pop()), samples=len(created)))
+    return results
@@ -0,0 +1,114 @@
+# startup.py
+# Cold start cost of `python -m NestUi`: what the app imports before the main
+# window can appear, measured in fresh interpreters.
+#
+#   python -m benchmarks.startup            import-time profile and budget check
+#   python -m benchmarks.startup --top 40   show more modules
+#
+# The map (QtWebEngine, pyqtlet2), the serial tools (Scapy) and the database
+# client are loaded on first use, so none of DEFERRED should show up here.
+import argparse
+import json
+import subprocess
+import sys
+
+from .common import Skipped
+
+# What __main__ imports ahead of QApplication / the main window.
+STARTUP_IMPORT = "NestUi.__main__"
+# Milliseconds of importing allowed before the window can be built.
+BUDGET_MS = 600.0
+DEFERRED = (
+    "PySide6.QtWebEngineCore",
+    "PySide6.QtWebEngineWidgets",
+    "pyqtlet2",
+    "scapy",
+    "geocoder",
+    "prisma",
+    "requests",
+)
+
+_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import {STARTUP_IMPORT}
+elapsed = time.perf_counter() - start
+loaded = [m for m in {DEFERRED!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "loaded": loaded}}))
+"""
+
+
+def _probe(importtime: bool = False) -> subprocess.CompletedProcess:
+    args = [sys.executable]
+    if importtime:
+        args += ["-X", "importtime"]
+    proc = subprocess.run(args + ["-c", _PROBE], capture_output=True, text=True)
+    if proc.returncode:
+        missing = [line for line in proc.stderr.splitlines() if "ModuleNotFoundError" in line]
+        raise Skipped(missing[-1] if missing else proc.stderr.strip().splitlines()[-1])
+    return proc
+
+
+def measure(samples: int = 5) -> dict:
+    """Best of `samples` cold imports, plus any deferred modules that got loaded."""
+    runs = [json.loads(_probe().stdout) for _ in range(samples)]
+    return {"seconds": min(r["seconds"] for r in runs), "loaded": runs[0]["loaded"]}
+
+
+def import_profile() -> list:
+    """(self us, cumulative us, module) for every module the startup imports."""
+    rows = []
+    for line in _probe(importtime=True).stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        # Nested imports are indented two spaces per level after the '| '
+        rows.append((int(self_us), int(cumulative_us), module.rstrip()[1:]))
+    return rows
+
+
+def run(quick: bool = False) -> list:
+    result = measure(samples=3 if quick else 10)
+    seconds = result["seconds"]
+    return [{
+        "name": "startup.import",
+        "ns_per_op": seconds * 1e9,
+        "ops_per_s": 1.0 / seconds,
+        "budget_ms": BUDGET_MS,
+        "deferred_loaded": result["loaded"],
+    }]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+    parser.add_argument("--top", type=int, default=20, help="modules to list (default 20)")
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, help=f"budget in ms (default {BUDGET_MS:.0f})")
+    args = parser.parse_args()
+
+    try:
+        result = measure()
+        rows = import_profile()
+    except Skipped as e:
+        print(f"skipped: {e}")
+        return 0
+
+    # Top level packages, by cumulative time
+    top_level = [r for r in rows if not r[2].startswith(" ")]
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for self_us, cumulative_us, module in sorted(top_level, key=lambda r: -r[1])[:args.top]:
+        print(f"{cumulative_us / 1e3:>14.1f} {self_us / 1e3:>9.1f}  {module}")
+
+    elapsed_ms = result["seconds"] * 1e3
+    print(f"\nimport {STARTUP_IMPORT}: {elapsed_ms:.0f} ms (budget {args.budget:.0f} ms)")
+    failed = False
+    if elapsed_ms > args.budget:
+        print("OVER BUDGET")
+        failed = True
+    if result["loaded"]:
+        print("Loaded at startup but should be deferred: " + ", ".join(result["loaded"]))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
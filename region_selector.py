@@ -16,7 +16,7 @@ from shapely.geometry import Point
 import folium
 from folium.plugins import MarkerCluster
 from datetime import datetime
-from NestUi.Utils.nest_db import create_buoy, list_buoys
+from NestUi.Utils.nest_db import upsert_buoys, list_buoys
 
 class EarthRangerClient:
     def __init__(self):
@@ -466,7 +466,7 @@ class RegionSelector:
     def fetch_buoys_thread(self, regions):
         try:
             all_buoys = []
-            stored_buoys = []
+            stored = 0
             
             for i, region in enumerate(regions):
                 progress = (i / len(regions)) * 100
@@ -489,8 +489,13 @@ class RegionSelector:
                     if buoys_data and "results" in buoys_data:
                         for buoy in buoys_data["results"]:
                             if "location" in buoy and "latitude" in buoy["location"] and "longitude" in buoy["location"]:
+                                # The ID is the key buoys are stored under; without
+                                # one there's nothing to tell buoys apart by.
+                                buoy_id = buoy.get("id")
+                                if not buoy_id:
+                                    print(f"Skipping buoy without an ID: {buoy.get('subject', 'Unknown')}")
+                                    continue
                                 # Check if we already have this buoy (avoid duplicates)
-                                buoy_id = buoy.get("id", "Unknown")
                                 if not any(b["id"] == buoy_id for b in all_buoys):
                                     buoy_data = {
                                         "id": buoy_id,
@@ -501,23 +506,27 @@ class RegionSelector:
                                         "drop_time": datetime.now()  # Use current time as drop time
                                     }
                                     all_buoys.append(buoy_data)
-                                    
-                                    # Store buoy in database
-                                    try:
-                                        stored_buoy = create_buoy(
-                                            lat=buoy_data["lat"],
-                                            long_val=buoy_data["lon"],
-                                            battery=buoy_data["battery"],
-                                            drop_time=buoy_data["drop_time"]
-                                        )
-                                        stored_buoys.append(stored_buoy)
-                                        print(f"Stored buoy {buoy_id} in database")
-                                    except Exception as db_error:
-                                        print(f"Error storing buoy {buoy_id} in database: {str(db_error)}")
             
+            # Store every buoy in one transaction, keyed by its EarthRanger ID so
+            # fetching the same region again updates instead of duplicating.
+            if all_buoys:
+                self.update_progress(100, f"Storing {len(all_buoys)} buoys...")
+                try:
+                    stored = upsert_buoys("earthranger", [{
+                        "external_id": buoy["id"],
+                        "lat": buoy["lat"],
+                        "long": buoy["lon"],
+                        "battery": buoy["battery"],
+                        "drop_time": buoy["drop_time"],
+                    } for buoy in all_buoys])
+                    print(f"Stored {stored} buoys in database")
+                except Exception as db_error:
+                    stored = 0
+                    print(f"Error storing buoys in database: {str(db_error)}")
+
             if all_buoys:
                 self.show_buoys_map(all_buoys)
-                messagebox.showinfo("Success", f"Found {len(all_buoys)} buoys and stored {len(stored_buoys)} in database")
+                messagebox.showinfo("Success", f"Found {len(all_buoys)} buoys and stored {stored} in database")
             else:
                 messagebox.showinfo("Info", "No buoys found in the selected regions")
             